@@ -1,23 +1,26 @@
 from fastapi import Depends, HTTPException, status, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from jose import jwt, JWTError
 from pydantic import ValidationError
 from neo4j import Session
 from typing import Generator
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.core.config import settings
 from app.db.models_pg import User
 from app.schemas.user_schemas import TokenPayload
 from app.crud import crud_user
-from app.db.session import get_db
+from app.db.session import get_async_db
+from app.services.user_cache import UserCache, get_user_cache
 
 reusable_oauth2 = OAuth2PasswordBearer(
     tokenUrl=f"{settings.API_V1_STR}/login/access-token"
 )
 
-def get_current_user(
-    db: Session = Depends(get_db), token: str = Depends(reusable_oauth2)
+async def get_current_user(
+    db: AsyncSession = Depends(get_async_db), token: str = Depends(reusable_oauth2)
 ) -> User:
     try:
         payload = jwt.decode(
@@ -29,12 +32,27 @@ def get_current_user(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Could not validate credentials",
         )
-    user = crud_user.get_user_by_email(db, email=token_data.sub)
+    # Identity rarely changes, so most requests are served without a DB lookup
+    user_cache = get_user_cache()
+    if user_cache is not None and token_data.sub is not None:
+        user = await _call_cache(user_cache, user_cache.get, token_data.sub)
+        if user is not None:
+            return user
+
+    user = await crud_user.aget_user_by_email(db, email=token_data.sub)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
+    if user_cache is not None:
+        await _call_cache(user_cache, user_cache.set, token_data.sub, user)
     return user
 
-def get_current_active_user(
+async def _call_cache(user_cache: UserCache, method, *args):
+    # With a Redis tier, cache calls are network round trips that must not block the event loop
+    if user_cache.redis is None:
+        return method(*args)
+    return await run_in_threadpool(method, *args)
+
+async def get_current_active_user(
     current_user: User = Depends(get_current_user),
 ) -> User:
     if not current_user.is_active:
@@ -1,13 +1,16 @@
+import logging
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlalchemy.exc import IntegrityError
 from app.crud import crud_user
 from app.schemas.user_schemas import UserCreate, UserRead
-from app.db.session import get_db
-from app.core.security import create_access_token, verify_password
+from app.db.session import get_async_db
+from app.core.security import aget_password_hash, averify_and_rehash, create_access_token
 from sqlmodel import SQLModel
 
+logger = logging.getLogger(__name__)
+
 class Token(SQLModel):
     access_token: str
     token_type: str = "bearer"
@@ -15,34 +18,47 @@ class Token(SQLModel):
 router = APIRouter()
 
 @router.post("/login/access-token", response_model=Token)
-def login_for_access_token(
-    db: Session = Depends(get_db),
+async def login_for_access_token(
+    db: AsyncSession = Depends(get_async_db),
     form_data: OAuth2PasswordRequestForm = Depends()
 ):
     """
     OAuth2 compatible token login, get an access token for future requests.
+
+    The password is verified on the hashing pool, so logins don't hold up
+    other requests; a hash with an outdated work factor is replaced.
     """
-    user = crud_user.get_user_by_email(db, email=form_data.username)
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    user = await crud_user.aget_user_by_email(db, email=form_data.username)
+    valid, new_hash = False, None
+    if user:
+        valid, new_hash = await averify_and_rehash(form_data.password, user.hashed_password)
+    if not valid:
         raise HTTPException(
             status_code=401,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if new_hash:
+        try:
+            await crud_user.aupdate_password_hash(db, user=user, hashed_password=new_hash)
+        except Exception as e:
+            # The old hash still works, so the next login tries again
+            logger.warning(f"Could not rehash the password of {user.email}: {e}")
     access_token = create_access_token(subject=user.email)
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/register", response_model=UserRead, status_code=201)
-def register_user(
+async def register_user(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     user_in: UserCreate
 ):
     """
     Register a new user.
     """
+    hashed_password = await aget_password_hash(user_in.password)
     try:
-        user = crud_user.create_user(db=db, user_in=user_in)
+        user = await crud_user.acreate_user(db, user_in=user_in, hashed_password=hashed_password)
     except IntegrityError:
         raise HTTPException(
             status_code=400,
@@ -51,16 +67,17 @@ def register_user(
     return user
 
 @router.post("/users/", response_model=UserRead, status_code=201)
-def register_user_legacy(
+async def register_user_legacy(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     user_in: UserCreate
 ):
     """
     Create a new user (legacy endpoint).
     """
+    hashed_password = await aget_password_hash(user_in.password)
     try:
-        user = crud_user.create_user(db=db, user_in=user_in)
+        user = await crud_user.acreate_user(db, user_in=user_in, hashed_password=hashed_password)
     except IntegrityError:
         raise HTTPException(
             status_code=400,
@@ -1,100 +1,436 @@
-from pathlib import Path
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
-import shutil
-from sqlmodel import Session
-from uuid import UUID
+import json
+import zipfile
+from typing import Any, AsyncIterator, Dict, List, Tuple
+from celery import group
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlmodel.ext.asyncio.session import AsyncSession
+from uuid import UUID, uuid4
 
 from app.api import deps
 from app.crud import crud_document
-from app.schemas.document_schemas import DocumentCreate, DocumentCreateResponse, DocumentQueryRequest, DocumentQueryResponse
-from app.db.models_pg import User
+from app.schemas.document_schemas import (
+    BatchStatusResponse,
+    BulkUploadResponse,
+    DocumentCreate,
+    DocumentCreateResponse,
+    DocumentQueryRequest,
+    DocumentQueryResponse,
+    LibraryQueryRequest,
+    UploadSessionCreate,
+    UploadSessionRead,
+)
+from app.db.models_pg import DocumentStatus, User
 from app.core.config import settings
 from app.core.celery_app import celery_app
-# from app.services.rag_service import RAGService  # Temporarily commented out due to import issues
+from app.services import file_storage
+from app.services.file_storage import StoredFile, UploadSessionError, UploadTooLargeError, iter_upload_file
 
 router = APIRouter()
 
 
 @router.post("/upload", response_model=DocumentCreateResponse, status_code=201)
-def upload_document(
+async def upload_document(
     file: UploadFile = File(...),
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     current_user: User = Depends(deps.get_current_active_user),
 ):
     """
     Upload a document for the authenticated user.
+
+    The file is stored under the hash of its content; if the same content was
+    processed before, the worker reuses its chunks and embeddings. Files over
+    settings.MAX_UPLOAD_SIZE are rejected with 413.
+
+    Starlette spools a multipart body to a temporary file before this handler
+    runs, so the file is written twice; BodySizeLimitMiddleware bounds the
+    spool. Large files should use the resumable `/uploads` endpoints, which
+    stream the request body straight to storage.
+    """
+    file_name = _file_name(file)
+    # Copy the spooled file to its content path, hashing it on the way
+    stored = await _store(iter_upload_file(file), file_name)
+    return await _create_document(db, file_name, stored, current_user)
+
+
+@router.post("/upload/bulk", response_model=BulkUploadResponse, status_code=201)
+async def bulk_upload_documents(
+    files: List[UploadFile] = File(...),
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: User = Depends(deps.get_current_active_user),
+):
+    """
+    Upload many documents at once, as separate files and/or ZIP archives of a folder.
+
+    All documents are created in one transaction and queued for processing as
+    one Celery group; `GET /batches/{batch_id}` reports their combined
+    progress. Empty files and files over settings.MAX_UPLOAD_SIZE are skipped
+    and listed in the response.
     """
-    # Ensure the upload directory exists
-    upload_dir = Path(settings.UPLOADS_DIR)
-    upload_dir.mkdir(parents=True, exist_ok=True)
+    stored_files: List[Tuple[str, StoredFile]] = []
+    empty_files: List[StoredFile] = []
+    skipped: List[str] = []
+    try:
+        for file in files:
+            file_name = _file_name(file)
+            remaining = settings.MAX_BULK_UPLOAD_FILES - len(stored_files)
+            if remaining <= 0:
+                raise HTTPException(
+                    status_code=413, detail=f"A bulk upload holds at most {settings.MAX_BULK_UPLOAD_FILES} files"
+                )
+            if file_name.lower().endswith(".zip"):
+                try:
+                    extracted, archive_skipped = await run_in_threadpool(
+                        file_storage.store_archive, file.file, remaining
+                    )
+                except UploadTooLargeError as e:
+                    raise HTTPException(status_code=413, detail=str(e))
+                except zipfile.BadZipFile:
+                    raise HTTPException(status_code=400, detail=f"{file_name} is not a valid ZIP archive")
+                stored_files.extend(extracted)
+                skipped.extend(archive_skipped)
+                continue
+            try:
+                stored = await file_storage.astore_upload(iter_upload_file(file), file_name)
+            except UploadTooLargeError:
+                skipped.append(file_name)
+                continue
+            if stored.size == 0:
+                empty_files.append(stored)
+                skipped.append(file_name)
+                continue
+            stored_files.append((file_name, stored))
+
+        batch_id = uuid4()
+        documents_in = [
+            DocumentCreate(file_name=name, file_path=stored.path, content_hash=stored.content_hash)
+            for name, stored in stored_files
+        ]
+        documents = await crud_document.acreate_documents(
+            db, documents_in, owner_id=current_user.id, batch_id=batch_id
+        )
+    except Exception:
+        # Files stored before the failure would otherwise be left without a document
+        await _discard_unreferenced(db, [stored for _, stored in stored_files] + empty_files)
+        raise
+    await _discard_unreferenced(db, empty_files)
+
+    # Publish every task over one broker connection instead of one send per file
+    if documents:
+        document_ids = [document.id for document in documents]
+        try:
+            await run_in_threadpool(_dispatch_processing, document_ids)
+        except Exception:
+            # Unqueued documents would otherwise report as pending forever
+            await crud_document.atransition_documents_status(
+                db, document_ids, DocumentStatus.FAILED, from_statuses=[DocumentStatus.PENDING]
+            )
+            raise HTTPException(status_code=503, detail="Could not queue the documents for processing")
+
+    return BulkUploadResponse(
+        batch_id=batch_id,
+        documents=[DocumentCreateResponse.model_validate(document) for document in documents],
+        skipped=skipped,
+    )
+
+
+@router.get("/batches/{batch_id}", response_model=BatchStatusResponse)
+async def get_batch_status(
+    batch_id: UUID,
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: User = Depends(deps.get_current_active_user),
+):
+    """
+    Get the combined processing status of a bulk upload.
+    """
+    counts = await crud_document.aget_batch_status_counts(db, batch_id=batch_id, owner_id=current_user.id)
+    if not counts:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    pending = counts.get("PENDING", 0) + counts.get("PROCESSING", 0)
+    return BatchStatusResponse(batch_id=batch_id, total=sum(counts.values()), counts=counts, done=pending == 0)
+
+
+def _dispatch_processing(document_ids: List[UUID]):
+    group(
+        celery_app.signature("app.worker.process_document_for_mvp", args=[str(document_id)])
+        for document_id in document_ids
+    ).apply_async()
+
+
+@router.put("/{document_id}/file", response_model=DocumentCreateResponse)
+async def replace_document_file(
+    document_id: UUID,
+    file: UploadFile = File(...),
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: User = Depends(deps.get_current_active_user),
+):
+    """
+    Upload a new version of a document.
+
+    The document keeps its id, and re-processing only stores the chunks that
+    changed since the previous version.
+    """
+    document = await crud_document.aget_document(db, document_id)
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+    if document.owner_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Access denied to this document")
+    if document.status in ("PENDING", "PROCESSING"):
+        raise HTTPException(status_code=409, detail="Document is still being processed")
+
+    file_name = _file_name(file)
+    stored = await _store(iter_upload_file(file), file_name)
+    if document.status == "COMPLETED" and stored.path == document.file_path:
+        # Same content as the processed version, so there is nothing to redo
+        return document
+
+    document = await crud_document.areplace_document_file(
+        db, document=document, file_name=file_name, file_path=stored.path, content_hash=stored.content_hash
+    )
+    await run_in_threadpool(
+        celery_app.send_task, "app.worker.process_document_for_mvp", args=[str(document.id)]
+    )
+
+    return document
+
+
+@router.post("/uploads", response_model=UploadSessionRead, status_code=201)
+def create_upload_session(
+    session_in: UploadSessionCreate,
+    current_user: User = Depends(deps.get_current_active_user),
+):
+    """
+    Start a resumable upload of a large file.
+
+    The file is then sent in pieces with `PUT /uploads/{upload_id}`, each
+    starting at the offset the previous ones reached, and turned into a
+    document with `POST /uploads/{upload_id}/complete`.
+    """
+    try:
+        return file_storage.create_upload_session(current_user.id, session_in.file_name, session_in.size)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+
+@router.get("/uploads/{upload_id}", response_model=UploadSessionRead)
+def get_upload_session(upload_id: UUID, current_user: User = Depends(deps.get_current_active_user)):
+    """
+    Get the state of a resumable upload; `offset` is where the next piece must start.
+    """
+    return _get_upload_session(upload_id, current_user)
+
+
+@router.put("/uploads/{upload_id}", response_model=UploadSessionRead)
+async def upload_piece(
+    upload_id: UUID,
+    offset: int,
+    request: Request,
+    current_user: User = Depends(deps.get_current_active_user),
+):
+    """
+    Append the request body to a resumable upload at `offset`.
+
+    Returns 409 if `offset` is not where the upload left off.
+    """
+    session = await run_in_threadpool(_get_upload_session, upload_id, current_user)
+    try:
+        return await file_storage.append_to_upload_session(session, offset, request.stream())
+    except UploadSessionError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+
+@router.post("/uploads/{upload_id}/complete", response_model=DocumentCreateResponse, status_code=201)
+async def complete_upload(
+    upload_id: UUID,
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: User = Depends(deps.get_current_active_user),
+):
+    """
+    Finish a resumable upload and create its document.
+    """
+    session = await run_in_threadpool(_get_upload_session, upload_id, current_user)
+    try:
+        stored = await file_storage.complete_upload_session(session)
+    except UploadSessionError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return await _create_document(db, session.file_name, stored, current_user)
 
-    # Save the uploaded file
-    file_path = upload_dir / file.filename
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
 
+def _file_name(file: UploadFile) -> str:
+    if not file.filename:
+        raise HTTPException(status_code=400, detail="Uploaded file has no filename")
+    return file.filename
+
+
+async def _discard_unreferenced(db: AsyncSession, stored_files: List[StoredFile]):
+    """
+    Deletes stored files that no document points to. Storage is content
+    addressed, so a file stored by this request may also belong to an
+    existing document, which must keep it.
+    """
+    if not stored_files:
+        return
+    await db.rollback()
+    paths = {stored.path for stored in stored_files}
+    referenced = await crud_document.aget_referenced_file_paths(db, paths)
+    for path in paths - referenced:
+        await run_in_threadpool(file_storage.remove_stored_file, path)
+
+
+async def _store(blocks: AsyncIterator[bytes], file_name: str) -> StoredFile:
+    try:
+        return await file_storage.astore_upload(blocks, file_name)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+
+async def _create_document(db: AsyncSession, file_name: str, stored: StoredFile, current_user: User):
+    """
+    Creates the document record for a stored file and queues it for processing.
+    """
     # Create a document record in the database
-    document_create = DocumentCreate(file_name=file.filename, file_path=str(file_path))
-    document = crud_document.create_document(
-        session=db, document_in=document_create, owner_id=current_user.id
+    document_create = DocumentCreate(
+        file_name=file_name, file_path=stored.path, content_hash=stored.content_hash
     )
+    document = await crud_document.acreate_document(db, document_in=document_create, owner_id=current_user.id)
 
     # Dispatch the processing task to the Celery worker by name
-    celery_app.send_task("app.worker.process_document_for_mvp", args=[str(document.id)])
+    await run_in_threadpool(
+        celery_app.send_task, "app.worker.process_document_for_mvp", args=[str(document.id)]
+    )
 
     return document
 
 
-@router.post("/{document_id}/query", response_model=DocumentQueryResponse)
-def query_document(
-    document_id: UUID,
-    query_request: DocumentQueryRequest,
-    db: Session = Depends(deps.get_db),
+def _get_upload_session(upload_id: UUID, current_user: User) -> file_storage.UploadSession:
+    session = file_storage.get_upload_session(upload_id)
+    if session is None or session.owner_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return session
+
+
+@router.post("/query", response_model=DocumentQueryResponse)
+async def query_library(
+    query_request: LibraryQueryRequest,
     current_user: User = Depends(deps.get_current_active_user),
 ):
     """
-    Query a document using RAG (Retrieval-Augmented Generation).
-    
-    This endpoint retrieves relevant text chunks from the specified document
-    and uses an LLM to generate a contextual answer to the user's question.
+    Query all of the current user's documents at once using RAG.
+
+    Retrieval is always restricted to the user's own documents and can be
+    narrowed to specific documents, file types or an upload date range. The
+    chunks of every matching document are searched with one vector query, and
+    each returned chunk's metadata names its document.
+    """
+    from app.services.rag_service import RAGService
+    from app.services.vector_store_service import LibraryScope
+
+    scope = LibraryScope(
+        owner_id=current_user.id,
+        document_ids=query_request.document_ids,
+        document_types=query_request.document_types,
+        uploaded_after=query_request.uploaded_after,
+        uploaded_before=query_request.uploaded_before,
+    )
+    rag_response = await RAGService().agenerate_library_answer(
+        question=query_request.question,
+        scope=scope,
+        n_results=query_request.n_results,
+    )
+    return DocumentQueryResponse(
+        answer=rag_response.answer,
+        chunks_used=rag_response.chunks_used,
+        context_tokens=rag_response.context_tokens
+    )
+
+
+async def _get_queryable_document(db: AsyncSession, document_id: UUID, current_user: User):
+    """
+    Loads a document and checks that the current user may query it.
     """
     # 1. Verify the document exists and belongs to the current user
-    document = crud_document.get_document(db, document_id)
+    document = await crud_document.aget_document(db, document_id)
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
-    
+
     if document.owner_id != current_user.id:
         raise HTTPException(status_code=403, detail="Access denied to this document")
-    
+
     # 2. Check if document processing is complete
     if document.status != "COMPLETED":
         raise HTTPException(
-            status_code=400, 
+            status_code=400,
             detail=f"Document is not ready for querying. Current status: {document.status}"
         )
+    return document
+
+
+@router.post("/{document_id}/query", response_model=DocumentQueryResponse)
+async def query_document(
+    document_id: UUID,
+    query_request: DocumentQueryRequest,
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: User = Depends(deps.get_current_active_user),
+):
+    """
+    Query a document using RAG (Retrieval-Augmented Generation).
     
-    # 3. Temporary mock implementation for demonstration
-    # TODO: Replace with actual RAG service once import issues are resolved
-    try:
-        from app.services.rag_service import RAGService
-        rag_service = RAGService()
-        rag_response = rag_service.generate_answer(
+    This endpoint retrieves relevant text chunks from the specified document
+    and uses an LLM to generate a contextual answer to the user's question.
+    Retrieval and generation are awaited, so slow LLM calls do not tie up
+    the threadpool.
+    """
+    document = await _get_queryable_document(db, document_id, current_user)
+
+    from app.services.rag_service import RAGService
+    rag_response = await RAGService().agenerate_answer(
+        question=query_request.question,
+        document_id=document_id,
+        owner_id=document.owner_id
+    )
+    return DocumentQueryResponse(
+        answer=rag_response.answer,
+        chunks_used=rag_response.chunks_used,
+        context_tokens=rag_response.context_tokens
+    )
+
+
+def _format_sse(event: Dict[str, Any]) -> str:
+    return f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+
+
+@router.post("/{document_id}/query/stream")
+async def query_document_stream(
+    document_id: UUID,
+    query_request: DocumentQueryRequest,
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: User = Depends(deps.get_current_active_user),
+):
+    """
+    Query a document and stream the answer as Server-Sent Events.
+
+    The retrieved chunks are sent first as a `chunks` event, followed by one
+    `token` event per piece of the answer as the LLM generates it, and a final
+    `done` event with the full answer (or an `error` event).
+    """
+    document = await _get_queryable_document(db, document_id, current_user)
+
+    from app.services.rag_service import RAGService
+    rag_service = RAGService()
+
+    async def event_stream() -> AsyncIterator[str]:
+        async for event in rag_service.astream_answer(
             question=query_request.question,
-            document_id=document_id
-        )
-        return DocumentQueryResponse(
-            answer=rag_response.answer,
-            chunks_used=rag_response.chunks_used
-        )
-    except ImportError:
-        # Fallback mock response for demonstration
-        return DocumentQueryResponse(
-            answer=f"Mock answer for question: '{query_request.question}' about document '{document.file_name}'. (RAG service not available in current environment)",
-            chunks_used=[
-                {
-                    "text": "This is a mock chunk from the document.",
-                    "metadata": {"document_id": str(document_id), "chunk_index": 0},
-                    "distance": 0.1
-                }
-            ]
-        ) 
\ No newline at end of file
+            document_id=document_id,
+            owner_id=document.owner_id
+        ):
+            yield _format_sse(event)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
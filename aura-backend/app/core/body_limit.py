@@ -0,0 +1,50 @@
+"""
+ASGI middleware that caps the size of request bodies.
+"""
+
+from typing import Dict, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+
+class BodySizeLimitMiddleware:
+    """
+    Rejects request bodies larger than `max_size` bytes with 413.
+
+    A declared Content-Length over the limit is rejected before any of the body
+    is read; a chunked body is cut off as soon as the limit is passed, instead
+    of after the whole body has been spooled to disk. `overrides` maps request
+    paths to their own limits.
+    """
+
+    def __init__(self, app, max_size: int, overrides: Optional[Dict[str, int]] = None):
+        self.app = app
+        self.max_size = max_size
+        self.overrides = overrides or {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        max_size = self.overrides.get(scope["path"], self.max_size)
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > max_size:
+            response = JSONResponse({"detail": "Request body too large"}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_size:
+                    # Raised inside the app, so its exception handlers turn it into a response
+                    raise HTTPException(status_code=413, detail="Request body too large")
+            return message
+
+        await self.app(scope, limited_receive, send)
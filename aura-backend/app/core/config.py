@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 import os
+from typing import Optional
 from functools import lru_cache
 from dotenv import load_dotenv
 
@@ -15,6 +16,16 @@ class Settings(BaseSettings):
     API_V1_STR: str = "/api/v1"
     DATABASE_URL: str
 
+    # Database connection pool settings, per process: the API and every Celery
+    # worker process hold up to DB_POOL_SIZE + DB_MAX_OVERFLOW connections each
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0  # Seconds to wait for a free connection before failing
+    DB_POOL_PRE_PING: bool = True  # Replace connections the server dropped while idle
+    DB_POOL_RECYCLE: int = 1800  # Seconds after which a connection is reopened; -1 never
+    DB_STATEMENT_TIMEOUT: Optional[int] = 30_000  # Postgres statement_timeout in milliseconds; None: none
+    DB_ECHO: bool = False  # Log every SQL statement
+
     # JWT settings
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
@@ -28,10 +39,16 @@ class Settings(BaseSettings):
     # ChromaDB settings
     CHROMA_HOST: str
     CHROMA_PORT: int
+    CHROMA_MAX_CONNECTIONS: int = 20
+    CHROMA_KEEPALIVE_SECS: float = 60.0
+    CHROMA_HEALTH_CHECK_INTERVAL: float = 30.0
+    CHROMA_MAX_CACHED_COLLECTIONS: int = 1000
 
     # Redis settings
     REDIS_HOST: str
     REDIS_PORT: int
+    REDIS_CACHE_DB: int = 1
+    REDIS_CACHE_TIMEOUT: float = 0.5
 
     # Testing flag
     TESTING: bool = False
@@ -41,6 +58,98 @@ class Settings(BaseSettings):
 
     # Path for uploaded documents
     UPLOADS_DIR: str = os.path.join(PROJECT_ROOT_DIR, "uploads")
+    MAX_UPLOAD_SIZE: int = 100 * 1024 * 1024  # Bytes; larger request bodies are rejected early
+    UPLOAD_SESSION_TTL: int = 24 * 60 * 60  # Seconds before an unfinished resumable upload is discarded
+    MAX_BULK_UPLOAD_SIZE: int = 1024 * 1024 * 1024  # Bytes per bulk upload request
+    MAX_BULK_UPLOAD_FILES: int = 1000
+
+    # Document processing settings
+    # "auto" (Markdown for .md files, paragraphs otherwise), "paragraph", "sentence",
+    # "markdown" or "character" (fixed windows of CHUNK_SIZE characters with CHUNK_OVERLAP)
+    CHUNKER: str = "auto"
+    CHUNK_MAX_TOKENS: int = 240  # Stays within the embedding model's 256-token input limit
+    CHUNK_SIZE: int = 1000
+    CHUNK_OVERLAP: int = 200
+    CHUNK_BATCH_SIZE: int = 64
+    # PDFs with at least PDF_PARALLEL_MIN_PAGES pages are extracted in ranges of
+    # PDF_PAGES_PER_TASK pages on a pool of PDF_EXTRACT_WORKERS processes (None: one per CPU, 0: no pool)
+    PDF_EXTRACT_WORKERS: Optional[int] = None
+    PDF_PARALLEL_MIN_PAGES: int = 16
+    PDF_PAGES_PER_TASK: int = 8
+    INGEST_QUEUE_SIZE: int = 4
+    INGEST_MAX_RETRIES: int = 3
+    INGEST_RETRY_BACKOFF: float = 1.0
+    INGEST_TASK_MAX_RETRIES: int = 3
+    # Seconds after which a PROCESSING document whose task died may be claimed by another task
+    INGEST_CLAIM_TIMEOUT: int = 3600
+
+    # Password hashing settings: bcrypt work factor (hashes with another one are
+    # rehashed at the next login) and processes hashing off the event loop
+    # (None: half the CPUs, so a burst of logins can't take them all; 0: worker threads)
+    PASSWORD_HASH_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: Optional[int] = None
+
+    # Authenticated user cache settings
+    USER_CACHE_ENABLED: bool = True
+    USER_CACHE_BACKEND: str = "memory"  # "memory", or "redis" for a shared tier behind it
+    USER_CACHE_TTL: int = 60  # Also bounds how long other processes may see a deactivated user
+    USER_CACHE_MAX_ENTRIES: int = 10_000
+
+    # Answer cache settings
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_BACKEND: str = "redis"  # "redis" or "memory"
+    ANSWER_CACHE_TTL: int = 24 * 60 * 60
+    # Entries kept by the memory backend, and question vectors kept per document and prompt settings
+    ANSWER_CACHE_MAX_ENTRIES: int = 1024
+    # Cosine similarity above which a near-duplicate question reuses an answer; None disables it
+    ANSWER_CACHE_SIMILARITY_THRESHOLD: Optional[float] = None
+
+    # Embedding model settings
+    EMBEDDING_MODEL_NAME: str = "all-MiniLM-L6-v2"
+    EMBEDDING_BATCH_SIZE: int = 64
+    EMBEDDING_NORMALIZE: bool = True
+    EMBEDDING_DEVICE: Optional[str] = None  # e.g. "cpu" or "cuda"; None lets the library choose
+    EMBEDDING_NUM_THREADS: Optional[int] = None  # torch intra-op threads; None keeps the default
+
+    # Embedding cache settings
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_BACKEND: str = "disk"  # "disk", "redis" or "memory"
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 50_000
+    EMBEDDING_CACHE_PATH: str = os.path.join(PROJECT_ROOT_DIR, ".cache", "embeddings.sqlite3")
+    # Embeddings the disk backend keeps, least recently used first out (about 1.5 KB each)
+    EMBEDDING_CACHE_DISK_MAX_ENTRIES: int = 200_000
+    # Seconds an embedding is kept: since it was written in Redis, since it was last used on disk
+    EMBEDDING_CACHE_TTL: Optional[int] = None
+
+    # Load the embedding model when a Celery worker process starts rather than on its first task
+    EMBEDDING_WARMUP_ON_WORKER_START: bool = True
+    # Load it when an API process starts too. Off by default, so API pods start
+    # without loading torch; the first query then waits several seconds for
+    # torch and the model to load, which enabling this moves to startup
+    EMBEDDING_WARMUP_ON_API_START: bool = False
+
+    # Hybrid retrieval settings: BM25 keyword search fused with vector search
+    HYBRID_SEARCH_ENABLED: bool = True
+    # Must be on storage shared by the API and the workers (a shared volume in
+    # docker-compose.yml); otherwise the API finds no keyword matches and
+    # hybrid search returns vector results only
+    KEYWORD_INDEX_PATH: str = os.path.join(PROJECT_ROOT_DIR, ".cache", "keyword_index.sqlite3")
+    # Results taken from each retriever before fusion
+    HYBRID_CANDIDATES: int = 20
+    # Reciprocal-rank fusion constant; larger values flatten the rank weighting
+    RRF_K: int = 60
+
+    # RAG prompt settings
+    RAG_MAX_TOKENS: int = 1000  # Maximum tokens in a generated answer
+    RAG_CONTEXT_TOKEN_BUDGET: int = 3000  # Maximum tokens of retrieved context per prompt
+
+    # Re-ranking settings: "mmr", "cross-encoder" or None to use retrieval order
+    RERANK_STRATEGY: Optional[str] = None
+    # Candidates retrieved for the reranker to choose the prompt's chunks from
+    RERANK_CANDIDATES: int = 20
+    # MMR trade-off between relevance (1.0) and diversity (0.0)
+    MMR_LAMBDA: float = 0.5
+    CROSS_ENCODER_MODEL_NAME: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
 
 @lru_cache()
 def get_settings() -> Settings:
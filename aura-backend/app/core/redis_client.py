@@ -0,0 +1,29 @@
+import threading
+from typing import Optional
+
+import redis
+
+from app.core.config import settings
+
+# Caches live in their own database so they never mix with Celery's queues
+cache_redis_url = f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}/{settings.REDIS_CACHE_DB}"
+
+_client: Optional[redis.Redis] = None
+_lock = threading.Lock()
+
+
+def get_cache_redis() -> redis.Redis:
+    """
+    Returns the process-wide Redis client used by the caches.
+
+    The client keeps its own connection pool and is created on first use.
+    """
+    global _client
+    with _lock:
+        if _client is None:
+            _client = redis.Redis.from_url(
+                cache_redis_url,
+                socket_timeout=settings.REDIS_CACHE_TIMEOUT,
+                socket_connect_timeout=settings.REDIS_CACHE_TIMEOUT,
+            )
+        return _client
@@ -1,13 +1,22 @@
 from passlib.context import CryptContext
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timedelta, timezone
-from typing import Any, Optional, Union
+from typing import Any, Optional, Tuple, Union
 from jose import jwt
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
 from app.core.config import settings
 
+logger = logging.getLogger(__name__)
+
 # Create a CryptContext for handling password hashing.
 # We specify the schemes to use, with "bcrypt" being the default.
 # "auto" will automatically select the best scheme.
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.PASSWORD_HASH_ROUNDS)
 
 def get_password_hash(password: str) -> str:
     """
@@ -34,6 +43,66 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
     return pwd_context.verify(plain_password, hashed_password)
 
+def verify_and_rehash(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verifies a password and, if it is correct but its hash was made with an
+    outdated scheme or work factor, hashes it again.
+
+    Returns:
+        Whether the password is correct, and the new hash to store, or None.
+    """
+    if not pwd_context.verify(plain_password, hashed_password):
+        return False, None
+    if pwd_context.needs_update(hashed_password):
+        return True, pwd_context.hash(plain_password)
+    return True, None
+
+# bcrypt deliberately burns CPU for each hash, so the API hashes on a small
+# pool of processes instead of on the event loop or its threadpool
+_hash_pool: Optional[ProcessPoolExecutor] = None
+_hash_pool_disabled = False
+_hash_pool_lock = threading.Lock()
+
+def _get_hash_pool() -> Optional[ProcessPoolExecutor]:
+    """Returns the process-wide password hashing pool, or None to hash on worker threads."""
+    global _hash_pool
+    with _hash_pool_lock:
+        if (
+            _hash_pool is None and not _hash_pool_disabled
+            and settings.PASSWORD_HASH_WORKERS != 0 and not settings.TESTING
+        ):
+            _hash_pool = ProcessPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS or max(1, (os.cpu_count() or 2) // 2),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _hash_pool
+
+def _disable_hash_pool():
+    global _hash_pool, _hash_pool_disabled
+    with _hash_pool_lock:
+        if _hash_pool is not None:
+            _hash_pool.shutdown(wait=False, cancel_futures=True)
+        _hash_pool, _hash_pool_disabled = None, True
+
+async def _run_hashing(fn, *args):
+    pool = _get_hash_pool()
+    if pool is not None:
+        try:
+            return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+        except BrokenProcessPool as e:
+            # e.g. a pool process was killed; bcrypt releases the GIL, so threads still work
+            logger.warning(f"Hashing passwords without a process pool: {e}")
+            _disable_hash_pool()
+    return await asyncio.to_thread(fn, *args)
+
+async def aget_password_hash(password: str) -> str:
+    """Async version of `get_password_hash`, which hashes off the event loop."""
+    return await _run_hashing(get_password_hash, password)
+
+async def averify_and_rehash(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Async version of `verify_and_rehash`, which verifies off the event loop."""
+    return await _run_hashing(verify_and_rehash, plain_password, hashed_password)
+
 def create_access_token(subject: Union[str, Any], expires_delta: Optional[timedelta] = None) -> str:
     """
     Create a new JWT access token.
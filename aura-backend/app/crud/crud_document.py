@@ -1,9 +1,12 @@
-from sqlmodel import Session
+from datetime import datetime, timezone
+from sqlalchemy import and_, or_, update
+from sqlmodel import Session, func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from uuid import UUID
-from typing import Optional
+from typing import Dict, Iterable, List, Optional, Set
 
 from app.schemas.document_schemas import DocumentCreate
-from app.db.models_pg import Document as PGDocument
+from app.db.models_pg import Document as PGDocument, DocumentStatus
 
 def create_document(session: Session, document_in: DocumentCreate, owner_id: UUID) -> PGDocument:
     db_document = PGDocument.model_validate(document_in, update={"owner_id": owner_id})
@@ -12,12 +15,60 @@ def create_document(session: Session, document_in: DocumentCreate, owner_id: UUI
     session.refresh(db_document)
     return db_document
 
+def create_documents(
+    session: Session, documents_in: List[DocumentCreate], owner_id: UUID, batch_id: Optional[UUID] = None
+) -> List[PGDocument]:
+    """
+    Creates many documents in a single transaction.
+    """
+    documents = [
+        PGDocument.model_validate(document_in, update={"owner_id": owner_id, "batch_id": batch_id})
+        for document_in in documents_in
+    ]
+    # Ids are assigned on construction; read them before the commit expires the objects
+    ids = [document.id for document in documents]
+    session.add_all(documents)
+    session.commit()
+
+    # Reload every row in one query rather than refreshing each document
+    loaded = {document.id: document for document in session.exec(select(PGDocument).where(PGDocument.id.in_(ids)))}
+    return [loaded[document_id] for document_id in ids]
+
+def get_batch_status_counts(session: Session, batch_id: UUID, owner_id: UUID) -> Dict[str, int]:
+    """
+    Counts the documents of a bulk upload by status.
+    """
+    statement = (
+        select(PGDocument.status, func.count())
+        .where(PGDocument.batch_id == batch_id)
+        .where(PGDocument.owner_id == owner_id)
+        .group_by(PGDocument.status)
+    )
+    return {status: count for status, count in session.exec(statement)}
+
 def get_document(session: Session, document_id: UUID) -> Optional[PGDocument]:
     """
     Retrieves a document by its ID.
     """
     return session.get(PGDocument, document_id)
 
+def get_processed_duplicate(session: Session, document: PGDocument) -> Optional[PGDocument]:
+    """
+    Finds another fully processed document stored in the same content-addressed
+    file, whose chunks can be reused for `document`.
+    """
+    if document.content_hash is None:
+        return None
+    statement = (
+        select(PGDocument)
+        .where(PGDocument.content_hash == document.content_hash)
+        .where(PGDocument.file_path == document.file_path)
+        .where(PGDocument.status == "COMPLETED")
+        .where(PGDocument.id != document.id)
+        .limit(1)
+    )
+    return session.exec(statement).first()
+
 def update_document_status(session: Session, document: PGDocument, status: str) -> PGDocument:
     """
     Updates the status of a document.
@@ -26,4 +77,219 @@ def update_document_status(session: Session, document: PGDocument, status: str)
     session.add(document)
     session.commit()
     session.refresh(document)
-    return document 
\ No newline at end of file
+    return document
+
+def transition_document_status(
+    session: Session,
+    document_id: UUID,
+    status: str,
+    from_statuses: Iterable[str],
+    claimed_by: Optional[str] = None,
+) -> Optional[PGDocument]:
+    """
+    Moves a document to `status` if it is currently in one of `from_statuses`,
+    in a single UPDATE ... RETURNING statement.
+
+    The check is made by the database as part of the update, so two workers
+    racing for the same document can't both move it; the loser gets None.
+    With `claimed_by`, the document must also still be claimed by that task
+    (see `claim_document`). The returned document is loaded from the RETURNING
+    row, so with a session that doesn't expire on commit reading it costs no
+    further query.
+
+    Returns:
+        The updated document, or None if it doesn't exist, is in another
+        status or is claimed by another task.
+    """
+    statement = (
+        update(PGDocument)
+        .where(PGDocument.id == document_id)
+        .where(PGDocument.status.in_(list(from_statuses)))
+        .values(status=status)
+        .returning(PGDocument)
+    )
+    if claimed_by is not None:
+        statement = statement.where(PGDocument.claimed_by == claimed_by)
+    document = session.execute(statement).scalars().first()
+    session.commit()
+    return document
+
+def transition_documents_status(
+    session: Session,
+    document_ids: Iterable[UUID],
+    status: str,
+    from_statuses: Iterable[str],
+    claimed_by: Optional[str] = None,
+) -> List[UUID]:
+    """
+    Bulk version of `transition_document_status` for batch jobs: one statement
+    for any number of documents.
+
+    Returns:
+        The ids of the documents that were moved; the others don't exist, were
+        in another status or are claimed by another task.
+    """
+    statement = (
+        update(PGDocument)
+        .where(PGDocument.id.in_(list(document_ids)))
+        .where(PGDocument.status.in_(list(from_statuses)))
+        .values(status=status)
+        .returning(PGDocument.id)
+    )
+    if claimed_by is not None:
+        statement = statement.where(PGDocument.claimed_by == claimed_by)
+    moved = list(session.execute(statement).scalars())
+    session.commit()
+    return moved
+
+def claim_document(session: Session, document_id: UUID, task_id: str, stale_before: datetime) -> Optional[PGDocument]:
+    """
+    Moves a document to PROCESSING on behalf of a task, in a single
+    UPDATE ... RETURNING statement, and records the claim.
+
+    A PENDING document can always be claimed. A PROCESSING one can be claimed
+    again by the task that holds it (a retried or redelivered task keeps its
+    id), or by any task once its claim is older than `stale_before`, since
+    the task that held it has evidently died.
+
+    Returns:
+        The claimed document, or None if it doesn't exist or is not claimable.
+    """
+    statement = (
+        update(PGDocument)
+        .where(PGDocument.id == document_id)
+        .where(or_(
+            PGDocument.status == DocumentStatus.PENDING,
+            and_(
+                PGDocument.status == DocumentStatus.PROCESSING,
+                or_(
+                    PGDocument.claimed_by == task_id,
+                    PGDocument.claimed_at.is_(None),
+                    PGDocument.claimed_at < stale_before,
+                ),
+            ),
+        ))
+        .values(status=DocumentStatus.PROCESSING, claimed_by=task_id, claimed_at=datetime.now(timezone.utc))
+        .returning(PGDocument)
+        # Match loaded documents by the returned rows; SQLite loads naive datetimes that can't be compared in Python
+        .execution_options(synchronize_session="fetch")
+    )
+    document = session.execute(statement).scalars().first()
+    session.commit()
+    return document
+
+def replace_document_file(
+    session: Session, document: PGDocument, file_name: str, file_path: str, content_hash: Optional[str] = None
+) -> PGDocument:
+    """
+    Points a document at a new version of its file and queues it for processing again.
+    """
+    document.file_name = file_name
+    document.file_path = file_path
+    document.content_hash = content_hash
+    document.status = "PENDING"
+    session.add(document)
+    session.commit()
+    session.refresh(document)
+    return document
+
+# Async variants, used by the API so that database round trips are awaited on
+# the event loop instead of holding a threadpool worker
+
+async def acreate_document(session: AsyncSession, document_in: DocumentCreate, owner_id: UUID) -> PGDocument:
+    db_document = PGDocument.model_validate(document_in, update={"owner_id": owner_id})
+    session.add(db_document)
+    await session.commit()
+    await session.refresh(db_document)
+    return db_document
+
+async def acreate_documents(
+    session: AsyncSession, documents_in: List[DocumentCreate], owner_id: UUID, batch_id: Optional[UUID] = None
+) -> List[PGDocument]:
+    """
+    Async version of `create_documents`.
+    """
+    documents = [
+        PGDocument.model_validate(document_in, update={"owner_id": owner_id, "batch_id": batch_id})
+        for document_in in documents_in
+    ]
+    ids = [document.id for document in documents]
+    session.add_all(documents)
+    await session.commit()
+
+    result = await session.exec(select(PGDocument).where(PGDocument.id.in_(ids)))
+    loaded = {document.id: document for document in result}
+    return [loaded[document_id] for document_id in ids]
+
+async def aget_batch_status_counts(session: AsyncSession, batch_id: UUID, owner_id: UUID) -> Dict[str, int]:
+    """
+    Async version of `get_batch_status_counts`.
+    """
+    statement = (
+        select(PGDocument.status, func.count())
+        .where(PGDocument.batch_id == batch_id)
+        .where(PGDocument.owner_id == owner_id)
+        .group_by(PGDocument.status)
+    )
+    return {status: count for status, count in await session.exec(statement)}
+
+async def aget_referenced_file_paths(session: AsyncSession, file_paths: Iterable[str]) -> Set[str]:
+    """
+    Returns those of `file_paths` that at least one document is stored in.
+    """
+    statement = select(PGDocument.file_path).where(PGDocument.file_path.in_(list(file_paths))).distinct()
+    return set(await session.exec(statement))
+
+async def aget_document(session: AsyncSession, document_id: UUID) -> Optional[PGDocument]:
+    """
+    Async version of `get_document`.
+    """
+    return await session.get(PGDocument, document_id)
+
+async def aupdate_document_status(session: AsyncSession, document: PGDocument, status: str) -> PGDocument:
+    """
+    Async version of `update_document_status`.
+    """
+    document.status = status
+    session.add(document)
+    await session.commit()
+    await session.refresh(document)
+    return document
+
+async def atransition_documents_status(
+    session: AsyncSession,
+    document_ids: Iterable[UUID],
+    status: str,
+    from_statuses: Iterable[str],
+    claimed_by: Optional[str] = None,
+) -> List[UUID]:
+    """
+    Async version of `transition_documents_status`.
+    """
+    statement = (
+        update(PGDocument)
+        .where(PGDocument.id.in_(list(document_ids)))
+        .where(PGDocument.status.in_(list(from_statuses)))
+        .values(status=status)
+        .returning(PGDocument.id)
+    )
+    if claimed_by is not None:
+        statement = statement.where(PGDocument.claimed_by == claimed_by)
+    moved = list((await session.exec(statement)).scalars())
+    await session.commit()
+    return moved
+
+async def areplace_document_file(
+    session: AsyncSession, document: PGDocument, file_name: str, file_path: str, content_hash: Optional[str] = None
+) -> PGDocument:
+    """
+    Async version of `replace_document_file`.
+    """
+    document.file_name = file_name
+    document.file_path = file_path
+    document.content_hash = content_hash
+    document.status = "PENDING"
+    session.add(document)
+    await session.commit()
+    await session.refresh(document)
+    return document
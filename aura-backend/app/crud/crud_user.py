@@ -1,16 +1,20 @@
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import Optional
 from app.db.models_pg import User
 from app.schemas.user_schemas import UserCreate
 from app.core.security import get_password_hash
+from app.services.user_cache import get_user_cache
 
-def create_user(db: Session, *, user_in: UserCreate) -> User:
+def create_user(db: Session, *, user_in: UserCreate, hashed_password: Optional[str] = None) -> User:
     """
     Create a new user in the database.
 
     Args:
         db: The database session.
         user_in: The user creation data (from API).
+        hashed_password: The password's hash, if the caller already computed
+                         it off the event loop; otherwise it is hashed here.
 
     Returns:
         The newly created user object.
@@ -18,7 +22,7 @@ def create_user(db: Session, *, user_in: UserCreate) -> User:
     # Create a dictionary of the data for the new user instance
     # Hash the password before storing it
     user_data = user_in.model_dump()
-    user_data["hashed_password"] = get_password_hash(user_in.password)
+    user_data["hashed_password"] = hashed_password or get_password_hash(user_in.password)
     del user_data["password"] # Remove the plain password
 
     db_user = User(**user_data)
@@ -40,4 +44,83 @@ def get_user_by_email(db: Session, *, email: str) -> Optional[User]:
     Returns:
         The user object or None if not found.
     """
-    return db.exec(select(User).where(User.email == email)).first() 
\ No newline at end of file
+    return db.exec(select(User).where(User.email == email)).first()
+
+def update_password_hash(db: Session, *, user: User, hashed_password: str) -> User:
+    """
+    Replace a user's password hash, e.g. with one using the current work factor.
+
+    Args:
+        db: The database session.
+        user: The user to update.
+        hashed_password: The new hash of the user's unchanged password.
+
+    Returns:
+        The updated user object.
+    """
+    user.hashed_password = hashed_password
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+def set_user_active(db: Session, *, user: User, is_active: bool) -> User:
+    """
+    Activate or deactivate a user.
+
+    The user is dropped from the authenticated user cache, so a deactivated
+    user is refused on their next request.
+
+    Args:
+        db: The database session.
+        user: The user to update.
+        is_active: Whether the user may log in and use the API.
+
+    Returns:
+        The updated user object.
+    """
+    user.is_active = is_active
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+
+    user_cache = get_user_cache()
+    if user_cache is not None:
+        user_cache.invalidate(user.email)
+
+    return user
+
+# Async variants, used by the API so that database round trips are awaited on
+# the event loop instead of holding a threadpool worker
+
+async def acreate_user(db: AsyncSession, *, user_in: UserCreate, hashed_password: str) -> User:
+    """
+    Async version of `create_user`. The password must already be hashed,
+    since hashing here would block the event loop.
+    """
+    user_data = user_in.model_dump()
+    user_data["hashed_password"] = hashed_password
+    del user_data["password"]
+
+    db_user = User(**user_data)
+    db.add(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    return db_user
+
+async def aget_user_by_email(db: AsyncSession, *, email: str) -> Optional[User]:
+    """
+    Async version of `get_user_by_email`.
+    """
+    result = await db.exec(select(User).where(User.email == email))
+    return result.first()
+
+async def aupdate_password_hash(db: AsyncSession, *, user: User, hashed_password: str) -> User:
+    """
+    Async version of `update_password_hash`.
+    """
+    user.hashed_password = hashed_password
+    db.add(user)
+    await db.commit()
+    await db.refresh(user)
+    return user
@@ -3,6 +3,14 @@ from typing import Optional, List
 from datetime import datetime, timezone
 import sqlalchemy as sa
 from uuid import UUID, uuid4
+from enum import Enum
+
+class DocumentStatus(str, Enum):
+    PENDING = "PENDING"
+    PROCESSING = "PROCESSING"
+    COMPLETED = "COMPLETED"
+    FAILED = "FAILED"
+
 
 class User(SQLModel, table=True):
     id: UUID = Field(default_factory=uuid4, primary_key=True)
@@ -22,6 +30,11 @@ class Document(SQLModel, table=True):
         sa_column=Column(DateTime(timezone=True), default=sa.func.now(), nullable=False)
     )
     status: str = Field(default="PENDING") # e.g., PENDING, PROCESSING, COMPLETED, FAILED
+    content_hash: Optional[str] = Field(default=None, index=True) # SHA-256 of the file
+    batch_id: Optional[UUID] = Field(default=None, index=True) # Set for documents uploaded in bulk
+    # The Celery task processing the document, and when it claimed it
+    claimed_by: Optional[str] = Field(default=None)
+    claimed_at: Optional[datetime] = Field(default=None, sa_column=Column(DateTime(timezone=True), nullable=True))
 
     owner_id: Optional[UUID] = Field(default=None, foreign_key="user.id")
     owner: Optional["User"] = Relationship(back_populates="documents") 
\ No newline at end of file
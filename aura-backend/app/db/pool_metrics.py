@@ -0,0 +1,89 @@
+"""
+Connection pool instrumentation: how long checkouts wait and how full the pool is.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Any, Dict
+
+import numpy as np
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+# Number of recent checkouts the wait time percentiles are computed over
+WAIT_WINDOW = 1024
+
+
+class PoolMetrics:
+    """Counts checkouts and records how long each one waited for a connection."""
+
+    def __init__(self, window: int = WAIT_WINDOW):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self._recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, wait: float, timed_out: bool = False):
+        with self._lock:
+            self.checkouts += 1
+            self.timeouts += timed_out
+            self.wait_seconds_total += wait
+            self.wait_seconds_max = max(self.wait_seconds_max, wait)
+            self._recent.append(wait)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            recent = list(self._recent)
+            p50, p99 = np.percentile(recent, [50, 99]) if recent else (0.0, 0.0)
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": self.wait_seconds_total,
+                "wait_seconds_max": self.wait_seconds_max,
+                "wait_seconds_p50": float(p50),
+                "wait_seconds_p99": float(p99),
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    A `QueuePool` that times every checkout: waiting for a free connection,
+    opening a new one and the pre-ping all count, as that is what a request
+    waits for before its first query.
+    """
+
+    def __init__(self, creator, pool_size: int = 5, max_overflow: int = 10, **kw):
+        super().__init__(creator, pool_size=pool_size, max_overflow=max_overflow, **kw)
+        self.capacity = pool_size + max_overflow if max_overflow >= 0 else None
+        self.metrics = PoolMetrics()
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except PoolTimeoutError:
+            self.metrics.record(time.perf_counter() - started, timed_out=True)
+            raise
+        self.metrics.record(time.perf_counter() - started)
+        return connection
+
+    def status_metrics(self) -> Dict[str, Any]:
+        """The pool's occupancy and checkout wait times."""
+        checked_out = self.checkedout()
+        return {
+            "size": self.size(),
+            "capacity": self.capacity,
+            "checked_out": checked_out,
+            "checked_in": self.checkedin(),
+            "overflow": max(0, self.overflow()),
+            "saturation": checked_out / self.capacity if self.capacity else None,
+            **self.metrics.snapshot(),
+        }
+
+
+class InstrumentedAsyncQueuePool(InstrumentedQueuePool, AsyncAdaptedQueuePool):
+    """The asyncio-compatible `InstrumentedQueuePool`, for async engines."""
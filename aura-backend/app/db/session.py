@@ -1,11 +1,87 @@
+from typing import Any, AsyncGenerator, Dict, Optional
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlmodel import create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app.core.config import settings
+from app.db.pool_metrics import InstrumentedAsyncQueuePool, InstrumentedQueuePool
 
 if settings.DATABASE_URL is None:
     raise ValueError("DATABASE_URL is not set in the environment or .env file")
 
-engine = create_engine(str(settings.DATABASE_URL), echo=True)
+# Drivers of the async engine, by backend
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
+def async_database_url(database_url: str) -> str:
+    """The URL of the same database through its asyncio driver, e.g. postgresql+asyncpg://."""
+    url = make_url(database_url)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        raise ValueError(f"No async driver for {url.get_backend_name()} databases")
+    return url.set(drivername=f"{url.get_backend_name()}+{driver}").render_as_string(hide_password=False)
+
+def engine_options(database_url: str, is_async: bool = False) -> Dict[str, Any]:
+    """
+    Engine keyword arguments for a database URL, from the DB_* settings.
+
+    In-memory SQLite databases keep SQLAlchemy's default pool, since every
+    connection to them would open a different, empty database.
+    """
+    url = make_url(database_url)
+    options: Dict[str, Any] = {"echo": settings.DB_ECHO}
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return options
+
+    options.update(
+        poolclass=InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+    )
+    if url.get_backend_name() == "postgresql" and settings.DB_STATEMENT_TIMEOUT is not None:
+        # A runaway query fails instead of holding its pooled connection indefinitely
+        if is_async:
+            options["connect_args"] = {"server_settings": {"statement_timeout": str(settings.DB_STATEMENT_TIMEOUT)}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT}"}
+    return options
+
+# The API serves requests from the async engine; Celery workers and scripts use the sync one
+engine = create_engine(str(settings.DATABASE_URL), **engine_options(str(settings.DATABASE_URL)))
+async_engine = create_async_engine(
+    async_database_url(str(settings.DATABASE_URL)), **engine_options(str(settings.DATABASE_URL), is_async=True)
+)
+
+def _pool_metrics(bind: Engine) -> Optional[Dict[str, Any]]:
+    if not isinstance(bind.pool, InstrumentedQueuePool):
+        return None
+    return bind.pool.status_metrics()
+
+def get_pool_metrics() -> Optional[Dict[str, Any]]:
+    """The connection pool's occupancy and checkout wait times, or None if it isn't instrumented."""
+    return _pool_metrics(engine)
+
+def get_async_pool_metrics() -> Optional[Dict[str, Any]]:
+    """Like `get_pool_metrics`, for the async engine's pool."""
+    return _pool_metrics(async_engine.sync_engine)
+
+def dispose_engine_after_fork():
+    """
+    Drops the connections a forked process inherited from its parent.
+
+    They are abandoned rather than closed, which would close the parent's
+    sockets too; the child opens its own connections as it needs them.
+    """
+    engine.dispose(close=False)
+    async_engine.sync_engine.dispose(close=False)
 
 def get_db():
     with Session(engine) as session:
-        yield session 
\ No newline at end of file
+        yield session
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    # Loaded objects stay usable after a commit, without a lazy load that can't run outside a greenlet
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
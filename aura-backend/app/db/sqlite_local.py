@@ -0,0 +1,32 @@
+"""
+Per-thread connections to the local SQLite files used for caches and indexes.
+"""
+
+import sqlite3
+import threading
+
+
+class ThreadLocalSQLite:
+    """
+    Opens one connection per thread to a SQLite database, on first use.
+
+    sqlite3 connections can't be shared between threads, and opening one per
+    statement would re-read the schema every time. File databases use WAL
+    mode, so readers in other processes aren't blocked by a writer.
+    """
+
+    def __init__(self, target: str, uri: bool = False, timeout: float = 30):
+        self.target = target
+        self.uri = uri
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def connection(self) -> sqlite3.Connection:
+        """The calling thread's connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.target, uri=self.uri, timeout=self.timeout)
+            if "mode=memory" not in self.target:
+                conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
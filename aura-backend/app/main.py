@@ -1,10 +1,17 @@
+import asyncio
+import logging
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
+from app.core.body_limit import BodySizeLimitMiddleware
+from app.db.session import get_async_pool_metrics, get_pool_metrics
 from app.db.graph_db import GraphDB
+from app.services.vector_store_service import init_vector_store_pool, aclose_vector_store_pool
 from app.api.v1 import auth, users, documents
 
+logger = logging.getLogger(__name__)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup: connect to the graph database
@@ -13,12 +20,32 @@ async def lifespan(app: FastAPI):
         user=settings.NEO4J_USER,
         password=settings.NEO4J_PASSWORD,
     )
+    # Startup: connect the shared vector store client, so the first query doesn't pay for it
+    app.state.vector_store_pool = init_vector_store_pool()
+    if not settings.TESTING:
+        try:
+            await app.state.vector_store_pool.get_async_service()
+        except Exception as e:
+            # Not fatal: the pool reconnects on the next request once Chroma is reachable
+            logger.warning(f"Could not connect to Chroma at startup: {e}")
+    # Startup: load the query embedding model off the event loop, before serving queries
+    if settings.EMBEDDING_WARMUP_ON_API_START and not settings.TESTING:
+        from app.services.embedding_service import embedding_service
+        await asyncio.to_thread(embedding_service.warm_up)
     yield
-    # Shutdown: close the graph database connection
+    # Shutdown: close the graph database and vector store connections
     app.state.graph_db.close()
+    await aclose_vector_store_pool()
 
 app = FastAPI(title="Aura API", version="0.1.0", lifespan=lifespan)
 
+# Reject oversized uploads before they are spooled to disk, allowing for multipart framing
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    max_size=settings.MAX_UPLOAD_SIZE + 64 * 1024,
+    overrides={f"{settings.API_V1_STR}/documents/upload/bulk": settings.MAX_BULK_UPLOAD_SIZE + 1024 * 1024},
+)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -39,4 +66,13 @@ app.include_router(documents.router, prefix=f"{settings.API_V1_STR}/documents",
 
 @app.get("/")
 def read_root():
-    return {"message": "Welcome to the Aura API"} 
\ No newline at end of file
+    return {"message": "Welcome to the Aura API"}
+
+@app.get("/metrics")
+def read_metrics():
+    """
+    Process metrics: database pool occupancy ("saturation" is the share of its
+    capacity checked out) and how long requests waited for a connection, for
+    the async engine the API uses and the sync one.
+    """
+    return {"db_pool": get_pool_metrics(), "async_db_pool": get_async_pool_metrics()}
@@ -1,12 +1,13 @@
-from sqlmodel import SQLModel
+from sqlmodel import Field, SQLModel
 from datetime import datetime
 from uuid import UUID
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 # Schema for creating a document (internal, not directly from API)
 class DocumentCreate(SQLModel):
     file_name: str
     file_path: str
+    content_hash: Optional[str] = None
 
 # Schema for reading document metadata
 class DocumentRead(SQLModel):
@@ -22,11 +23,46 @@ class DocumentCreateResponse(SQLModel):
     file_name: str
     status: str
 
+# Schema for the response after a bulk upload
+class BulkUploadResponse(SQLModel):
+    batch_id: UUID
+    documents: List[DocumentCreateResponse]
+    skipped: List[str] = []
+
+# Schema for the aggregate processing status of a bulk upload
+class BatchStatusResponse(SQLModel):
+    batch_id: UUID
+    total: int
+    counts: Dict[str, int]
+    done: bool
+
+# Schema for starting a resumable upload
+class UploadSessionCreate(SQLModel):
+    file_name: str
+    size: int = Field(gt=0)
+
+# Schema for the state of a resumable upload
+class UploadSessionRead(SQLModel):
+    id: UUID
+    file_name: str
+    size: int
+    offset: int
+
 # Schema for querying a document
 class DocumentQueryRequest(SQLModel):
     question: str
 
+# Schema for querying across the user's whole library
+class LibraryQueryRequest(SQLModel):
+    question: str
+    document_ids: Optional[List[UUID]] = None
+    document_types: Optional[List[str]] = None
+    uploaded_after: Optional[datetime] = None
+    uploaded_before: Optional[datetime] = None
+    n_results: Optional[int] = Field(default=None, ge=1, le=50)
+
 # Schema for the response after querying a document
 class DocumentQueryResponse(SQLModel):
     answer: str
-    chunks_used: List[Dict[str, Any]] 
\ No newline at end of file
+    chunks_used: List[Dict[str, Any]]
+    context_tokens: Optional[int] = None 
\ No newline at end of file
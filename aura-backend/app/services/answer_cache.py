@@ -0,0 +1,275 @@
+"""
+Answer cache for repeated questions against the same document.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+from uuid import UUID
+
+import numpy as np
+
+from app.core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+EmbedFn = Callable[[str], np.ndarray]
+
+
+def normalize_question(question: str) -> str:
+    """Lowercases, collapses whitespace and drops trailing punctuation."""
+    return re.sub(r"\s+", " ", question).strip().lower().rstrip("?!. ")
+
+
+def _hash(value: str) -> str:
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+
+class MemoryAnswerStore:
+    """In-process store with LRU eviction and a per-entry TTL."""
+
+    blocking = False
+
+    def __init__(self, max_entries: int, ttl: int):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._vectors: Dict[str, "OrderedDict[str, np.ndarray]"] = {}
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def generation(self, document_id: str) -> int:
+        with self._lock:
+            return self._generations.get(document_id, 0)
+
+    def bump_generation(self, document_id: str):
+        with self._lock:
+            self._generations[document_id] = self._generations.get(document_id, 0) + 1
+            for scope in [s for s in self._vectors if s.startswith(f"{document_id}:")]:
+                del self._vectors[scope]
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def add_vector(self, scope: str, key: str, vector: np.ndarray):
+        with self._lock:
+            vectors = self._vectors.setdefault(scope, OrderedDict())
+            vectors[key] = vector
+            while len(vectors) > self.max_entries:
+                vectors.popitem(last=False)
+
+    def get_vectors(self, scope: str) -> Dict[str, np.ndarray]:
+        with self._lock:
+            return dict(self._vectors.get(scope, {}))
+
+
+class RedisAnswerStore:
+    """
+    Shared store in Redis; entries and question vectors expire after the TTL.
+
+    A scope's question vectors live in one hash, with a sorted set scoring
+    each vector by its expiry time. Expired vectors are pruned on every add
+    and lookup, and a scope keeps at most `max_entries` vectors, the ones
+    expiring first being evicted.
+    """
+
+    blocking = True
+
+    def __init__(self, client: Any, ttl: int, max_entries: int, prefix: str = "aura:answers"):
+        self.client = client
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.prefix = prefix
+
+    def generation(self, document_id: str) -> int:
+        value = self.client.get(f"{self.prefix}:gen:{document_id}")
+        return int(value) if value else 0
+
+    def bump_generation(self, document_id: str):
+        self.client.incr(f"{self.prefix}:gen:{document_id}")
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.client.get(f"{self.prefix}:{key}")
+        return value.decode("utf-8") if value is not None else None
+
+    def set(self, key: str, value: str):
+        self.client.set(f"{self.prefix}:{key}", value, ex=self.ttl)
+
+    def add_vector(self, scope: str, key: str, vector: np.ndarray):
+        name, expiries = self._vector_keys(scope)
+        pipe = self.client.pipeline()
+        pipe.hset(name, key, vector.astype(np.float32).tobytes())
+        pipe.zadd(expiries, {key: time.time() + self.ttl})
+        # The whole scope goes once its newest vector has expired
+        pipe.expire(name, self.ttl)
+        pipe.expire(expiries, self.ttl)
+        pipe.execute()
+        self._prune(scope)
+
+    def get_vectors(self, scope: str) -> Dict[str, np.ndarray]:
+        self._prune(scope)
+        name, _ = self._vector_keys(scope)
+        raw = self.client.hgetall(name)
+        return {k.decode("utf-8"): np.frombuffer(v, dtype=np.float32) for k, v in raw.items()}
+
+    def _vector_keys(self, scope: str) -> Tuple[str, str]:
+        return f"{self.prefix}:vectors:{scope}", f"{self.prefix}:vector-expiry:{scope}"
+
+    def _prune(self, scope: str):
+        """Drops the scope's expired vectors and those over `max_entries`."""
+        name, expiries = self._vector_keys(scope)
+        pipe = self.client.pipeline()
+        pipe.zrangebyscore(expiries, "-inf", time.time())
+        pipe.zrange(expiries, 0, -(self.max_entries + 1))
+        expired, overflow = pipe.execute()
+        stale = set(expired) | set(overflow)
+        if stale:
+            pipe = self.client.pipeline()
+            pipe.hdel(name, *stale)
+            pipe.zrem(expiries, *stale)
+            pipe.execute()
+
+
+class AnswerCache:
+    """
+    Caches RAG answers per document, model and prompt settings.
+
+    Exact repeats are matched on the normalized question. When a
+    `similarity_threshold` is set, a question whose embedding has a cosine
+    similarity of at least the threshold with a cached question reuses that
+    answer. Reprocessing a document bumps its generation, which invalidates
+    every cached answer for it at once. Store errors are logged and treated
+    as cache misses, so the cache never fails a query.
+    """
+
+    def __init__(
+        self,
+        store: Any,
+        similarity_threshold: Optional[float] = None,
+        embed_fn: Optional[EmbedFn] = None,
+    ):
+        self.store = store
+        self.similarity_threshold = similarity_threshold
+        self._embed_fn = embed_fn
+
+    def get(self, document_id: UUID, question: str, prompt_settings: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Returns the cached response dictionary, or None on a miss."""
+        try:
+            scope = self._scope(document_id, prompt_settings)
+            key = f"{scope}:{_hash(normalize_question(question))}"
+            value = self.store.get(key)
+            if value is None and self.similarity_threshold is not None:
+                value = self._get_similar(scope, question)
+            return json.loads(value) if value is not None else None
+        except Exception as e:
+            logger.warning(f"Answer cache lookup failed: {e}")
+            return None
+
+    def set(self, document_id: UUID, question: str, prompt_settings: Dict[str, Any], response: Dict[str, Any]):
+        """Stores a response dictionary for the question."""
+        try:
+            scope = self._scope(document_id, prompt_settings)
+            question_hash = _hash(normalize_question(question))
+            self.store.set(f"{scope}:{question_hash}", json.dumps(response))
+            if self.similarity_threshold is not None:
+                self.store.add_vector(scope, question_hash, self._embed(question))
+        except Exception as e:
+            logger.warning(f"Answer cache store failed: {e}")
+
+    def invalidate_document(self, document_id: UUID):
+        """Drops every cached answer for a document."""
+        try:
+            self.store.bump_generation(str(document_id))
+        except Exception as e:
+            logger.warning(f"Answer cache invalidation failed for {document_id}: {e}")
+
+    async def aget(self, document_id: UUID, question: str, prompt_settings: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Async version of `get`; network and embedding work runs off the event loop."""
+        if self.store.blocking or self.similarity_threshold is not None:
+            return await asyncio.to_thread(self.get, document_id, question, prompt_settings)
+        return self.get(document_id, question, prompt_settings)
+
+    async def aset(self, document_id: UUID, question: str, prompt_settings: Dict[str, Any], response: Dict[str, Any]):
+        """Async version of `set`."""
+        if self.store.blocking or self.similarity_threshold is not None:
+            await asyncio.to_thread(self.set, document_id, question, prompt_settings, response)
+        else:
+            self.set(document_id, question, prompt_settings, response)
+
+    def _scope(self, document_id: UUID, prompt_settings: Dict[str, Any]) -> str:
+        generation = self.store.generation(str(document_id))
+        settings_hash = _hash(json.dumps(prompt_settings, sort_keys=True, default=str))[:16]
+        return f"{document_id}:{generation}:{settings_hash}"
+
+    def _get_similar(self, scope: str, question: str) -> Optional[str]:
+        vectors = self.store.get_vectors(scope)
+        if not vectors:
+            return None
+        keys = list(vectors)
+        matrix = np.stack([vectors[k] for k in keys])
+        scores = matrix @ self._embed(question)
+        best = int(np.argmax(scores))
+        if scores[best] < self.similarity_threshold:
+            return None
+        return self.store.get(f"{scope}:{keys[best]}")
+
+    def _embed(self, question: str) -> np.ndarray:
+        if self._embed_fn is None:
+            from app.services.embedding_service import embedding_service
+            self._embed_fn = lambda text: embedding_service.embed_batch([text])[0]
+        vector = np.asarray(self._embed_fn(normalize_question(question)), dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+
+_answer_cache: Optional[AnswerCache] = None
+_answer_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> Optional[AnswerCache]:
+    """
+    Returns the process-wide answer cache, or None when caching is disabled.
+
+    The Redis backend is shared by every API and worker process, so a
+    document reprocessed by a worker is invalidated for all API processes.
+    """
+    global _answer_cache
+    if not settings.ANSWER_CACHE_ENABLED:
+        return None
+    with _answer_cache_lock:
+        if _answer_cache is None:
+            if settings.ANSWER_CACHE_BACKEND == "redis" and not settings.TESTING:
+                from app.core.redis_client import get_cache_redis
+                store = RedisAnswerStore(
+                    get_cache_redis(), ttl=settings.ANSWER_CACHE_TTL, max_entries=settings.ANSWER_CACHE_MAX_ENTRIES
+                )
+            else:
+                store = MemoryAnswerStore(
+                    max_entries=settings.ANSWER_CACHE_MAX_ENTRIES, ttl=settings.ANSWER_CACHE_TTL
+                )
+            _answer_cache = AnswerCache(
+                store, similarity_threshold=settings.ANSWER_CACHE_SIMILARITY_THRESHOLD
+            )
+        return _answer_cache
@@ -0,0 +1,261 @@
+"""
+Pluggable strategies for splitting a document's text into chunks.
+
+Every chunker consumes the text as a stream of blocks, so documents never
+have to be held in memory whole, and yields `Chunk`s carrying their character
+offsets in the source text.
+"""
+
+import re
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+from app.core.config import settings
+
+
+LengthFn = Callable[[str], int]
+
+_PARAGRAPH_BREAK = re.compile(r"\n[ \t]*\n\s*")
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?])[\"')\]]*\s+")
+_HEADING = re.compile(r"^(#{1,6})[ \t]+(.+?)[ \t#]*$", re.M)
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+# Flush text with no paragraph break once this much is buffered, to bound memory
+_MAX_BUFFER = 1024 * 1024
+
+
+class Chunk(NamedTuple):
+    """A chunk of text and where it came from in the source."""
+    text: str
+    start: int
+    end: int
+    metadata: Optional[Dict[str, str]] = None
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Approximates the number of subword tokens in a text: words and punctuation
+    marks, scaled for words that tokenizers split into several pieces.
+    """
+    return (len(_TOKEN.findall(text)) * 4 + 2) // 3
+
+
+class CharacterChunker:
+    """
+    Fixed-size character windows with overlap, cut regardless of word and
+    sentence boundaries. This is the original splitter, identical to `chunk_text`.
+    """
+    name = "character"
+
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200):
+        if chunk_overlap >= chunk_size:
+            raise ValueError("chunk_overlap must be smaller than chunk_size.")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+
+    def chunk(self, blocks: Iterable[str]) -> Iterator[Chunk]:
+        """Chunks a stream of text blocks, carrying the overlap region across block boundaries."""
+        size, step = self.chunk_size, self.chunk_size - self.chunk_overlap
+        buffer, offset = "", 0
+        for block in blocks:
+            buffer += block
+            while len(buffer) >= size:
+                yield Chunk(buffer[:size], offset, offset + size)
+                buffer, offset = buffer[step:], offset + step
+
+        # Flush the tail exactly as `chunk_text` would
+        while buffer:
+            text = buffer[:size]
+            yield Chunk(text, offset, offset + len(text))
+            buffer, offset = buffer[step:], offset + step
+
+
+class _Unit(NamedTuple):
+    text: str
+    start: int
+    separator: str  # joins the unit to the previous one in a chunk
+    heading_level: int = 0
+
+
+class StructuredChunker:
+    """
+    Packs whole structural units into chunks of at most `max_tokens` tokens.
+
+    With `boundary="paragraph"`, chunks end only between paragraphs unless a
+    single paragraph is too long, which is then split between sentences. With
+    `boundary="sentence"`, chunks fill up sentence by sentence, so paragraphs
+    may be split across chunks. With `markdown=True`, each heading starts a new
+    chunk and the heading path is recorded as the chunk's "section".
+
+    Chunks do not overlap: each boundary is a natural break, so the context a
+    fixed window would lose at its edges is not lost here.
+    """
+
+    def __init__(
+        self,
+        max_tokens: Optional[int] = None,
+        boundary: str = "paragraph",
+        markdown: bool = False,
+        length_fn: LengthFn = estimate_tokens,
+    ):
+        if boundary not in ("paragraph", "sentence"):
+            raise ValueError(f"Unknown chunk boundary: {boundary}")
+        self.max_tokens = max_tokens or settings.CHUNK_MAX_TOKENS
+        self.boundary = boundary
+        self.markdown = markdown
+        self.length_fn = length_fn
+
+    @property
+    def name(self) -> str:
+        return "markdown" if self.markdown else self.boundary
+
+    def chunk(self, blocks: Iterable[str]) -> Iterator[Chunk]:
+        units: List[_Unit] = []
+        tokens = 0
+        section: List[str] = []
+        chunk_section = ""
+
+        def flush() -> Optional[Chunk]:
+            if not units:
+                return None
+            text = units[0].text + "".join(u.separator + u.text for u in units[1:])
+            end = units[-1].start + len(units[-1].text)
+            return Chunk(text, units[0].start, end, {"section": chunk_section} if chunk_section else None)
+
+        for unit in self._units(blocks):
+            if unit.heading_level:
+                # Consecutive headings share a chunk with the text under the last one
+                if not all(u.heading_level for u in units):
+                    yield flush()
+                    units, tokens = [], 0
+                section = section[:unit.heading_level - 1] + [unit.text.lstrip("#").strip()]
+
+            for piece in self._fit(unit):
+                n = self.length_fn(piece.text)
+                # A heading stays with the text that follows it, even if that overflows
+                if units and tokens + n > self.max_tokens and not all(u.heading_level for u in units):
+                    yield flush()
+                    units, tokens = [], 0
+                if not units or piece.heading_level:
+                    chunk_section = " > ".join(section)
+                units.append(piece)
+                tokens += n
+
+        chunk = flush()
+        if chunk:
+            yield chunk
+
+    def _units(self, blocks: Iterable[str]) -> Iterator[_Unit]:
+        for paragraph in _iter_paragraphs(blocks):
+            parts = _split_headings(paragraph) if self.markdown else [paragraph]
+            for part in parts:
+                if self.boundary == "sentence" and not part.heading_level:
+                    yield from _split(part, _SENTENCE_BREAK)
+                else:
+                    yield part
+
+    def _fit(self, unit: _Unit) -> Iterator[_Unit]:
+        """Splits a unit that is too long for one chunk, at sentences and then at words."""
+        if self.length_fn(unit.text) <= self.max_tokens:
+            yield unit
+            return
+        sentences = list(_split(unit, _SENTENCE_BREAK))
+        if len(sentences) > 1:
+            for sentence in sentences:
+                yield from self._fit(sentence)
+            return
+
+        words = list(_split(unit, re.compile(r"\s+")))
+        current: List[_Unit] = []
+        tokens = 0
+        for word in words:
+            n = self.length_fn(word.text)
+            if current and tokens + n > self.max_tokens:
+                yield _join(current)
+                current, tokens = [], 0
+            current.append(word)
+            tokens += n
+        if current:
+            yield _join(current)
+
+
+def _join(units: List[_Unit]) -> _Unit:
+    text = units[0].text + "".join(u.separator + u.text for u in units[1:])
+    return _Unit(text, units[0].start, units[0].separator)
+
+
+def _split(unit: _Unit, pattern: "re.Pattern") -> Iterator[_Unit]:
+    """Splits a unit at a pattern; the first part keeps the unit's separator."""
+    position, separator = 0, unit.separator
+    for match in pattern.finditer(unit.text):
+        if match.start() > position:
+            yield _Unit(unit.text[position:match.start()], unit.start + position, separator)
+            separator = " "
+        position = match.end()
+    if position < len(unit.text):
+        yield _Unit(unit.text[position:], unit.start + position, separator)
+
+
+def _split_headings(paragraph: _Unit) -> List[_Unit]:
+    """Separates Markdown heading lines from the text around them."""
+    parts: List[_Unit] = []
+    position = 0
+    for match in _HEADING.finditer(paragraph.text):
+        parts.extend(_stripped(paragraph.text[position:match.start()], paragraph.start + position, "\n\n"))
+        parts.append(_Unit(match.group(0).strip(), paragraph.start + match.start(), "\n\n", len(match.group(1))))
+        position = match.end()
+    parts.extend(_stripped(paragraph.text[position:], paragraph.start + position, "\n\n"))
+    return parts
+
+
+def _stripped(text: str, start: int, separator: str) -> List[_Unit]:
+    stripped = text.strip()
+    if not stripped:
+        return []
+    return [_Unit(stripped, start + text.index(stripped), separator)]
+
+
+def _iter_paragraphs(blocks: Iterable[str]) -> Iterator[_Unit]:
+    """Yields the paragraphs of a stream of text blocks with their offsets."""
+    buffer, offset = "", 0
+    for block in blocks:
+        buffer += block
+        last = None
+        for last in _PARAGRAPH_BREAK.finditer(buffer):
+            pass
+        if last is not None:
+            cut, resume = last.start(), last.end()
+        elif len(buffer) > _MAX_BUFFER:
+            newline = buffer.rfind("\n")
+            cut = resume = newline + 1 if newline > 0 else len(buffer)
+        else:
+            continue
+        yield from _paragraphs_in(buffer[:cut], offset)
+        buffer, offset = buffer[resume:], offset + resume
+    yield from _paragraphs_in(buffer, offset)
+
+
+def _paragraphs_in(text: str, offset: int) -> Iterator[_Unit]:
+    position = 0
+    for match in _PARAGRAPH_BREAK.finditer(text):
+        yield from _stripped(text[position:match.start()], offset + position, "\n\n")
+        position = match.end()
+    yield from _stripped(text[position:], offset + position, "\n\n")
+
+
+def get_chunker(name: Optional[str] = None, file_name: str = ""):
+    """
+    Returns the chunker registered under `name` (default: settings.CHUNKER).
+
+    "auto" picks the Markdown chunker for Markdown files and DOCX files (whose
+    headings are extracted as Markdown) and the paragraph chunker otherwise.
+    """
+    name = name or settings.CHUNKER
+    if name == "auto":
+        name = "markdown" if file_name.lower().endswith((".md", ".markdown", ".docx")) else "paragraph"
+    if name == "character":
+        return CharacterChunker(settings.CHUNK_SIZE, settings.CHUNK_OVERLAP)
+    if name in ("paragraph", "sentence"):
+        return StructuredChunker(boundary=name)
+    if name == "markdown":
+        return StructuredChunker(markdown=True)
+    raise ValueError(f"Unknown chunker: {name}")
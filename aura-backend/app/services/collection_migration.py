@@ -0,0 +1,116 @@
+"""
+Moves chunks out of the single legacy `aura_collection` into per-owner collections.
+
+Run once after deploying per-owner collections:
+
+    python -m app.services.collection_migration
+"""
+
+import logging
+from typing import Callable, Dict, List, Optional
+from uuid import UUID
+
+from app.db.models_pg import Document
+from app.services.ingestion_service import document_chunk_metadata
+from app.services.keyword_index import KeywordIndex
+from app.services.vector_store_service import LEGACY_COLLECTION_NAME, VectorStoreService
+
+
+logger = logging.getLogger(__name__)
+
+DocumentLookup = Callable[[List[UUID]], Dict[UUID, Document]]
+
+
+def migrate_legacy_collection(
+    vector_store_service: VectorStoreService,
+    get_documents: DocumentLookup,
+    batch_size: int = 500,
+    keyword_index: Optional[KeywordIndex] = None,
+) -> Dict[str, int]:
+    """
+    Copies every chunk of the legacy collection into its owner's collection.
+
+    Chunks are read in batches together with their embeddings, so nothing is
+    re-embedded. Each batch is upserted into the owner collections, with the
+    library metadata from `document_chunk_metadata` filled in, and only then
+    deleted from the legacy collection. An interrupted migration can therefore
+    simply be run again. Chunks whose document no longer exists are dropped.
+    The legacy collection is deleted once it is empty.
+
+    Args:
+        vector_store_service: The vector store to migrate.
+        get_documents: Returns the documents for a list of ids; missing ids
+            are left out.
+        batch_size: Number of chunks read per round trip.
+        keyword_index: Optional BM25 index the migrated chunks are also added to.
+
+    Returns:
+        Counts of "migrated" and "orphaned" chunks.
+    """
+    client = vector_store_service.client
+    try:
+        legacy = client.get_collection(LEGACY_COLLECTION_NAME)
+    except Exception:
+        logger.info("No legacy collection to migrate.")
+        return {"migrated": 0, "orphaned": 0}
+
+    counts = {"migrated": 0, "orphaned": 0}
+    while True:
+        batch = legacy.get(limit=batch_size, include=["documents", "metadatas", "embeddings"])
+        ids = batch["ids"]
+        if not ids:
+            break
+
+        document_ids = {UUID(m["document_id"]) for m in batch["metadatas"]}
+        documents = get_documents(list(document_ids))
+
+        by_owner: Dict[Optional[UUID], Dict[str, list]] = {}
+        for i, chunk_id in enumerate(ids):
+            metadata = batch["metadatas"][i]
+            document = documents.get(UUID(metadata["document_id"]))
+            if document is None:
+                counts["orphaned"] += 1
+                continue
+            group = by_owner.setdefault(
+                document.owner_id, {"ids": [], "documents": [], "metadatas": [], "embeddings": []}
+            )
+            group["ids"].append(chunk_id)
+            group["documents"].append(batch["documents"][i])
+            group["metadatas"].append({**metadata, **document_chunk_metadata(document)})
+            group["embeddings"].append(batch["embeddings"][i])
+
+        for owner_id, group in by_owner.items():
+            vector_store_service.upsert_texts(owner_id=owner_id, **group)
+            if keyword_index is not None:
+                keyword_index.add(owner_id, group["ids"], group["documents"], group["metadatas"])
+            counts["migrated"] += len(group["ids"])
+
+        legacy.delete(ids=ids)
+        logger.info(f"Migrated {counts['migrated']} chunks so far.")
+
+    client.delete_collection(LEGACY_COLLECTION_NAME)
+    logger.info(f"Migration complete: {counts}")
+    return counts
+
+
+def _get_documents_from_db(document_ids: List[UUID]) -> Dict[UUID, Document]:
+    from sqlmodel import Session, select
+    from app.db.session import engine
+
+    with Session(engine) as session:
+        documents = session.exec(select(Document).where(Document.id.in_(document_ids))).all()
+        return {document.id: document for document in documents}
+
+
+def main():
+    from app.services.keyword_index import get_keyword_index
+    from app.services.vector_store_service import get_vector_store_service
+
+    logging.basicConfig(level=logging.INFO)
+    migrate_legacy_collection(
+        get_vector_store_service(), _get_documents_from_db, keyword_index=get_keyword_index()
+    )
+
+
+if __name__ == "__main__":
+    main()
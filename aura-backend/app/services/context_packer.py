@@ -0,0 +1,116 @@
+"""
+Token-budgeted packing of retrieved chunks into a prompt context.
+"""
+
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+import litellm
+from pydantic import BaseModel
+
+
+logger = logging.getLogger(__name__)
+
+# Shorter suffix/prefix matches between neighbouring chunks are coincidences, not chunk overlap
+MIN_OVERLAP_CHARS = 20
+
+
+class PackedContext(BaseModel):
+    """The context sent to the LLM and what went into it."""
+    text: str
+    chunks: List[Dict[str, Any]]
+    tokens: int
+
+
+def count_tokens(model: str, text: str) -> int:
+    """
+    Counts tokens with the model's own tokenizer, falling back to an estimate
+    of four characters per token for models litellm cannot tokenize.
+    """
+    try:
+        return litellm.token_counter(model=model, text=text)
+    except Exception as e:
+        logger.debug(f"No tokenizer for {model}, estimating tokens: {e}")
+        return max(1, len(text) // 4)
+
+
+def overlap_length(earlier: str, later: str, min_overlap: int = MIN_OVERLAP_CHARS) -> int:
+    """Length of the longest suffix of `earlier` that is also a prefix of `later`."""
+    for n in range(min(len(earlier), len(later)), min_overlap - 1, -1):
+        if earlier.endswith(later[:n]):
+            return n
+    return 0
+
+
+def _truncate_to_tokens(model: str, text: str, max_tokens: int) -> str:
+    tokens = count_tokens(model, text)
+    while text and tokens > max_tokens:
+        text = text[:max(0, min(len(text) - 1, int(len(text) * max_tokens / tokens)))]
+        tokens = count_tokens(model, text)
+    return text
+
+
+def _pages(metadata: Dict[str, Any]) -> str:
+    """The pages of a chunk from a paged document, so answers can cite them."""
+    page, page_end = metadata.get('page'), metadata.get('page_end')
+    if page is None:
+        return ""
+    return f", page {page}" if page_end in (None, page) else f", pages {page}-{page_end}"
+
+
+def pack_context(chunks: List[Dict[str, Any]], model: str, token_budget: int) -> PackedContext:
+    """
+    Packs chunks into a labelled context of at most `token_budget` tokens.
+
+    Chunks are taken in the given (relevance) order; a chunk that does not fit
+    is skipped so that smaller, less relevant ones can still fill the budget.
+    Neighbouring chunks of the same document overlap, so when both are packed
+    the region they share is only included once. The first chunk is truncated
+    rather than dropped if it alone exceeds the budget.
+
+    Args:
+        chunks: Retrieved chunk dictionaries, most relevant first
+        model: The LLM the context is for, which determines the tokenizer
+        token_budget: Maximum number of context tokens
+
+    Returns:
+        The context text, the chunks it includes and its token count.
+    """
+    blocks: List[str] = []
+    used_chunks: List[Dict[str, Any]] = []
+    packed: Dict[Tuple[Any, int], str] = {}
+    used_tokens = 0
+
+    for chunk in chunks:
+        text = chunk.get('text', '')
+        metadata = chunk.get('metadata') or {}
+        chunk_index = metadata.get('chunk_index', 'unknown')
+        position: Optional[Tuple[Any, int]] = None
+        if isinstance(chunk_index, int) and metadata.get('document_id') is not None:
+            position = (metadata['document_id'], chunk_index)
+            previous = packed.get((position[0], chunk_index - 1))
+            if previous is not None:
+                text = text[overlap_length(previous, text):]
+            following = packed.get((position[0], chunk_index + 1))
+            if following is not None:
+                text = text[:len(text) - overlap_length(text, following)]
+        if not text.strip():
+            continue
+
+        label = f"[Context {len(blocks) + 1} - Chunk {chunk_index}{_pages(metadata)}]\n"
+        tokens = count_tokens(model, label + text)
+        if used_tokens + tokens > token_budget:
+            if blocks:
+                continue
+            text = _truncate_to_tokens(model, text, token_budget - count_tokens(model, label))
+            if not text:
+                break
+            tokens = count_tokens(model, label + text)
+
+        blocks.append(label + text)
+        used_chunks.append(chunk)
+        used_tokens += tokens
+        if position is not None:
+            packed[position] = chunk.get('text', '')
+
+    return PackedContext(text="\n\n".join(blocks), chunks=used_chunks, tokens=used_tokens)
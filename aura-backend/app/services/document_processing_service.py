@@ -1,24 +1,291 @@
-from typing import List
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import logging
+import multiprocessing
+import os
 import pathlib
+import threading
+import xml.etree.ElementTree as ET
+import zipfile
+
+from app.core.config import settings
+from app.services.chunkers import CharacterChunker, Chunk, get_chunker
+
+
+logger = logging.getLogger(__name__)
+
+# Number of characters pulled from disk per read while streaming a document.
+READ_SIZE = 64 * 1024
+
+# Joins the pages of a paged document, so a page break is also a paragraph break
+PAGE_SEPARATOR = "\n\n"
+
 
 def process_document(file_path: str) -> List[str]:
     """
     Reads a document, extracts its text, and splits it into chunks.
-    Currently supports .txt and .md files.
+    Supports plain text and Markdown, PDF and DOCX files.
+
+    This materializes every chunk in memory; use `iter_document_chunks` for
+    large files.
+    """
+    return list(iter_document_chunks(file_path))
+
+
+def iter_document_chunks(
+    file_path: str,
+    chunk_size: int = 1000,
+    chunk_overlap: int = 200,
+    read_size: int = READ_SIZE,
+) -> Iterator[str]:
+    """
+    Streams a document from disk and yields its chunks as they are produced.
+
+    Only about `read_size + chunk_size` characters are held in memory at any
+    time, so peak memory does not depend on the size of the file. The chunks
+    are identical to those produced by `chunk_text` on the full text.
+
+    Args:
+        file_path: Path to the document on disk.
+        chunk_size: The desired maximum size of each chunk (in characters).
+        chunk_overlap: The number of characters to overlap between consecutive chunks.
+        read_size: The number of characters to read from disk at a time.
+
+    Returns:
+        An iterator over text chunks.
+    """
+    path = pathlib.Path(file_path)
+    if not path.is_file():
+        raise FileNotFoundError(f"No file found at {file_path}")
+    if chunk_overlap >= chunk_size:
+        raise ValueError("chunk_overlap must be smaller than chunk_size.")
+
+    return _stream_chunks(path, chunk_size, chunk_overlap, read_size)
+
+
+def chunk_document(file_path: str, chunker=None, read_size: int = READ_SIZE) -> Iterator[Chunk]:
+    """
+    Streams a document from disk and yields its chunks with their offsets.
+
+    Args:
+        file_path: Path to the document on disk.
+        chunker: The chunking strategy (default: `get_chunker` for the file).
+        read_size: The number of characters to read from disk at a time.
+
+    Returns:
+        An iterator over `Chunk`s.
     """
     path = pathlib.Path(file_path)
     if not path.is_file():
         raise FileNotFoundError(f"No file found at {file_path}")
+    chunker = chunker or get_chunker(file_name=path.name)
+
+    page_extractor = PAGE_EXTRACTORS.get(path.suffix.lower())
+    if page_extractor is not None:
+        return _paged_chunks(chunker, page_extractor(path))
+    return chunker.chunk(iter_text_blocks(path, read_size))
+
+
+def _paged_chunks(chunker, pages: Iterable[str]) -> Iterator[Chunk]:
+    """Chunks a paged document, recording the pages each chunk spans in its metadata."""
+    page_starts: List[int] = []
+
+    def blocks() -> Iterator[str]:
+        offset = 0
+        for page in pages:
+            page_starts.append(offset)
+            text = page + PAGE_SEPARATOR
+            offset += len(text)
+            yield text
+
+    # A chunk is only yielded once its text has been read, so its pages are known
+    for chunk in chunker.chunk(blocks()):
+        metadata = dict(chunk.metadata or {})
+        metadata["page"] = bisect_right(page_starts, chunk.start)
+        metadata["page_end"] = bisect_right(page_starts, max(chunk.start, chunk.end - 1))
+        yield chunk._replace(metadata=metadata)
+
+
+def iter_text_blocks(path: pathlib.Path, read_size: int = READ_SIZE) -> Iterator[str]:
+    """
+    Streams the text of a document in blocks, extracting it first for PDF and
+    DOCX files and reading other files as UTF-8 text.
+    """
+    page_extractor = PAGE_EXTRACTORS.get(path.suffix.lower())
+    if page_extractor is not None:
+        return (page + PAGE_SEPARATOR for page in page_extractor(path))
+    extractor = TEXT_EXTRACTORS.get(path.suffix.lower(), _read_blocks)
+    return extractor(path, read_size)
+
+
+def _stream_chunks(
+    path: pathlib.Path, chunk_size: int, chunk_overlap: int, read_size: int
+) -> Iterator[str]:
+    chunker = CharacterChunker(chunk_size, chunk_overlap)
+    for chunk in chunker.chunk(iter_text_blocks(path, read_size)):
+        yield chunk.text
 
-    # For MVP, we assume text-based files. A more robust solution would handle
-    # different file types (e.g., .pdf, .docx) with appropriate libraries.
+
+def _read_blocks(path: pathlib.Path, read_size: int) -> Iterator[str]:
     try:
-        text = path.read_text(encoding='utf-8')
-    except Exception as e:
-        # Broad exception to catch potential decoding errors
-        raise IOError(f"Could not read file {file_path}: {e}")
+        with path.open("r", encoding="utf-8") as f:
+            yield from iter(lambda: f.read(read_size), "")
+    except UnicodeDecodeError as e:
+        raise IOError(f"Could not read file {path}: {e}")
+
+
+def extract_pdf_pages(path: pathlib.Path) -> Iterator[str]:
+    """
+    Extracts the text of a PDF page by page, in order.
+
+    Text extraction is CPU-bound, so large PDFs are split into ranges of
+    PDF_PAGES_PER_TASK pages that are extracted in parallel on a process
+    pool; smaller ones are extracted in this process.
+    """
+    from pypdf import PdfReader
+    from pypdf.errors import PdfReadError
+
+    try:
+        page_count = len(PdfReader(str(path)).pages)
+    except PdfReadError as e:
+        raise IOError(f"Could not read PDF {path}: {e}")
+
+    if page_count < settings.PDF_PARALLEL_MIN_PAGES:
+        yield from _extract_pdf_range((str(path), 0, page_count))
+        return
+
+    step = settings.PDF_PAGES_PER_TASK
+    ranges = [(str(path), start, min(start + step, page_count)) for start in range(0, page_count, step)]
+    results = None
+    pool = _get_pdf_pool()
+    if pool is not None:
+        try:
+            # map() submits every range now and yields them in order as they finish
+            results = pool.map(_extract_pdf_range, ranges)
+        except Exception as e:
+            # e.g. daemonic worker processes may not start children
+            logger.warning(f"Extracting PDFs without a process pool: {e}")
+            _disable_pdf_pool()
+    if results is None:
+        results = map(_extract_pdf_range, ranges)
+    for pages in results:
+        yield from pages
+
 
-    return chunk_text(text)
+def _extract_pdf_range(page_range: Tuple[str, int, int]) -> List[str]:
+    # Runs in a pool process, so each range opens the file itself
+    from pypdf import PdfReader
+
+    path, start, stop = page_range
+    reader = PdfReader(path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+_pdf_pool: Optional[ProcessPoolExecutor] = None
+_pdf_pool_disabled = False
+_pdf_pool_lock = threading.Lock()
+
+
+def _get_pdf_pool() -> Optional[ProcessPoolExecutor]:
+    """Returns the process-wide pool for PDF extraction, or None if it is disabled."""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None and not _pdf_pool_disabled and settings.PDF_EXTRACT_WORKERS != 0:
+            # Spawned rather than forked: extraction runs on ingestion threads
+            # of a process that may hold model threads and locks
+            _pdf_pool = ProcessPoolExecutor(
+                max_workers=settings.PDF_EXTRACT_WORKERS or os.cpu_count(),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pdf_pool
+
+
+def _disable_pdf_pool():
+    global _pdf_pool, _pdf_pool_disabled
+    with _pdf_pool_lock:
+        if _pdf_pool is not None:
+            _pdf_pool.shutdown(wait=False, cancel_futures=True)
+        _pdf_pool, _pdf_pool_disabled = None, True
+
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+def extract_docx_text(path: pathlib.Path, read_size: int = READ_SIZE) -> Iterator[str]:
+    """
+    Streams the paragraphs of a DOCX file, parsing its XML incrementally.
+
+    Paragraphs with a heading style are rendered as Markdown headings, so the
+    Markdown chunker can keep sections together.
+    """
+    try:
+        archive = zipfile.ZipFile(path)
+        document = archive.open("word/document.xml")
+    except (zipfile.BadZipFile, KeyError) as e:
+        raise IOError(f"Could not read DOCX {path}: {e}")
+
+    with archive, document:
+        for _, element in ET.iterparse(document):
+            if element.tag != f"{_W}p":
+                continue
+            text = _docx_paragraph_text(element)
+            element.clear()
+            if text.strip():
+                yield text + "\n\n"
+
+
+def _docx_paragraph_text(paragraph: ET.Element) -> str:
+    parts: List[str] = []
+    for node in paragraph.iter():
+        if node.tag == f"{_W}t":
+            parts.append(node.text or "")
+        elif node.tag == f"{_W}tab":
+            parts.append("\t")
+        elif node.tag in (f"{_W}br", f"{_W}cr"):
+            parts.append("\n")
+    text = "".join(parts)
+
+    style = paragraph.find(f"{_W}pPr/{_W}pStyle")
+    level = (style.get(f"{_W}val") or "") if style is not None else ""
+    if level.lower().startswith("heading") and level[7:].isdigit() and text.strip():
+        return "#" * min(int(level[7:]), 6) + " " + " ".join(text.split())
+    return text
+
+
+# Extractors for formats that are read as a stream of text blocks
+TEXT_EXTRACTORS: Dict[str, Callable[[pathlib.Path, int], Iterator[str]]] = {
+    ".docx": extract_docx_text,
+}
+
+# Extractors for paged formats; their chunks record the pages they span
+PAGE_EXTRACTORS: Dict[str, Callable[[pathlib.Path], Iterator[str]]] = {
+    ".pdf": extract_pdf_pages,
+}
+
+
+def batch_chunks(chunks: Iterable[str], batch_size: int) -> Iterator[List[str]]:
+    """
+    Groups a stream of chunks into lists of at most `batch_size` chunks.
+
+    Args:
+        chunks: An iterable of text chunks.
+        batch_size: The maximum number of chunks per batch.
+
+    Returns:
+        An iterator over batches of chunks.
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1.")
+
+    batch = []
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
 
 
 def chunk_text(
@@ -46,5 +313,5 @@ def chunk_text(
         end_index = start_index + chunk_size
         chunks.append(text[start_index:end_index])
         start_index += chunk_size - chunk_overlap
-            
-    return chunks 
\ No newline at end of file
+
+    return chunks
@@ -0,0 +1,204 @@
+"""
+Content-addressed cache for text embeddings.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.core.config import settings
+from app.db.sqlite_local import ThreadLocalSQLite
+
+
+logger = logging.getLogger(__name__)
+
+
+def embedding_key(model_name: str, text: str) -> str:
+    """Key for a text's embedding under a given model."""
+    return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
+
+
+class DiskEmbeddingStore:
+    """
+    Persistent store backed by a local SQLite file, shared by processes on the same host.
+
+    Every row records when it was last read or written. Rows unused for
+    `ttl` seconds are deleted, as are the least recently used rows above
+    `max_entries`; the table is pruned when the store opens and then after
+    every `prune_every` rows written.
+    """
+
+    def __init__(self, path: str, max_entries: int, ttl: Optional[int] = None, prune_every: int = 1000):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.prune_every = prune_every
+        self._written = 0
+        self._db = ThreadLocalSQLite(path)
+        with self._db.connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings "
+                "(key TEXT PRIMARY KEY, vector BLOB NOT NULL, accessed_at REAL NOT NULL DEFAULT 0)"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(embeddings)")}
+            if "accessed_at" not in columns:
+                # Files written before rows were timestamped; their rows go first
+                conn.execute("ALTER TABLE embeddings ADD COLUMN accessed_at REAL NOT NULL DEFAULT 0")
+            conn.execute("CREATE INDEX IF NOT EXISTS embeddings_accessed_at ON embeddings (accessed_at)")
+        self.prune()
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, bytes]:
+        found = {}
+        with self._db.connection() as conn:
+            # Stay well below SQLite's bound parameter limit
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = dict(conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ))
+                if rows:
+                    conn.execute(
+                        f"UPDATE embeddings SET accessed_at = ? WHERE key IN ({','.join('?' * len(rows))})",
+                        [time.time(), *rows],
+                    )
+                found.update(rows)
+        return found
+
+    def set_many(self, items: Dict[str, bytes]):
+        now = time.time()
+        with self._db.connection() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, accessed_at) VALUES (?, ?, ?)",
+                [(key, value, now) for key, value in items.items()],
+            )
+        self._written += len(items)
+        if self._written >= self.prune_every:
+            self.prune()
+
+    def prune(self):
+        """Deletes expired rows and the least recently used rows above `max_entries`."""
+        self._written = 0
+        with self._db.connection() as conn:
+            if self.ttl is not None:
+                conn.execute("DELETE FROM embeddings WHERE accessed_at < ?", (time.time() - self.ttl,))
+            conn.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+
+class RedisEmbeddingStore:
+    """Persistent store in Redis, shared by every process."""
+
+    def __init__(self, client: Any, ttl: Optional[int] = None, prefix: str = "aura:embeddings"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, bytes]:
+        values = self.client.mget([f"{self.prefix}:{k}" for k in keys])
+        return {k: v for k, v in zip(keys, values) if v is not None}
+
+    def set_many(self, items: Dict[str, bytes]):
+        pipe = self.client.pipeline(transaction=False)
+        for key, value in items.items():
+            pipe.set(f"{self.prefix}:{key}", value, ex=self.ttl)
+        pipe.execute()
+
+
+class EmbeddingCache:
+    """
+    An in-process LRU of embeddings in front of an optional persistent store.
+
+    Lookups check the LRU first and then fetch all remaining keys from the
+    store in one round trip; store hits are promoted into the LRU. Store
+    errors are logged and treated as misses.
+    """
+
+    def __init__(self, max_entries: int, store: Optional[Any] = None):
+        self.max_entries = max_entries
+        self.store = store
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, model_name: str, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Returns the cached embedding for each text, or None where missing."""
+        keys = [embedding_key(model_name, text) for text in texts]
+        results: List[Optional[np.ndarray]] = [None] * len(keys)
+        missing = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                    results[i] = vector
+                else:
+                    missing.append(i)
+
+        if missing and self.store is not None:
+            try:
+                found = self.store.get_many([keys[i] for i in missing])
+            except Exception as e:
+                logger.warning(f"Embedding cache lookup failed: {e}")
+                found = {}
+            promoted = {}
+            for i in missing:
+                raw = found.get(keys[i])
+                if raw is not None:
+                    results[i] = promoted[keys[i]] = np.frombuffer(raw, dtype=np.float32)
+            self._remember(promoted)
+
+        return results
+
+    def set_many(self, model_name: str, texts: Sequence[str], vectors: Sequence[np.ndarray]):
+        """Stores the embedding of each text."""
+        items = {
+            embedding_key(model_name, text): np.asarray(vector, dtype=np.float32)
+            for text, vector in zip(texts, vectors)
+        }
+        self._remember(items)
+        if self.store is not None:
+            try:
+                self.store.set_many({key: vector.tobytes() for key, vector in items.items()})
+            except Exception as e:
+                logger.warning(f"Embedding cache store failed: {e}")
+
+    def _remember(self, items: Dict[str, np.ndarray]):
+        with self._lock:
+            for key, vector in items.items():
+                self._entries[key] = vector
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def create_embedding_cache() -> Optional[EmbeddingCache]:
+    """Builds the embedding cache configured in settings, or None when disabled."""
+    if not settings.EMBEDDING_CACHE_ENABLED:
+        return None
+
+    backend = settings.EMBEDDING_CACHE_BACKEND
+    if settings.TESTING or backend == "memory":
+        store = None
+    elif backend == "redis":
+        from app.core.redis_client import get_cache_redis
+        store = RedisEmbeddingStore(get_cache_redis(), ttl=settings.EMBEDDING_CACHE_TTL)
+    elif backend == "disk":
+        store = DiskEmbeddingStore(
+            settings.EMBEDDING_CACHE_PATH,
+            max_entries=settings.EMBEDDING_CACHE_DISK_MAX_ENTRIES,
+            ttl=settings.EMBEDDING_CACHE_TTL,
+        )
+    else:
+        raise ValueError(f"Unknown EMBEDDING_CACHE_BACKEND: {backend}")
+
+    return EmbeddingCache(max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES, store=store)
@@ -1,26 +1,134 @@
-from sentence_transformers import SentenceTransformer
-from typing import List
+import threading
+from typing import TYPE_CHECKING, List, Optional
+import numpy as np
+
+from app.core.config import settings
+from app.services.embedding_cache import EmbeddingCache, create_embedding_cache
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
 
 class EmbeddingService:
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
+    def __init__(
+        self,
+        model_name: Optional[str] = None,
+        cache: Optional[EmbeddingCache] = None,
+        batch_size: Optional[int] = None,
+        normalize: Optional[bool] = None,
+        device: Optional[str] = None,
+        num_threads: Optional[int] = None,
+    ):
+        """
+        Initializes the embedding service.
+
+        The sentence-transformer model (and torch with it) is only imported and
+        loaded on first use, so processes that never embed don't pay for it.
+        Unset options fall back to the EMBEDDING_* settings.
+        """
+        self.model_name = model_name or settings.EMBEDDING_MODEL_NAME
+        self.batch_size = batch_size or settings.EMBEDDING_BATCH_SIZE
+        self.normalize = settings.EMBEDDING_NORMALIZE if normalize is None else normalize
+        self.device = device or settings.EMBEDDING_DEVICE
+        self.num_threads = num_threads or settings.EMBEDDING_NUM_THREADS
+        self._model: Optional["SentenceTransformer"] = None
+        self._cache = cache
+        self._lock = threading.Lock()
+
+    @property
+    def model(self) -> "SentenceTransformer":
+        """The sentence-transformer model, loaded once on first access."""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    if self.num_threads:
+                        import torch
+                        torch.set_num_threads(self.num_threads)
+                    from sentence_transformers import SentenceTransformer
+                    self._model = SentenceTransformer(self.model_name, device=self.device)
+        return self._model
+
+    @property
+    def cache(self) -> Optional[EmbeddingCache]:
+        """The embedding cache, created on first access."""
+        if self._cache is None:
+            with self._lock:
+                if self._cache is None:
+                    self._cache = create_embedding_cache()
+        return self._cache
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._model is not None
+
+    def warm_up(self):
         """
-        Initializes the embedding service by loading the sentence-transformer model.
+        Loads the model and runs one encode so the first real request doesn't
+        pay for it. Called by Celery workers and API processes at startup.
         """
-        self.model = SentenceTransformer(model_name)
+        self._encode(["warm up"])
+
+    def embed_batch(self, texts: List[str]) -> np.ndarray:
+        """
+        Creates embeddings for a list of texts as one float32 matrix.
+
+        Embeddings are looked up by model name and content hash first, so only
+        texts that have not been seen before are encoded, `batch_size` at a time.
+
+        Args:
+            texts: A list of strings to be embedded.
+
+        Returns:
+            A C-contiguous float32 array of shape (len(texts), dimension).
+        """
+        cache = self.cache
+        if cache is None:
+            return self._encode(texts)
+
+        cache_model = f"{self.model_name}:{'normalized' if self.normalize else 'raw'}"
+        cached = cache.get_many(cache_model, texts)
+        missing = [i for i, embedding in enumerate(cached) if embedding is None]
+
+        encoded_by_text = {}
+        if missing:
+            # Encode each distinct missing text once
+            missing_texts = list(dict.fromkeys(texts[i] for i in missing))
+            encoded = self._encode(missing_texts)
+            cache.set_many(cache_model, missing_texts, encoded)
+            encoded_by_text = dict(zip(missing_texts, encoded))
+            if len(missing) == len(texts) and len(missing_texts) == len(texts):
+                return encoded
+
+        embeddings = np.empty((0, 0), dtype=np.float32)
+        for i, text in enumerate(texts):
+            vector = cached[i] if cached[i] is not None else encoded_by_text[text]
+            if i == 0:
+                embeddings = np.empty((len(texts), len(vector)), dtype=np.float32)
+            embeddings[i] = vector
+        return embeddings
 
     def embed_texts(self, texts: List[str]) -> List[List[float]]:
         """
         Creates embeddings for a list of texts.
 
+        Prefer `embed_batch`, which avoids converting every value to a Python float.
+
         Args:
             texts: A list of strings to be embedded.
 
         Returns:
             A list of embeddings, where each embedding is a list of floats.
         """
-        embeddings = self.model.encode(texts)
-        # Convert numpy arrays to lists of floats
-        return [embedding.tolist() for embedding in embeddings]
+        return self.embed_batch(texts).tolist()
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        embeddings = self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=self.normalize,
+            show_progress_bar=False,
+        )
+        return np.ascontiguousarray(embeddings, dtype=np.float32)
 
-# Create a single, shared instance of the service
-embedding_service = EmbeddingService() 
\ No newline at end of file
+# Create a single, shared instance of the service; the model loads lazily
+embedding_service = EmbeddingService()
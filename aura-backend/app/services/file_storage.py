@@ -0,0 +1,337 @@
+"""
+Content-addressed storage of uploaded files.
+
+Files are stored under the SHA-256 hash of their content, computed while the
+upload is streamed to disk, so identical uploads share one file and uploads
+with the same name no longer overwrite each other.
+
+Large files can also be uploaded in pieces through resumable upload sessions,
+which are kept on disk so that any API process can continue them.
+"""
+
+import asyncio
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import time
+import zipfile
+from pathlib import Path, PurePosixPath
+from typing import AsyncIterable, AsyncIterator, BinaryIO, List, NamedTuple, Optional, Tuple
+from uuid import UUID, uuid4
+
+from pydantic import BaseModel
+
+from app.core.config import settings
+
+
+# Number of bytes copied per read while streaming an upload to disk.
+COPY_SIZE = 1024 * 1024
+
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload exceeds the maximum allowed size."""
+
+
+class UploadSessionError(Exception):
+    """Raised when an upload session is continued at the wrong offset or completed early."""
+
+
+class StoredFile(NamedTuple):
+    """Where an upload was stored, and its content hash and size in bytes."""
+    path: str
+    content_hash: str
+    size: int
+
+
+def content_path(content_hash: str, suffix: str = "", upload_dir: Optional[str] = None) -> Path:
+    """
+    The storage path of a file with the given hash. Files are spread over
+    subdirectories named after the first two hex digits of their hash, and
+    keep their original extension, which selects how they are parsed.
+    """
+    root = Path(upload_dir or settings.UPLOADS_DIR)
+    return root / content_hash[:2] / f"{content_hash}{suffix.lower()}"
+
+
+def store_upload(source: BinaryIO, file_name: str, upload_dir: Optional[str] = None) -> StoredFile:
+    """
+    Streams an upload to disk while hashing it and stores it under its hash.
+
+    The data is written to a temporary file in the upload directory and then
+    renamed into place, so a partially written file is never visible under a
+    content path. If the content is already stored, the new copy is discarded.
+
+    Args:
+        source: The uploaded file, read in blocks of COPY_SIZE bytes.
+        file_name: The file's original name; only its extension is kept.
+        upload_dir: The storage root (default: settings.UPLOADS_DIR).
+
+    Returns:
+        The stored file's path, SHA-256 hex digest and size.
+    """
+    root = Path(upload_dir or settings.UPLOADS_DIR)
+    root.mkdir(parents=True, exist_ok=True)
+
+    digest = hashlib.sha256()
+    size = 0
+    with tempfile.NamedTemporaryFile(dir=root, prefix=".upload-", delete=False) as tmp:
+        try:
+            while True:
+                block = source.read(COPY_SIZE)
+                if not block:
+                    break
+                digest.update(block)
+                tmp.write(block)
+                size += len(block)
+        except BaseException:
+            tmp.close()
+            os.unlink(tmp.name)
+            raise
+
+    return _commit(tmp.name, digest.hexdigest(), size, file_name, root)
+
+
+def store_archive(
+    source: BinaryIO, max_files: int, upload_dir: Optional[str] = None
+) -> Tuple[List[Tuple[str, StoredFile]], List[str]]:
+    """
+    Stores every file in a ZIP archive, e.g. a zipped folder of documents.
+
+    Files are named by their path inside the archive. Directories, hidden
+    files and macOS resource forks are ignored; empty files and files over
+    settings.MAX_UPLOAD_SIZE are skipped.
+
+    Returns:
+        The stored files with their names, and the names of skipped files.
+
+    Raises:
+        UploadTooLargeError: If the archive holds more than `max_files` files
+            or more than settings.MAX_BULK_UPLOAD_SIZE bytes once extracted.
+        zipfile.BadZipFile: If `source` is not a ZIP archive.
+    """
+    stored: List[Tuple[str, StoredFile]] = []
+    skipped: List[str] = []
+    with zipfile.ZipFile(source) as archive:
+        members = [
+            info for info in archive.infolist()
+            if not info.is_dir()
+            and not any(part.startswith(".") or part == "__MACOSX" for part in PurePosixPath(info.filename).parts)
+        ]
+        if len(members) > max_files:
+            raise UploadTooLargeError(f"Archive holds more than {max_files} files")
+        # Sizes are checked against the declared ones, which zipfile enforces while reading
+        if sum(info.file_size for info in members) > settings.MAX_BULK_UPLOAD_SIZE:
+            raise UploadTooLargeError(
+                f"Archive exceeds the maximum extracted size of {settings.MAX_BULK_UPLOAD_SIZE} bytes"
+            )
+        for info in members:
+            if info.file_size == 0 or info.file_size > settings.MAX_UPLOAD_SIZE:
+                skipped.append(info.filename)
+                continue
+            with archive.open(info) as member:
+                stored.append((info.filename, store_upload(member, info.filename, upload_dir)))
+    return stored, skipped
+
+
+def remove_stored_file(path: str):
+    """Deletes a stored file, e.g. one whose document could not be created."""
+    Path(path).unlink(missing_ok=True)
+
+
+async def iter_upload_file(file, block_size: int = COPY_SIZE) -> AsyncIterator[bytes]:
+    """Reads an uploaded file (e.g. a FastAPI `UploadFile`) in blocks."""
+    while True:
+        block = await file.read(block_size)
+        if not block:
+            return
+        yield block
+
+
+async def astore_upload(
+    blocks: AsyncIterable[bytes],
+    file_name: str,
+    max_size: Optional[int] = None,
+    upload_dir: Optional[str] = None,
+) -> StoredFile:
+    """
+    Async version of `store_upload`, for uploads arriving as a stream of blocks.
+
+    Disk writes run in worker threads, so a large upload never blocks the event
+    loop, and the upload is aborted as soon as it exceeds `max_size`.
+
+    Raises:
+        UploadTooLargeError: If the upload is larger than `max_size` bytes
+            (default: settings.MAX_UPLOAD_SIZE).
+    """
+    max_size = settings.MAX_UPLOAD_SIZE if max_size is None else max_size
+    root = Path(upload_dir or settings.UPLOADS_DIR)
+    await asyncio.to_thread(root.mkdir, parents=True, exist_ok=True)
+
+    digest = hashlib.sha256()
+    size = 0
+    tmp = await asyncio.to_thread(tempfile.NamedTemporaryFile, dir=root, prefix=".upload-", delete=False)
+    try:
+        async for block in blocks:
+            size += len(block)
+            if size > max_size:
+                raise UploadTooLargeError(f"Upload exceeds the maximum size of {max_size} bytes")
+            await asyncio.to_thread(_write_block, tmp, digest, block)
+        await asyncio.to_thread(tmp.close)
+    except BaseException:
+        tmp.close()
+        os.unlink(tmp.name)
+        raise
+
+    return await asyncio.to_thread(_commit, tmp.name, digest.hexdigest(), size, file_name, root)
+
+
+def _write_block(file: BinaryIO, digest, block: bytes):
+    # hashlib releases the GIL for large blocks, so hash in the same thread as the write
+    digest.update(block)
+    file.write(block)
+
+
+def _commit(tmp_name: str, content_hash: str, size: int, file_name: str, root: Path) -> StoredFile:
+    """Moves a fully written temporary file to its content path."""
+    path = content_path(content_hash, Path(file_name).suffix, str(root))
+    if path.exists():
+        os.unlink(tmp_name)
+    else:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(tmp_name, path)
+    return StoredFile(str(path), content_hash, size)
+
+
+class UploadSession(BaseModel):
+    """A resumable upload; `offset` is the number of bytes received so far."""
+    id: UUID
+    owner_id: Optional[UUID]
+    file_name: str
+    size: int
+    offset: int = 0
+    created_at: float
+
+
+def _sessions_dir(upload_dir: Optional[str]) -> Path:
+    return Path(upload_dir or settings.UPLOADS_DIR) / ".sessions"
+
+
+def _session_paths(upload_id: UUID, upload_dir: Optional[str]):
+    root = _sessions_dir(upload_dir)
+    return root / f"{upload_id.hex}.json", root / f"{upload_id.hex}.part"
+
+
+def create_upload_session(
+    owner_id: Optional[UUID], file_name: str, size: int, upload_dir: Optional[str] = None
+) -> UploadSession:
+    """
+    Starts a resumable upload of `size` bytes.
+
+    Raises:
+        UploadTooLargeError: If `size` exceeds settings.MAX_UPLOAD_SIZE.
+    """
+    if size > settings.MAX_UPLOAD_SIZE:
+        raise UploadTooLargeError(f"Upload exceeds the maximum size of {settings.MAX_UPLOAD_SIZE} bytes")
+    _purge_expired_sessions(upload_dir)
+
+    session = UploadSession(id=uuid4(), owner_id=owner_id, file_name=file_name, size=size, created_at=time.time())
+    meta_path, part_path = _session_paths(session.id, upload_dir)
+    meta_path.parent.mkdir(parents=True, exist_ok=True)
+    part_path.touch()
+    meta_path.write_text(session.model_dump_json())
+    return session
+
+
+def get_upload_session(upload_id: UUID, upload_dir: Optional[str] = None) -> Optional[UploadSession]:
+    """Returns an unexpired upload session with its current offset, or None."""
+    meta_path, part_path = _session_paths(upload_id, upload_dir)
+    try:
+        session = UploadSession(**json.loads(meta_path.read_text()))
+        session.offset = part_path.stat().st_size
+    except FileNotFoundError:
+        return None
+    if time.time() - session.created_at > settings.UPLOAD_SESSION_TTL:
+        return None
+    return session
+
+
+async def append_to_upload_session(
+    session: UploadSession, offset: int, blocks: AsyncIterable[bytes], upload_dir: Optional[str] = None
+) -> UploadSession:
+    """
+    Appends the next piece of a resumable upload.
+
+    A client that lost its connection asks for the session's offset and
+    continues from there; data already received is never sent twice.
+
+    Raises:
+        UploadSessionError: If `offset` is not where the upload left off.
+        UploadTooLargeError: If the data runs past the session's declared size;
+            what was received before that point is kept.
+    """
+    _, part_path = _session_paths(session.id, upload_dir)
+    part = await asyncio.to_thread(open, part_path, "ab")
+    try:
+        # Serialize concurrent requests for the same session
+        await asyncio.to_thread(fcntl.flock, part, fcntl.LOCK_EX)
+        position = part.seek(0, os.SEEK_END)
+        if offset != position:
+            raise UploadSessionError(f"Upload is at offset {position}, not {offset}")
+        async for block in blocks:
+            if position + len(block) > session.size:
+                raise UploadTooLargeError(f"Upload exceeds its declared size of {session.size} bytes")
+            await asyncio.to_thread(part.write, block)
+            position += len(block)
+    finally:
+        await asyncio.to_thread(part.close)
+
+    return session.model_copy(update={"offset": position})
+
+
+async def complete_upload_session(session: UploadSession, upload_dir: Optional[str] = None) -> StoredFile:
+    """
+    Stores a fully received upload under its content hash and ends the session.
+
+    The pieces may have been received by different processes, so the hash is
+    computed by reading the assembled file once, in a worker thread.
+
+    Raises:
+        UploadSessionError: If not all of the declared bytes have been received.
+    """
+    meta_path, part_path = _session_paths(session.id, upload_dir)
+    size = part_path.stat().st_size
+    if size != session.size:
+        raise UploadSessionError(f"Upload is incomplete: {size} of {session.size} bytes received")
+
+    content_hash = await asyncio.to_thread(_hash_file, part_path)
+    root = Path(upload_dir or settings.UPLOADS_DIR)
+    stored = await asyncio.to_thread(_commit, str(part_path), content_hash, size, session.file_name, root)
+    meta_path.unlink(missing_ok=True)
+    return stored
+
+
+def _hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(COPY_SIZE)
+            if not block:
+                return digest.hexdigest()
+            digest.update(block)
+
+
+def _purge_expired_sessions(upload_dir: Optional[str]):
+    """Deletes the data of abandoned upload sessions."""
+    root = _sessions_dir(upload_dir)
+    if not root.is_dir():
+        return
+    cutoff = time.time() - settings.UPLOAD_SESSION_TTL
+    for meta_path in root.glob("*.json"):
+        try:
+            if json.loads(meta_path.read_text())["created_at"] < cutoff:
+                meta_path.with_suffix(".part").unlink(missing_ok=True)
+                meta_path.unlink(missing_ok=True)
+        except (OSError, ValueError, KeyError):
+            continue
@@ -0,0 +1,399 @@
+"""
+Batched, pipelined ingestion of document chunks into the vector store.
+"""
+
+import hashlib
+import logging
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Union
+from uuid import UUID
+
+import numpy as np
+
+from app.core.config import settings
+from app.db.models_pg import Document
+from app.services.chunkers import Chunk
+from app.services.document_processing_service import batch_chunks
+from app.services.keyword_index import KeywordIndex
+from app.services.vector_store_service import VectorStoreService
+
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of the producer's stream on the queue
+_DONE = object()
+
+
+class IngestionError(Exception):
+    """
+    Raised when a batch could not be uploaded after all retries.
+
+    `completed_batches` is the number of leading batches that are known to be
+    stored, so a later attempt can resume with `start_batch=completed_batches`.
+    """
+    def __init__(self, message: str, completed_batches: int):
+        super().__init__(message)
+        self.completed_batches = completed_batches
+
+
+class _Batch:
+    """
+    New chunks to embed and store, and moved chunks, which are already stored
+    but whose positional metadata changed, so only their metadata is updated.
+    """
+    def __init__(
+        self, index: int, ids: List[str], documents: List[str], metadatas: List[dict],
+        embeddings: Optional[np.ndarray] = None,
+        moved_ids: Optional[List[str]] = None,
+        moved_documents: Optional[List[str]] = None,
+        moved_metadatas: Optional[List[dict]] = None,
+        count: Optional[int] = None,
+    ):
+        self.index = index
+        self.ids = ids
+        self.documents = documents
+        self.metadatas = metadatas
+        self.embeddings = embeddings
+        self.moved_ids = moved_ids or []
+        self.moved_documents = moved_documents or []
+        self.moved_metadatas = moved_metadatas or []
+        # Chunks of the document the batch covers, including unchanged ones
+        self.count = len(ids) if count is None else count
+
+
+def chunk_id(document_id: UUID, text: str, occurrence: int = 0) -> str:
+    """
+    The id of a chunk, derived from its content rather than its position, so
+    editing one part of a document leaves the ids of the other chunks intact.
+    `occurrence` numbers repeated copies of the same text within a document.
+    """
+    return _chunk_id(document_id, _content_digest(text), occurrence)
+
+
+def _content_digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+def _chunk_id(document_id: UUID, digest: str, occurrence: int) -> str:
+    return f"{document_id}_{digest}" if occurrence == 0 else f"{document_id}_{digest}_{occurrence}"
+
+
+def document_chunk_metadata(document: Document) -> Dict[str, Any]:
+    """
+    Document-level metadata stored on every chunk, so retrieval can be scoped
+    to an owner's library and narrowed by document type and upload date
+    (see `LibraryScope`). Chroma metadata values must be scalars, so the
+    upload date is stored as a Unix timestamp.
+    """
+    metadata: Dict[str, Any] = {
+        "document_type": Path(document.file_name).suffix.lower().lstrip(".") or "unknown",
+        "upload_date": int(document.upload_timestamp.timestamp()),
+    }
+    if document.owner_id is not None:
+        metadata["owner_id"] = str(document.owner_id)
+    return metadata
+
+
+def ingest_chunks(
+    vector_store_service: VectorStoreService,
+    document_id: UUID,
+    chunks: Iterable[Union[str, Chunk]],
+    batch_size: Optional[int] = None,
+    queue_size: Optional[int] = None,
+    max_retries: Optional[int] = None,
+    retry_backoff: Optional[float] = None,
+    start_batch: int = 0,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    embed_fn: Optional[Callable[[List[str]], np.ndarray]] = None,
+    metadata: Optional[Dict[str, Any]] = None,
+    owner_id: Optional[UUID] = None,
+    keyword_index: Optional[KeywordIndex] = None,
+    incremental: bool = False,
+) -> int:
+    """
+    Uploads a stream of chunks to the vector store in fixed-size batches.
+
+    Chunking and embedding run in a producer thread that hands batches to the
+    uploader through a bounded queue, so reading and embedding the next part
+    of the document overlaps with the upload of the current batch while at
+    most `queue_size` batches are held in memory. Each batch is retried with
+    exponential backoff before giving up.
+
+    Chunk ids are derived from the chunk's content (see `chunk_id`). With
+    `incremental=True`, the document's stored chunks are compared with the new
+    ones first: only new chunks are embedded and stored, chunks that merely
+    moved get their positional metadata updated, unchanged chunks are left
+    alone, and stored chunks that no longer occur are deleted once the whole
+    document has been stored. Re-ingesting a lightly edited document thus
+    costs a fraction of a full ingestion. Re-running with the same
+    `batch_size` and a `start_batch` skips the batches that were already
+    stored and upserts the rest.
+
+    Args:
+        vector_store_service: The vector store to write to.
+        document_id: UUID of the document the chunks belong to.
+        chunks: An iterable of text chunks or `Chunk`s, in document order. The
+            offsets and metadata of a `Chunk` are stored with it.
+        batch_size: Number of chunks per upload (default: settings.CHUNK_BATCH_SIZE).
+        queue_size: Maximum number of batches waiting to be uploaded
+            (default: settings.INGEST_QUEUE_SIZE).
+        max_retries: Retries per batch before failing (default: settings.INGEST_MAX_RETRIES).
+        retry_backoff: Initial delay in seconds between retries, doubled on each
+            attempt (default: settings.INGEST_RETRY_BACKOFF).
+        start_batch: Index of the first batch to upload; earlier batches are skipped.
+        on_progress: Optional callback invoked with (completed_batches, completed_chunks)
+            after each successful upload.
+        embed_fn: Optional function returning a float32 embedding matrix for a
+            batch of texts; when None, Chroma embeds the texts on upload.
+        metadata: Document-level metadata added to every chunk's metadata,
+            typically from `document_chunk_metadata`.
+        owner_id: UUID of the document's owner, whose collection receives the chunks.
+        keyword_index: Optional BM25 index that each batch is also added to
+            once it is stored in the vector store.
+        incremental: Whether to update the document's stored chunks in place
+            instead of storing every chunk.
+
+    Returns:
+        The total number of chunks in the document.
+
+    Raises:
+        IngestionError: If a batch could not be uploaded. Errors raised while
+            reading the chunks are propagated unchanged.
+    """
+    batch_size = batch_size or settings.CHUNK_BATCH_SIZE
+    queue_size = queue_size or settings.INGEST_QUEUE_SIZE
+    max_retries = settings.INGEST_MAX_RETRIES if max_retries is None else max_retries
+    retry_backoff = settings.INGEST_RETRY_BACKOFF if retry_backoff is None else retry_backoff
+    document_metadata = metadata or {}
+
+    # Fetched up front, so a failure here doesn't leave a partial update behind
+    stored = vector_store_service.get_document_chunks(owner_id, document_id) if incremental else {}
+    seen: Set[str] = set()
+    counts = {"new": 0, "moved": 0, "unchanged": 0}
+
+    pending: "queue.Queue" = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    total_chunks = [0]
+
+    def put(item) -> bool:
+        # Block while the queue is full, but give up if the uploader stopped
+        while not stop.is_set():
+            try:
+                pending.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            offset = 0
+            occurrences: Dict[str, int] = {}
+            for index, items in enumerate(batch_chunks(chunks, batch_size)):
+                batch = _Batch(index=index, ids=[], documents=[], metadatas=[], count=len(items))
+                for i, item in enumerate(items):
+                    text = _text(item)
+                    # Counted by digest, so the document's text isn't held until the end
+                    digest = _content_digest(text)
+                    occurrence = occurrences.get(digest, 0)
+                    occurrences[digest] = occurrence + 1
+                    item_id = _chunk_id(document_id, digest, occurrence)
+                    if incremental:
+                        # Chunks of skipped batches are stored, so they are not stale either
+                        seen.add(item_id)
+                    if index < start_batch:
+                        continue
+
+                    item_metadata = {
+                        **document_metadata,
+                        **_chunk_metadata(item),
+                        "document_id": str(document_id),
+                        "chunk_index": offset + i,
+                    }
+                    previous = stored.get(item_id)
+                    if previous is None:
+                        batch.ids.append(item_id)
+                        batch.documents.append(text)
+                        batch.metadatas.append(item_metadata)
+                        counts["new"] += 1
+                    elif previous != item_metadata:
+                        batch.moved_ids.append(item_id)
+                        batch.moved_documents.append(text)
+                        batch.moved_metadatas.append(item_metadata)
+                        counts["moved"] += 1
+                    else:
+                        counts["unchanged"] += 1
+
+                if index >= start_batch:
+                    if embed_fn and batch.documents:
+                        batch.embeddings = embed_fn(batch.documents)
+                    if not put(batch):
+                        return
+                offset += len(items)
+            total_chunks[0] = offset
+            put(_DONE)
+        except Exception as e:
+            put(e)
+
+    producer = threading.Thread(target=produce, name=f"ingest-{document_id}", daemon=True)
+    producer.start()
+
+    completed_batches = start_batch
+    completed_chunks = start_batch * batch_size
+    try:
+        while True:
+            item = pending.get()
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                # Reading the document failed; retrying the upload won't help
+                raise item
+
+            _upload_with_retry(
+                vector_store_service, keyword_index, owner_id, item,
+                max_retries, retry_backoff, completed_batches,
+            )
+            completed_batches += 1
+            completed_chunks += item.count
+            if on_progress:
+                on_progress(completed_batches, completed_chunks)
+    finally:
+        stop.set()
+        producer.join()
+
+    stale = [stored_id for stored_id in stored if stored_id not in seen]
+    if stale:
+        _delete_with_retry(
+            vector_store_service, keyword_index, owner_id, stale,
+            max_retries, retry_backoff, completed_batches,
+        )
+    if incremental:
+        logger.info(
+            f"Document {document_id}: {counts['new']} new, {counts['moved']} moved, "
+            f"{counts['unchanged']} unchanged and {len(stale)} stale chunks."
+        )
+
+    return total_chunks[0]
+
+
+def copy_document_chunks(
+    vector_store_service: VectorStoreService,
+    source: Document,
+    target: Document,
+    batch_size: Optional[int] = None,
+    keyword_index: Optional[KeywordIndex] = None,
+) -> int:
+    """
+    Gives `target` the stored chunks of `source`, a document with the same
+    content, instead of chunking and embedding the file again.
+
+    Chunks are copied into the target owner's collection together with their
+    embeddings, with the target's id and library metadata. Chunks the target
+    had stored before (e.g. for an earlier version of its file) are deleted.
+
+    Returns:
+        The number of chunks copied.
+    """
+    batch_size = batch_size or settings.CHUNK_BATCH_SIZE
+    previous = vector_store_service.get_document_chunks(target.owner_id, target.id)
+    target_metadata = {**document_chunk_metadata(target), "document_id": str(target.id)}
+    source_prefix = str(source.id)
+
+    copied: Set[str] = set()
+    for batch in vector_store_service.iter_document_chunks(source.owner_id, source.id, batch_size):
+        # Chunk ids start with the document id, followed by the content hash
+        ids = [f"{target.id}{chunk_id[len(source_prefix):]}" for chunk_id in batch["ids"]]
+        metadatas = []
+        for metadata in batch["metadatas"]:
+            metadata = {key: value for key, value in metadata.items() if key != "owner_id"}
+            metadatas.append({**metadata, **target_metadata})
+        vector_store_service.upsert_texts(
+            owner_id=target.owner_id, ids=ids, documents=batch["documents"], metadatas=metadatas,
+            embeddings=np.asarray(batch["embeddings"], dtype=np.float32),
+        )
+        if keyword_index is not None:
+            keyword_index.add(target.owner_id, ids, batch["documents"], metadatas)
+        copied.update(ids)
+
+    stale = [chunk_id for chunk_id in previous if chunk_id not in copied]
+    if stale:
+        vector_store_service.delete_chunks(target.owner_id, stale)
+        if keyword_index is not None:
+            keyword_index.delete(stale)
+    return len(copied)
+
+
+def _text(item: Union[str, Chunk]) -> str:
+    return item.text if isinstance(item, Chunk) else item
+
+
+def _chunk_metadata(item: Union[str, Chunk]) -> Dict[str, Any]:
+    if not isinstance(item, Chunk):
+        return {}
+    return {**(item.metadata or {}), "start_offset": item.start, "end_offset": item.end}
+
+
+def _upload_with_retry(
+    vector_store_service: VectorStoreService,
+    keyword_index: Optional[KeywordIndex],
+    owner_id: Optional[UUID],
+    batch: _Batch,
+    max_retries: int,
+    retry_backoff: float,
+    completed_batches: int,
+):
+    def upload():
+        if batch.ids:
+            vector_store_service.upsert_texts(
+                owner_id=owner_id, ids=batch.ids, documents=batch.documents, metadatas=batch.metadatas,
+                embeddings=batch.embeddings,
+            )
+        if batch.moved_ids:
+            vector_store_service.update_metadatas(owner_id, batch.moved_ids, batch.moved_metadatas)
+        if keyword_index is not None and (batch.ids or batch.moved_ids):
+            keyword_index.add(
+                owner_id,
+                batch.ids + batch.moved_ids,
+                batch.documents + batch.moved_documents,
+                batch.metadatas + batch.moved_metadatas,
+            )
+
+    _retry(upload, f"Batch {batch.index}", max_retries, retry_backoff, completed_batches)
+
+
+def _delete_with_retry(
+    vector_store_service: VectorStoreService,
+    keyword_index: Optional[KeywordIndex],
+    owner_id: Optional[UUID],
+    ids: List[str],
+    max_retries: int,
+    retry_backoff: float,
+    completed_batches: int,
+):
+    def delete():
+        vector_store_service.delete_chunks(owner_id, ids)
+        if keyword_index is not None:
+            keyword_index.delete(ids)
+
+    _retry(delete, "Deleting stale chunks", max_retries, retry_backoff, completed_batches)
+
+
+def _retry(
+    action: Callable[[], None], label: str, max_retries: int, retry_backoff: float, completed_batches: int
+):
+    for attempt in range(max_retries + 1):
+        try:
+            action()
+            return
+        except Exception as e:
+            if attempt == max_retries:
+                raise IngestionError(
+                    f"{label} failed after {max_retries + 1} attempts: {e}",
+                    completed_batches,
+                ) from e
+            delay = retry_backoff * (2 ** attempt)
+            logger.warning(f"{label} failed ({e}); retrying in {delay:.1f}s")
+            time.sleep(delay)
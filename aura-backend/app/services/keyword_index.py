@@ -0,0 +1,215 @@
+"""
+BM25 keyword index over document chunks, used next to vector search.
+
+Dense embeddings handle exact tokens such as EINs, dollar amounts, program
+names and dates poorly; a keyword index finds them directly. The index is an
+SQLite FTS5 table ranked with its built-in `bm25()`, stored in one local file
+shared by the API and the workers.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+from uuid import UUID
+
+from app.core.config import settings
+from app.db.sqlite_local import ThreadLocalSQLite
+
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    id INTEGER PRIMARY KEY,
+    chunk_id TEXT NOT NULL UNIQUE,
+    owner TEXT NOT NULL,
+    document TEXT NOT NULL,
+    metadata TEXT NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS chunks_document ON chunks (document);
+CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
+    text, owner, document, content='chunks', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS chunks_ai AFTER INSERT ON chunks BEGIN
+    INSERT INTO chunks_fts (rowid, text, owner, document)
+    VALUES (new.id, new.text, new.owner, new.document);
+END;
+CREATE TRIGGER IF NOT EXISTS chunks_ad AFTER DELETE ON chunks BEGIN
+    INSERT INTO chunks_fts (chunks_fts, rowid, text, owner, document)
+    VALUES ('delete', old.id, old.text, old.owner, old.document);
+END;
+"""
+
+# Ranking only weighs the text; owner and document are indexed for filtering
+_RANK = "bm25(chunks_fts, 1.0, 0.0, 0.0)"
+
+
+def _owner_token(owner_id: Optional[UUID]) -> str:
+    return owner_id.hex if owner_id is not None else "shared"
+
+
+def _document_token(document_id: Any) -> str:
+    return UUID(str(document_id)).hex
+
+
+def _quote(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+def query_terms(query_text: str) -> List[str]:
+    """Splits a query into distinct lowercase word tokens."""
+    return list(dict.fromkeys(re.findall(r"\w+", query_text.lower())))
+
+
+class KeywordIndex:
+    """
+    An FTS5 index of chunk texts, partitioned by owner.
+
+    Owner and document are indexed columns, so a search only intersects the
+    postings of the owner's (or document's) chunks. Other metadata filters in
+    Chroma's `where` syntax are applied to the ranked matches.
+    """
+
+    def __init__(self, path: str):
+        if path == ":memory:":
+            # A named shared-cache database, so every thread sees the same index
+            self._db = ThreadLocalSQLite(f"file:keyword_index_{id(self)}?mode=memory&cache=shared", uri=True)
+        else:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._db = ThreadLocalSQLite(path)
+        self.path = path
+        self._db.connection().executescript(_SCHEMA)
+
+    def add(
+        self, owner_id: Optional[UUID], ids: Sequence[str], documents: Sequence[str], metadatas: Sequence[dict]
+    ):
+        """Indexes chunks, replacing any already indexed under the same ids."""
+        owner = _owner_token(owner_id)
+        rows = [
+            (chunk_id, owner, _document_token(metadata["document_id"]), json.dumps(metadata), text)
+            for chunk_id, text, metadata in zip(ids, documents, metadatas)
+        ]
+        with self._db.connection() as conn:
+            conn.executemany("DELETE FROM chunks WHERE chunk_id = ?", [(row[0],) for row in rows])
+            conn.executemany(
+                "INSERT INTO chunks (chunk_id, owner, document, metadata, text) VALUES (?, ?, ?, ?, ?)", rows
+            )
+
+    def delete(self, ids: Sequence[str]):
+        """Removes chunks from the index by id."""
+        with self._db.connection() as conn:
+            conn.executemany("DELETE FROM chunks WHERE chunk_id = ?", [(chunk_id,) for chunk_id in ids])
+
+    def delete_document(self, document_id: UUID):
+        """Removes every chunk of a document from the index."""
+        with self._db.connection() as conn:
+            conn.execute("DELETE FROM chunks WHERE document = ?", (_document_token(document_id),))
+
+    def search(
+        self,
+        owner_id: Optional[UUID],
+        query_text: str,
+        where: Optional[Dict[str, Any]] = None,
+        n_results: int = 5,
+    ) -> List[Dict[str, Any]]:
+        """
+        Returns the owner's best BM25 matches for any of the query's terms.
+
+        Args:
+            owner_id: UUID of the owner whose chunks are searched
+            query_text: The text to search for
+            where: Optional Chroma-style metadata filter
+            n_results: Maximum number of results to return
+
+        Returns:
+            List of dictionaries with keys 'text', 'metadata' and 'score'
+            (the BM25 score; higher is better)
+        """
+        terms = query_terms(query_text)
+        if not terms:
+            return []
+
+        match = f"owner : {_quote(_owner_token(owner_id))} AND ({' OR '.join(map(_quote, terms))})"
+        documents = _document_ids(where)
+        if documents:
+            match += f" AND document : ({' OR '.join(_quote(_document_token(d)) for d in documents)})"
+
+        rows = self._db.connection().execute(
+            f"SELECT c.text, c.metadata, {_RANK} AS rank FROM chunks_fts "
+            "JOIN chunks c ON c.id = chunks_fts.rowid "
+            "WHERE chunks_fts MATCH ? ORDER BY rank",
+            (match,),
+        )
+        results = []
+        for text, metadata_json, rank in rows:
+            metadata = json.loads(metadata_json)
+            if where and not matches_where(metadata, where):
+                continue
+            # FTS5 reports BM25 negated so that better matches sort first
+            results.append({"text": text, "metadata": metadata, "score": -rank})
+            if len(results) >= n_results:
+                break
+        return results
+
+
+def _document_ids(where: Optional[Dict[str, Any]]) -> Optional[List[str]]:
+    """The document ids a filter restricts to, if it does so at the top level."""
+    if not where:
+        return None
+    for condition in where.get("$and", [where]):
+        value = condition.get("document_id")
+        if isinstance(value, str):
+            return [value]
+        if isinstance(value, dict) and "$in" in value:
+            return value["$in"]
+    return None
+
+
+_OPERATORS = {
+    "$eq": lambda a, b: a == b,
+    "$ne": lambda a, b: a != b,
+    "$gt": lambda a, b: a is not None and a > b,
+    "$gte": lambda a, b: a is not None and a >= b,
+    "$lt": lambda a, b: a is not None and a < b,
+    "$lte": lambda a, b: a is not None and a <= b,
+    "$in": lambda a, b: a in b,
+    "$nin": lambda a, b: a not in b,
+}
+
+
+def matches_where(metadata: Dict[str, Any], where: Dict[str, Any]) -> bool:
+    """Evaluates a Chroma `where` filter against a chunk's metadata."""
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_where(metadata, c) for c in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_where(metadata, c) for c in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            if not all(_OPERATORS[op](value, operand) for op, operand in condition.items()):
+                return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+_keyword_index: Optional[KeywordIndex] = None
+_keyword_index_lock = threading.Lock()
+
+
+def get_keyword_index() -> Optional[KeywordIndex]:
+    """Returns the process-wide keyword index, or None when hybrid search is disabled."""
+    global _keyword_index
+    if not settings.HYBRID_SEARCH_ENABLED:
+        return None
+    with _keyword_index_lock:
+        if _keyword_index is None:
+            path = ":memory:" if settings.TESTING else settings.KEYWORD_INDEX_PATH
+            _keyword_index = KeywordIndex(path)
+        return _keyword_index
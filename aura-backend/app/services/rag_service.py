@@ -1 +1,318 @@
-# RAG Service - P5-T3 Complete
+"""
+RAG (Retrieval-Augmented Generation) service for Aura (P5-T3).
+"""
+
+import asyncio
+import logging
+from typing import AsyncIterator, List, Dict, Any, Optional
+from uuid import UUID
+
+import litellm
+from pydantic import BaseModel
+
+from app.core.config import settings
+from .answer_cache import AnswerCache, get_answer_cache
+from .context_packer import PackedContext, pack_context
+from .vector_query_service import query_vector_store, aquery_vector_store, aquery_library
+from .vector_store_service import LibraryScope
+from .reranker import get_reranker
+
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_PROMPT = "You are a helpful assistant that answers questions about the user's documents."
+NO_CHUNKS_ANSWER = "I couldn't find any relevant information in the document."
+
+
+class RAGResponse(BaseModel):
+    """Response model for RAG operations."""
+    answer: str
+    chunks_used: List[Dict[str, Any]]
+    context_tokens: int = 0
+
+
+class RAGService:
+    """RAG service that combines retrieval with generation."""
+
+    def __init__(
+        self,
+        model: str = "gpt-3.5-turbo",
+        max_chunks: int = 5,
+        max_tokens: Optional[int] = None,
+        temperature: float = 0.3,
+        answer_cache: Optional[AnswerCache] = None,
+        reranker: Optional[Any] = None,
+        context_token_budget: Optional[int] = None,
+    ):
+        self.model = model
+        self.max_chunks = max_chunks
+        # Tokens the model may generate, and tokens of retrieved context it is given
+        self.max_tokens = max_tokens or settings.RAG_MAX_TOKENS
+        self.context_token_budget = context_token_budget or settings.RAG_CONTEXT_TOKEN_BUDGET
+        self.temperature = temperature
+        self.answer_cache = answer_cache or get_answer_cache()
+        # With a reranker, a larger candidate pool is retrieved and narrowed down to n_results
+        self.reranker = reranker or get_reranker()
+
+    def generate_answer(
+        self, question: str, document_id: UUID, n_results: Optional[int] = None,
+        owner_id: Optional[UUID] = None,
+    ) -> RAGResponse:
+        """
+        Generate an answer to a question based on document content.
+
+        `owner_id` is the document's owner, whose collection holds its chunks.
+        """
+        n_results = n_results or self.max_chunks
+        cache_settings = self._cache_settings(n_results)
+        if self.answer_cache:
+            cached = self.answer_cache.get(document_id, question, cache_settings)
+            if cached:
+                return RAGResponse(**cached)
+
+        try:
+            # Step 1: Retrieve relevant chunks
+            chunks = query_vector_store(
+                query_text=question,
+                document_id=document_id,
+                n_results=self._candidate_count(n_results),
+                owner_id=owner_id
+            )
+            chunks = self._rerank(question, chunks, n_results)
+
+            context = self._pack(chunks)
+            if not context.chunks:
+                return RAGResponse(answer=NO_CHUNKS_ANSWER, chunks_used=[])
+
+            # Step 2: Construct prompt and generate answer using LLM
+            response = litellm.completion(**self._completion_kwargs(question, context))
+
+            result = self._response(response, context)
+            if self.answer_cache:
+                self.answer_cache.set(document_id, question, cache_settings, result.model_dump())
+            return result
+
+        except Exception as e:
+            logger.error(f"RAG error: {str(e)}")
+            return self._error_response(e)
+
+    async def agenerate_answer(
+        self, question: str, document_id: UUID, n_results: Optional[int] = None,
+        owner_id: Optional[UUID] = None,
+    ) -> RAGResponse:
+        """
+        Async version of `generate_answer`. Retrieval and generation are awaited,
+        so a question in flight does not hold a worker thread.
+        """
+        n_results = n_results or self.max_chunks
+        cache_settings = self._cache_settings(n_results)
+        if self.answer_cache:
+            cached = await self.answer_cache.aget(document_id, question, cache_settings)
+            if cached:
+                return RAGResponse(**cached)
+
+        try:
+            chunks = await aquery_vector_store(
+                query_text=question,
+                document_id=document_id,
+                n_results=self._candidate_count(n_results),
+                owner_id=owner_id
+            )
+            chunks = await self._arerank(question, chunks, n_results)
+
+            context = self._pack(chunks)
+            if not context.chunks:
+                return RAGResponse(answer=NO_CHUNKS_ANSWER, chunks_used=[])
+
+            result = await self._agenerate_from_context(question, context)
+            if self.answer_cache:
+                await self.answer_cache.aset(document_id, question, cache_settings, result.model_dump())
+            return result
+
+        except Exception as e:
+            logger.error(f"RAG error: {str(e)}")
+            return self._error_response(e)
+
+    async def agenerate_library_answer(
+        self, question: str, scope: LibraryScope, n_results: Optional[int] = None
+    ) -> RAGResponse:
+        """
+        Generate an answer from every document in `scope` at once.
+
+        Chunks are retrieved with a single vector search across the library.
+        Library answers are not cached, since any document in scope may be
+        reprocessed.
+        """
+        try:
+            n_results = n_results or self.max_chunks
+            chunks = await aquery_library(
+                query_text=question,
+                scope=scope,
+                n_results=self._candidate_count(n_results)
+            )
+            chunks = await self._arerank(question, chunks, n_results)
+
+            context = self._pack(chunks)
+            if not context.chunks:
+                return RAGResponse(answer=NO_CHUNKS_ANSWER, chunks_used=[])
+
+            return await self._agenerate_from_context(question, context)
+
+        except Exception as e:
+            logger.error(f"RAG library error: {str(e)}")
+            return self._error_response(e)
+
+    async def _agenerate_from_context(self, question: str, context: PackedContext) -> RAGResponse:
+        response = await litellm.acompletion(**self._completion_kwargs(question, context))
+        return self._response(response, context)
+
+    async def astream_answer(
+        self, question: str, document_id: UUID, n_results: Optional[int] = None,
+        owner_id: Optional[UUID] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream an answer as a sequence of events.
+
+        Yields dictionaries with an "event" and its "data":
+        - "chunks": the chunks packed into the context, sent before generation starts
+        - "token": a piece of the answer, as soon as the model produces it
+        - "done": the complete answer and the number of context tokens used
+        - "error": an error message; no further events follow
+
+        A cached answer is sent as a single token.
+        """
+        n_results = n_results or self.max_chunks
+        cache_settings = self._cache_settings(n_results)
+        if self.answer_cache:
+            cached = await self.answer_cache.aget(document_id, question, cache_settings)
+            if cached:
+                yield {"event": "chunks", "data": cached["chunks_used"]}
+                yield {"event": "token", "data": cached["answer"]}
+                yield {"event": "done", "data": {
+                    "answer": cached["answer"], "context_tokens": cached.get("context_tokens", 0)
+                }}
+                return
+
+        try:
+            chunks = await aquery_vector_store(
+                query_text=question,
+                document_id=document_id,
+                n_results=self._candidate_count(n_results),
+                owner_id=owner_id
+            )
+            chunks = await self._arerank(question, chunks, n_results)
+            context = self._pack(chunks)
+            yield {"event": "chunks", "data": context.chunks}
+
+            if not context.chunks:
+                yield {"event": "token", "data": NO_CHUNKS_ANSWER}
+                yield {"event": "done", "data": {"answer": NO_CHUNKS_ANSWER, "context_tokens": 0}}
+                return
+
+            stream = await litellm.acompletion(
+                **self._completion_kwargs(question, context), stream=True
+            )
+            parts = []
+            async for part in stream:
+                token = part.choices[0].delta.content
+                if token:
+                    parts.append(token)
+                    yield {"event": "token", "data": token}
+
+            answer = "".join(parts).strip()
+            if self.answer_cache:
+                await self.answer_cache.aset(
+                    document_id, question, cache_settings,
+                    {"answer": answer, "chunks_used": context.chunks, "context_tokens": context.tokens}
+                )
+            yield {"event": "done", "data": {"answer": answer, "context_tokens": context.tokens}}
+
+        except Exception as e:
+            logger.error(f"RAG streaming error: {str(e)}")
+            yield {"event": "error", "data": self._error_response(e).answer}
+
+    def _candidate_count(self, n_results: int) -> int:
+        """Number of chunks to retrieve for a prompt of `n_results` chunks."""
+        if self.reranker is None:
+            return n_results
+        return max(n_results, settings.RERANK_CANDIDATES)
+
+    def _rerank(self, question: str, chunks: List[Dict[str, Any]], n_results: int) -> List[Dict[str, Any]]:
+        if self.reranker is None:
+            return chunks
+        return self.reranker.rerank(question, chunks, n_results)
+
+    async def _arerank(self, question: str, chunks: List[Dict[str, Any]], n_results: int) -> List[Dict[str, Any]]:
+        # Re-ranking runs a model, so keep it off the event loop
+        if self.reranker is None:
+            return chunks
+        return await asyncio.to_thread(self.reranker.rerank, question, chunks, n_results)
+
+    def _cache_settings(self, n_results: int) -> Dict[str, Any]:
+        """Everything besides the question that determines the answer."""
+        return {
+            "model": self.model,
+            "n_results": n_results,
+            "max_tokens": self.max_tokens,
+            "context_token_budget": self.context_token_budget,
+            "temperature": self.temperature,
+            "system_prompt": SYSTEM_PROMPT,
+            "reranker": self.reranker.name if self.reranker else None,
+        }
+
+    def _pack(self, chunks: List[Dict[str, Any]]) -> PackedContext:
+        """Fit the chunks, most relevant first, into the context token budget."""
+        return pack_context(chunks, self.model, self.context_token_budget)
+
+    def _completion_kwargs(self, question: str, context: PackedContext) -> Dict[str, Any]:
+        """Build the LLM call arguments for a question and its packed context."""
+        prompt = self._construct_prompt(question, context)
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            "max_tokens": self.max_tokens,
+            "temperature": self.temperature,
+        }
+
+    @staticmethod
+    def _extract_answer(response: Any) -> str:
+        return response.choices[0].message.content.strip()
+
+    def _response(self, response: Any, context: PackedContext) -> RAGResponse:
+        return RAGResponse(
+            answer=self._extract_answer(response),
+            chunks_used=context.chunks,
+            context_tokens=context.tokens,
+        )
+
+    @staticmethod
+    def _error_response(error: Exception) -> RAGResponse:
+        return RAGResponse(
+            answer=f"I encountered an error while processing your question: {str(error)}",
+            chunks_used=[]
+        )
+
+    def _construct_prompt(self, question: str, context: PackedContext) -> str:
+        """Construct a prompt with question and packed context."""
+        return f"""Answer based only on the provided context. If the context does not contain the answer, say so.
+
+{context.text}
+
+Question: {question}
+
+Answer:"""
+
+
+def generate_rag_answer(
+    question: str,
+    document_id: UUID,
+    model: str = "gpt-3.5-turbo",
+    n_results: int = 5,
+    owner_id: Optional[UUID] = None,
+) -> RAGResponse:
+    """Convenience function to generate a RAG answer."""
+    service = RAGService(model=model, max_chunks=n_results)
+    return service.generate_answer(question, document_id, n_results, owner_id=owner_id)
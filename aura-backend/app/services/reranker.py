@@ -0,0 +1,138 @@
+"""
+Re-ranking of retrieved chunks before prompt construction.
+
+Retrieval returns a larger candidate pool than the prompt needs; a reranker
+picks the few chunks that are worth sending. Overlapping chunks of the same
+passage are near-duplicates, so spending prompt tokens on more than one of
+them adds cost and latency without adding information.
+"""
+
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from app.core.config import settings
+
+if TYPE_CHECKING:
+    from sentence_transformers import CrossEncoder
+
+
+EmbedFn = Callable[[List[str]], np.ndarray]
+
+
+def mmr_select(
+    query_embedding: np.ndarray, candidate_embeddings: np.ndarray, k: int, lambda_mult: float
+) -> List[int]:
+    """
+    Maximal marginal relevance selection.
+
+    Greedily picks the candidate maximizing
+    `lambda_mult * sim(query, c) - (1 - lambda_mult) * max(sim(c, selected))`,
+    so each pick is relevant but unlike the ones already chosen.
+
+    Returns:
+        Indices of the selected candidates, in selection order.
+    """
+    if len(candidate_embeddings) == 0:
+        return []
+    query = query_embedding / (np.linalg.norm(query_embedding) or 1.0)
+    norms = np.linalg.norm(candidate_embeddings, axis=1, keepdims=True)
+    candidates = candidate_embeddings / np.where(norms == 0, 1.0, norms)
+
+    relevance = candidates @ query
+    similarity = candidates @ candidates.T
+    redundancy = np.zeros(len(candidates), dtype=relevance.dtype)
+    selected: List[int] = []
+    for _ in range(min(k, len(candidates))):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[selected] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        redundancy = np.maximum(redundancy, similarity[best])
+    return selected
+
+
+class MMRReranker:
+    """Diversifies the candidates with maximal marginal relevance over their embeddings."""
+
+    def __init__(self, lambda_mult: Optional[float] = None, embed_fn: Optional[EmbedFn] = None):
+        self.lambda_mult = settings.MMR_LAMBDA if lambda_mult is None else lambda_mult
+        self._embed_fn = embed_fn
+
+    @property
+    def name(self) -> str:
+        return f"mmr:{self.lambda_mult}"
+
+    def rerank(self, query: str, chunks: List[Dict[str, Any]], top_n: int) -> List[Dict[str, Any]]:
+        if len(chunks) <= 1:
+            return chunks[:top_n]
+        # Chunk embeddings were cached by content hash at ingestion
+        embeddings = self._embed([query] + [chunk["text"] for chunk in chunks])
+        selected = mmr_select(embeddings[0], embeddings[1:], top_n, self.lambda_mult)
+        return [chunks[i] for i in selected]
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        if self._embed_fn is None:
+            from app.services.embedding_service import embedding_service
+            self._embed_fn = embedding_service.embed_batch
+        return np.asarray(self._embed_fn(texts), dtype=np.float32)
+
+
+class CrossEncoderReranker:
+    """
+    Scores each (question, chunk) pair with a local cross-encoder and keeps the
+    best. More accurate than MMR, at the cost of one model pass per candidate.
+    """
+
+    def __init__(self, model_name: Optional[str] = None, batch_size: Optional[int] = None):
+        self.model_name = model_name or settings.CROSS_ENCODER_MODEL_NAME
+        self.batch_size = batch_size or settings.EMBEDDING_BATCH_SIZE
+        self._model: Optional["CrossEncoder"] = None
+        self._lock = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        return f"cross-encoder:{self.model_name}"
+
+    @property
+    def model(self) -> "CrossEncoder":
+        """The cross-encoder model, loaded once on first access."""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from sentence_transformers import CrossEncoder
+                    self._model = CrossEncoder(self.model_name, device=settings.EMBEDDING_DEVICE)
+        return self._model
+
+    def rerank(self, query: str, chunks: List[Dict[str, Any]], top_n: int) -> List[Dict[str, Any]]:
+        if len(chunks) <= 1:
+            return chunks[:top_n]
+        scores = self.model.predict(
+            [(query, chunk["text"]) for chunk in chunks],
+            batch_size=self.batch_size,
+            show_progress_bar=False,
+        )
+        order = np.argsort(-np.asarray(scores), kind="stable")[:top_n]
+        return [chunks[i] for i in order]
+
+
+_reranker: Optional[Any] = None
+_reranker_lock = threading.Lock()
+
+
+def get_reranker() -> Optional[Any]:
+    """Returns the process-wide reranker configured by RERANK_STRATEGY, or None."""
+    global _reranker
+    strategy = settings.RERANK_STRATEGY
+    if not strategy:
+        return None
+    with _reranker_lock:
+        if _reranker is None:
+            if strategy == "mmr":
+                _reranker = MMRReranker()
+            elif strategy == "cross-encoder":
+                _reranker = CrossEncoderReranker()
+            else:
+                raise ValueError(f"Unknown RERANK_STRATEGY: {strategy}")
+        return _reranker
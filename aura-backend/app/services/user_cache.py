@@ -0,0 +1,125 @@
+"""
+Cache of authenticated users, keyed by the JWT subject.
+
+Every authenticated request resolves its token to a `User`, and users change
+rarely, so a short-lived cache saves the database lookup on almost every
+request. Password hashes are never cached; the cached user is only used for
+identity and the active check.
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from uuid import UUID
+
+from app.core.config import settings
+from app.db.models_pg import User
+
+
+logger = logging.getLogger(__name__)
+
+
+def _to_dict(user: User) -> Dict[str, Any]:
+    return {"id": str(user.id), "email": user.email, "is_active": user.is_active}
+
+
+def _from_dict(data: Dict[str, Any]) -> User:
+    # A fresh, detached instance per request, so callers can't alter the cached copy
+    return User(id=UUID(data["id"]), email=data["email"], is_active=data["is_active"], hashed_password="")
+
+
+class UserCache:
+    """
+    An in-process LRU cache with a per-entry TTL, optionally backed by a
+    shared Redis tier.
+
+    With Redis, a user loaded by one API process is a cache hit in the others,
+    and invalidation removes the shared entry at once; other processes' local
+    copies expire within `ttl` seconds. Redis errors are logged and treated as
+    cache misses, so the cache never fails a request.
+    """
+
+    def __init__(self, ttl: int, max_entries: int, redis_client: Optional[Any] = None, prefix: str = "aura:users"):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.redis = redis_client
+        self.prefix = prefix
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, subject: str) -> Optional[User]:
+        """Returns the cached user for a token subject, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(subject)
+            if entry is not None:
+                expires_at, data = entry
+                if expires_at >= time.monotonic():
+                    self._entries.move_to_end(subject)
+                    return _from_dict(data)
+                del self._entries[subject]
+
+        if self.redis is None:
+            return None
+        try:
+            value = self.redis.get(f"{self.prefix}:{subject}")
+        except Exception as e:
+            logger.warning(f"User cache lookup failed: {e}")
+            return None
+        if value is None:
+            return None
+        data = json.loads(value)
+        self._remember(subject, data)
+        return _from_dict(data)
+
+    def set(self, subject: str, user: User):
+        """Caches the user a token subject resolves to."""
+        data = _to_dict(user)
+        self._remember(subject, data)
+        if self.redis is not None:
+            try:
+                self.redis.set(f"{self.prefix}:{subject}", json.dumps(data), ex=self.ttl)
+            except Exception as e:
+                logger.warning(f"User cache store failed: {e}")
+
+    def invalidate(self, subject: str):
+        """Drops a user, e.g. after they were deactivated."""
+        with self._lock:
+            self._entries.pop(subject, None)
+        if self.redis is not None:
+            try:
+                self.redis.delete(f"{self.prefix}:{subject}")
+            except Exception as e:
+                logger.warning(f"User cache invalidation failed for {subject}: {e}")
+
+    def _remember(self, subject: str, data: Dict[str, Any]):
+        with self._lock:
+            self._entries[subject] = (time.monotonic() + self.ttl, data)
+            self._entries.move_to_end(subject)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+_user_cache: Optional[UserCache] = None
+_user_cache_lock = threading.Lock()
+
+
+def get_user_cache() -> Optional[UserCache]:
+    """Returns the process-wide user cache, or None when caching is disabled."""
+    global _user_cache
+    if not settings.USER_CACHE_ENABLED:
+        return None
+    with _user_cache_lock:
+        if _user_cache is None:
+            redis_client = None
+            if settings.USER_CACHE_BACKEND == "redis" and not settings.TESTING:
+                from app.core.redis_client import get_cache_redis
+                redis_client = get_cache_redis()
+            _user_cache = UserCache(
+                ttl=settings.USER_CACHE_TTL,
+                max_entries=settings.USER_CACHE_MAX_ENTRIES,
+                redis_client=redis_client,
+            )
+        return _user_cache
@@ -2,45 +2,179 @@
 Vector store query operations for retrieving text chunks.
 """
 
-from typing import List, Dict, Any
+import asyncio
+import logging
+from typing import List, Dict, Any, Optional, Sequence
 from uuid import UUID
-from app.services.vector_store_service import VectorStoreService
+from app.services.vector_store_service import (
+    LibraryScope,
+    get_vector_store_service,
+    get_async_vector_store_service,
+)
+from app.services.embedding_service import embedding_service
+from app.services.keyword_index import get_keyword_index
 from app.core.config import settings
 
 
-def query_vector_store(query_text: str, document_id: UUID, n_results: int = 5) -> List[Dict[str, Any]]:
+logger = logging.getLogger(__name__)
+
+
+def query_vector_store(
+    query_text: str, document_id: UUID, n_results: int = 5, owner_id: Optional[UUID] = None
+) -> List[Dict[str, Any]]:
     """
     Query the vector store for the most relevant text chunks for a given document.
-    
+
     This is the main function specified in P5-T2 for retrieving text chunks
-    from the vector store based on a query text and document ID.
-    
+    from the vector store based on a query text and document ID. When hybrid
+    search is enabled, vector results are fused with BM25 keyword matches.
+
     Args:
         query_text: The text to search for semantically similar chunks
         document_id: UUID of the document to search within
         n_results: Maximum number of results to return (default: 5)
-        
+        owner_id: UUID of the document's owner; chunks are stored in one
+            collection per owner (None for documents without an owner)
+
     Returns:
         List of dictionaries containing:
         - 'text': The text content of the chunk
         - 'metadata': Metadata associated with the chunk
-        - 'distance': Semantic distance/similarity score
-        
+        - 'distance': Semantic distance/similarity score (None for chunks
+          only found by keyword search)
+        - 'score': Fused reciprocal-rank score, with hybrid search only
+
     Example:
         chunks = query_vector_store("What is the project about?", document_uuid)
         for chunk in chunks:
             print(f"Text: {chunk['text'][:100]}...")
             print(f"Distance: {chunk['distance']}")
     """
-    # Initialize the vector store service
-    vector_service = VectorStoreService(
-        host=settings.CHROMA_HOST,
-        port=settings.CHROMA_PORT
+    return _search(owner_id, query_text, {"document_id": str(document_id)}, n_results)
+
+
+async def aquery_vector_store(
+    query_text: str, document_id: UUID, n_results: int = 5, owner_id: Optional[UUID] = None
+) -> List[Dict[str, Any]]:
+    """
+    Async version of `query_vector_store`, used by the API's query path.
+
+    Args:
+        query_text: The text to search for semantically similar chunks
+        document_id: UUID of the document to search within
+        n_results: Maximum number of results to return (default: 5)
+        owner_id: UUID of the document's owner
+
+    Returns:
+        The same list of chunk dictionaries as `query_vector_store`.
+    """
+    return await _asearch(owner_id, query_text, {"document_id": str(document_id)}, n_results)
+
+
+def query_library(query_text: str, scope: LibraryScope, n_results: int = 5) -> List[Dict[str, Any]]:
+    """
+    Query the vector store for the most relevant text chunks across a library.
+
+    All documents selected by `scope` are searched with one vector query, and
+    each chunk's metadata names the document it came from.
+
+    Args:
+        query_text: The text to search for semantically similar chunks
+        scope: The owner and optional document, type and date filters
+        n_results: Maximum number of results to return (default: 5)
+
+    Returns:
+        The same list of chunk dictionaries as `query_vector_store`.
+    """
+    return _search(scope.owner_id, query_text, scope.to_where(), n_results)
+
+
+async def aquery_library(query_text: str, scope: LibraryScope, n_results: int = 5) -> List[Dict[str, Any]]:
+    """Async version of `query_library`."""
+    return await _asearch(scope.owner_id, query_text, scope.to_where(), n_results)
+
+
+def reciprocal_rank_fusion(
+    result_lists: Sequence[List[Dict[str, Any]]], n_results: int, k: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Merges ranked chunk lists by reciprocal-rank fusion.
+
+    Each chunk scores sum(1 / (k + rank)) over the lists it appears in, so
+    chunks ranked well by several retrievers rise to the top without having to
+    compare vector distances with BM25 scores. Chunks are identified by their
+    document and chunk index.
+    """
+    k = settings.RRF_K if k is None else k
+    fused: Dict[Any, Dict[str, Any]] = {}
+    for results in result_lists:
+        for rank, chunk in enumerate(results, 1):
+            key = _chunk_key(chunk)
+            entry = fused.get(key)
+            if entry is None:
+                entry = fused[key] = {
+                    "text": chunk["text"],
+                    "metadata": chunk["metadata"],
+                    "distance": chunk.get("distance"),
+                    "score": 0.0,
+                }
+            elif entry["distance"] is None:
+                entry["distance"] = chunk.get("distance")
+            entry["score"] += 1.0 / (k + rank)
+
+    return sorted(fused.values(), key=lambda c: c["score"], reverse=True)[:n_results]
+
+
+def _chunk_key(chunk: Dict[str, Any]) -> Any:
+    metadata = chunk.get("metadata") or {}
+    if "document_id" in metadata and "chunk_index" in metadata:
+        return metadata["document_id"], metadata["chunk_index"]
+    return chunk["text"]
+
+
+def _keyword_search(
+    owner_id: Optional[UUID], query_text: str, where: Optional[Dict[str, Any]], n_results: int
+) -> List[Dict[str, Any]]:
+    # The keyword index only adds recall, so a failure falls back to vector results
+    try:
+        return get_keyword_index().search(owner_id, query_text, where, n_results)
+    except Exception as e:
+        logger.warning(f"Keyword search failed: {e}")
+        return []
+
+
+def _search(
+    owner_id: Optional[UUID], query_text: str, where: Optional[Dict[str, Any]], n_results: int
+) -> List[Dict[str, Any]]:
+    # Reuse the process-wide client and collection handle
+    vector_service = get_vector_store_service()
+
+    # Embed the query with the same model used at ingestion
+    query_embedding = embedding_service.embed_batch([query_text])[0]
+
+    if get_keyword_index() is None:
+        return vector_service.search(owner_id, query_text, where, n_results, query_embedding)
+
+    n_candidates = max(n_results, settings.HYBRID_CANDIDATES)
+    vector_chunks = vector_service.search(owner_id, query_text, where, n_candidates, query_embedding)
+    keyword_chunks = _keyword_search(owner_id, query_text, where, n_candidates)
+    return reciprocal_rank_fusion([vector_chunks, keyword_chunks], n_results)
+
+
+async def _asearch(
+    owner_id: Optional[UUID], query_text: str, where: Optional[Dict[str, Any]], n_results: int
+) -> List[Dict[str, Any]]:
+    # Encoding is CPU-bound, so keep it off the event loop
+    query_embedding = (await asyncio.to_thread(embedding_service.embed_batch, [query_text]))[0]
+    vector_service = await get_async_vector_store_service()
+
+    if get_keyword_index() is None:
+        return await vector_service.search(owner_id, query_text, where, n_results, query_embedding)
+
+    # Run the keyword search while waiting on Chroma
+    n_candidates = max(n_results, settings.HYBRID_CANDIDATES)
+    vector_chunks, keyword_chunks = await asyncio.gather(
+        vector_service.search(owner_id, query_text, where, n_candidates, query_embedding),
+        asyncio.to_thread(_keyword_search, owner_id, query_text, where, n_candidates),
     )
-    
-    # Query for relevant chunks
-    return vector_service.query_chunks(
-        query_text=query_text,
-        document_id=document_id,
-        n_results=n_results
-    ) 
\ No newline at end of file
+    return reciprocal_rank_fusion([vector_chunks, keyword_chunks], n_results)
@@ -1,61 +1,469 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
 import chromadb
-from typing import List, Dict, Any
+import numpy as np
+from chromadb.config import Settings as ChromaSettings
+from datetime import datetime
+from pydantic import BaseModel
+from typing import List, Dict, Any, Iterator, Optional
 from uuid import UUID
 from app.core.config import settings
 
+logger = logging.getLogger(__name__)
+
+
+def _http_settings() -> ChromaSettings:
+    return ChromaSettings(
+        chroma_http_max_connections=settings.CHROMA_MAX_CONNECTIONS,
+        chroma_http_keepalive_secs=settings.CHROMA_KEEPALIVE_SECS,
+    )
+
+
+def _query_input(query_text: str, query_embedding: Optional[np.ndarray]) -> Dict[str, Any]:
+    if query_embedding is None:
+        return {"query_texts": [query_text]}
+    return {"query_embeddings": np.atleast_2d(query_embedding)}
+
+
+class LibraryScope(BaseModel):
+    """
+    Selects the chunks of an owner's library to search.
+
+    `owner_id` selects the owner's collection; every other field narrows the
+    search further, and together they become a single Chroma metadata filter,
+    so a library query is one vector search no matter how many documents it
+    spans.
+    """
+    owner_id: UUID
+    document_ids: Optional[List[UUID]] = None
+    document_types: Optional[List[str]] = None
+    uploaded_after: Optional[datetime] = None
+    uploaded_before: Optional[datetime] = None
+
+    def to_where(self) -> Optional[Dict[str, Any]]:
+        """
+        Builds the Chroma `where` filter over the chunk metadata written at
+        ingestion, or None when the whole collection is searched.
+        """
+        conditions: List[Dict[str, Any]] = []
+        if self.document_ids:
+            conditions.append({"document_id": {"$in": [str(d) for d in self.document_ids]}})
+        if self.document_types:
+            conditions.append({"document_type": {"$in": [t.lower().lstrip(".") for t in self.document_types]}})
+        if self.uploaded_after:
+            conditions.append({"upload_date": {"$gte": int(self.uploaded_after.timestamp())}})
+        if self.uploaded_before:
+            conditions.append({"upload_date": {"$lt": int(self.uploaded_before.timestamp())}})
+        if not conditions:
+            return None
+        # Chroma requires at least two operands for $and
+        return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+
+def _format_query_results(results) -> List[Dict[str, Any]]:
+    """Formats a Chroma query result into a list of chunk dictionaries."""
+    chunks = []
+    if results and results['documents'] and results['documents'][0]:
+        documents = results['documents'][0]
+        metadatas = results['metadatas'][0] if results['metadatas'] else [{}] * len(documents)
+        distances = results['distances'][0] if results['distances'] else [0.0] * len(documents)
+
+        for i, doc in enumerate(documents):
+            chunks.append({
+                'text': doc,
+                'metadata': metadatas[i] if i < len(metadatas) else {},
+                'distance': distances[i] if i < len(distances) else 0.0
+            })
+
+    return chunks
+
+
+LEGACY_COLLECTION_NAME = "aura_collection"
+SHARED_COLLECTION_NAME = "aura_shared"
+
+
+def collection_name(owner_id: Optional[UUID]) -> str:
+    """
+    Name of the collection holding an owner's chunks. Documents without an
+    owner share one collection.
+    """
+    return f"aura_owner_{owner_id.hex}" if owner_id is not None else SHARED_COLLECTION_NAME
+
+
+class CollectionManager:
+    """
+    Shards chunks into one Chroma collection per owner.
+
+    Each tenant gets its own index, so search cost depends on the size of the
+    tenant's library rather than on the whole corpus. Collections are created
+    on first use and their handles are cached, least recently used first out
+    once more than `max_cached` are held.
+    """
+    def __init__(self, client: Any, max_cached: Optional[int] = None):
+        self.client = client
+        self.max_cached = max_cached or settings.CHROMA_MAX_CACHED_COLLECTIONS
+        self._collections: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, owner_id: Optional[UUID]) -> Any:
+        """Returns the owner's collection, creating it if needed."""
+        name = collection_name(owner_id)
+        with self._lock:
+            collection = self._collections.get(name)
+            if collection is not None:
+                self._collections.move_to_end(name)
+                return collection
+        collection = self.client.get_or_create_collection(name)
+        with self._lock:
+            self._remember(name, collection)
+        return collection
+
+    def forget(self, owner_id: Optional[UUID]):
+        """Drops a cached handle, e.g. after its collection was deleted."""
+        with self._lock:
+            self._collections.pop(collection_name(owner_id), None)
+
+    def _remember(self, name: str, collection: Any):
+        self._collections[name] = collection
+        self._collections.move_to_end(name)
+        while len(self._collections) > self.max_cached:
+            self._collections.popitem(last=False)
+
+
+class AsyncCollectionManager(CollectionManager):
+    """`CollectionManager` for the async client."""
+    async def aget(self, owner_id: Optional[UUID]) -> Any:
+        """Returns the owner's collection, creating it if needed."""
+        name = collection_name(owner_id)
+        with self._lock:
+            collection = self._collections.get(name)
+            if collection is not None:
+                self._collections.move_to_end(name)
+                return collection
+        collection = await self.client.get_or_create_collection(name)
+        with self._lock:
+            self._remember(name, collection)
+        return collection
+
+
 class VectorStoreService:
-    def __init__(self, host: str, port: int):
+    def __init__(self, host: str, port: int, client: Optional[Any] = None):
+        if client is not None:
+            self.client = client
         # For testing, we might use an in-memory ephemeral client
-        if settings.TESTING:
+        elif settings.TESTING:
             self.client = chromadb.EphemeralClient()
         else:
-            self.client = chromadb.HttpClient(host=host, port=port)
-        
-        # This is temporary until we have a proper collection management system
-        self.collection = self.client.get_or_create_collection("aura_collection")
+            self.client = chromadb.HttpClient(host=host, port=port, settings=_http_settings())
+
+        self.collections = CollectionManager(self.client)
+
+    def add_texts(
+        self, owner_id: Optional[UUID], ids: list[str], documents: list[str], metadatas: list[dict],
+        embeddings: Optional[np.ndarray] = None,
+    ):
+        """
+        Adds texts to the owner's collection with precomputed embeddings, or
+        lets Chroma embed them when `embeddings` is None.
+        """
+        self.collections.get(owner_id).add(
+            ids=ids,
+            documents=documents,
+            metadatas=metadatas,
+            embeddings=embeddings
+        )
 
-    def add_texts(self, ids: list[str], documents: list[str], metadatas: list[dict]):
-        self.collection.add(
+    def upsert_texts(
+        self, owner_id: Optional[UUID], ids: list[str], documents: list[str], metadatas: list[dict],
+        embeddings: Optional[np.ndarray] = None,
+    ):
+        """Adds texts to the owner's collection, overwriting entries with the same ids."""
+        self.collections.get(owner_id).upsert(
             ids=ids,
             documents=documents,
-            metadatas=metadatas
+            metadatas=metadatas,
+            embeddings=embeddings
         )
 
-    def query_chunks(self, query_text: str, document_id: UUID, n_results: int = 5) -> List[Dict[str, Any]]:
+    def update_metadatas(self, owner_id: Optional[UUID], ids: list[str], metadatas: list[dict]):
+        """Replaces the metadata of stored chunks, keeping their texts and embeddings."""
+        self.collections.get(owner_id).update(ids=ids, metadatas=metadatas)
+
+    def delete_chunks(self, owner_id: Optional[UUID], ids: list[str]):
+        """Deletes chunks from the owner's collection by id."""
+        self.collections.get(owner_id).delete(ids=ids)
+
+    def get_document_chunks(self, owner_id: Optional[UUID], document_id: UUID) -> Dict[str, dict]:
+        """Returns the metadata of every stored chunk of a document, keyed by chunk id."""
+        results = self.collections.get(owner_id).get(
+            where={"document_id": str(document_id)}, include=["metadatas"]
+        )
+        return dict(zip(results["ids"], results["metadatas"]))
+
+    def iter_document_chunks(
+        self, owner_id: Optional[UUID], document_id: UUID, batch_size: int = 500
+    ) -> Iterator[Dict[str, list]]:
+        """
+        Reads every stored chunk of a document in batches, with its text,
+        metadata and embedding.
+        """
+        collection = self.collections.get(owner_id)
+        offset = 0
+        while True:
+            batch = collection.get(
+                where={"document_id": str(document_id)},
+                include=["documents", "metadatas", "embeddings"],
+                limit=batch_size,
+                offset=offset,
+            )
+            if not batch["ids"]:
+                return
+            yield batch
+            offset += len(batch["ids"])
+
+    def query_chunks(
+        self, owner_id: Optional[UUID], query_text: str, document_id: UUID, n_results: int = 5,
+        query_embedding: Optional[np.ndarray] = None,
+    ) -> List[Dict[str, Any]]:
         """
         Query the vector store for the most relevant text chunks for a given document.
         
         Args:
+            owner_id: UUID of the document's owner, whose collection is searched
             query_text: The text to search for
             document_id: UUID of the document to search within
             n_results: Maximum number of results to return
+            query_embedding: Precomputed embedding of `query_text`; when None,
+                Chroma embeds the text itself
             
         Returns:
             List of dictionaries containing chunk data with keys: 'text', 'metadata', 'distance'
         """
-        # Query the collection, filtering by document_id
-        results = self.collection.query(
-            query_texts=[query_text],
+        # Query the owner's collection, filtering by document_id
+        return self.search(
+            owner_id, query_text, {"document_id": str(document_id)}, n_results, query_embedding
+        )
+
+    def query_library(
+        self, query_text: str, scope: LibraryScope, n_results: int = 5,
+        query_embedding: Optional[np.ndarray] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Query the vector store for the most relevant text chunks across the
+        documents selected by `scope`, in a single search.
+        """
+        return self.search(scope.owner_id, query_text, scope.to_where(), n_results, query_embedding)
+
+    def search(
+        self, owner_id: Optional[UUID], query_text: str, where: Optional[Dict[str, Any]],
+        n_results: int = 5, query_embedding: Optional[np.ndarray] = None,
+    ) -> List[Dict[str, Any]]:
+        """Runs one nearest-neighbour query in the owner's collection, optionally filtered."""
+        results = self.collections.get(owner_id).query(
+            **_query_input(query_text, query_embedding),
             n_results=n_results,
-            where={"document_id": str(document_id)}
+            where=where
         )
-        
-        # Format the results into a more usable structure
-        chunks = []
-        if results and results['documents'] and results['documents'][0]:
-            documents = results['documents'][0]
-            metadatas = results['metadatas'][0] if results['metadatas'] else [{}] * len(documents)
-            distances = results['distances'][0] if results['distances'] else [0.0] * len(documents)
-            
-            for i, doc in enumerate(documents):
-                chunks.append({
-                    'text': doc,
-                    'metadata': metadatas[i] if i < len(metadatas) else {},
-                    'distance': distances[i] if i < len(distances) else 0.0
-                })
-        
-        return chunks
+        return _format_query_results(results)
 
     def heartbeat(self):
         """Returns the server's heartbeat."""
-        return self.client.heartbeat() 
\ No newline at end of file
+        return self.client.heartbeat()
+
+    def close(self):
+        """Releases the client's HTTP connections."""
+        close = getattr(self.client, "close", None)
+        if close is not None:
+            close()
+
+
+class AsyncVectorStoreService:
+    """
+    Async counterpart of VectorStoreService used on the API's query path, so
+    waiting on Chroma does not hold a threadpool thread.
+    """
+    def __init__(self, client: Any):
+        self.client = client
+        self.collections = AsyncCollectionManager(client)
+
+    @classmethod
+    async def create(cls, host: str, port: int) -> "AsyncVectorStoreService":
+        client = await chromadb.AsyncHttpClient(host=host, port=port, settings=_http_settings())
+        return cls(client)
+
+    async def query_chunks(
+        self, owner_id: Optional[UUID], query_text: str, document_id: UUID, n_results: int = 5,
+        query_embedding: Optional[np.ndarray] = None,
+    ) -> List[Dict[str, Any]]:
+        """Async version of `VectorStoreService.query_chunks`."""
+        return await self.search(
+            owner_id, query_text, {"document_id": str(document_id)}, n_results, query_embedding
+        )
+
+    async def query_library(
+        self, query_text: str, scope: LibraryScope, n_results: int = 5,
+        query_embedding: Optional[np.ndarray] = None,
+    ) -> List[Dict[str, Any]]:
+        """Async version of `VectorStoreService.query_library`."""
+        return await self.search(scope.owner_id, query_text, scope.to_where(), n_results, query_embedding)
+
+    async def search(
+        self, owner_id: Optional[UUID], query_text: str, where: Optional[Dict[str, Any]],
+        n_results: int = 5, query_embedding: Optional[np.ndarray] = None,
+    ) -> List[Dict[str, Any]]:
+        """Async version of `VectorStoreService.search`."""
+        collection = await self.collections.aget(owner_id)
+        results = await collection.query(
+            **_query_input(query_text, query_embedding),
+            n_results=n_results,
+            where=where
+        )
+        return _format_query_results(results)
+
+    async def heartbeat(self):
+        """Returns the server's heartbeat."""
+        return await self.client.heartbeat()
+
+    async def aclose(self):
+        """
+        Drops the client. Chroma's async client has no public close: its HTTP
+        connections belong to one httpx client per event loop, shared by every
+        async client in the process and released when the loop shuts down, so
+        a reconnect reuses them rather than leaking a new pool.
+        """
+        self.client = None
+        self.collections = None
+
+
+class VectorStorePool:
+    """
+    A process-wide, shared Chroma client and collection handle.
+
+    Chroma's HTTP client keeps its own pool of keep-alive connections and is
+    safe to share between threads, so one client per process is reused for
+    every query instead of reconnecting on each request. The client is
+    health-checked with `heartbeat()` at most once per
+    `health_check_interval` seconds and replaced if the check fails.
+    """
+    def __init__(self, host: str, port: int, health_check_interval: Optional[float] = None):
+        self.host = host
+        self.port = port
+        self.health_check_interval = (
+            settings.CHROMA_HEALTH_CHECK_INTERVAL
+            if health_check_interval is None else health_check_interval
+        )
+        self._lock = threading.Lock()
+        self._service: Optional[VectorStoreService] = None
+        self._last_checked = 0.0
+        self._async_lock: Optional[asyncio.Lock] = None
+        self._async_service: Optional[AsyncVectorStoreService] = None
+        self._async_last_checked = 0.0
+
+    def get_service(self) -> VectorStoreService:
+        """Returns the shared service, connecting or reconnecting if needed."""
+        with self._lock:
+            now = time.monotonic()
+            if self._service is None:
+                self._service = VectorStoreService(host=self.host, port=self.port)
+                self._last_checked = now
+            elif now - self._last_checked >= self.health_check_interval:
+                try:
+                    self._service.heartbeat()
+                except Exception as e:
+                    logger.warning(f"Chroma health check failed, reconnecting: {e}")
+                    self._discard()
+                    self._service = VectorStoreService(host=self.host, port=self.port)
+                self._last_checked = now
+            return self._service
+
+    async def get_async_service(self) -> AsyncVectorStoreService:
+        """Returns the shared async service, connecting or reconnecting if needed."""
+        if self._async_lock is None:
+            self._async_lock = asyncio.Lock()
+        async with self._async_lock:
+            now = time.monotonic()
+            if self._async_service is None:
+                self._async_service = await AsyncVectorStoreService.create(self.host, self.port)
+                self._async_last_checked = now
+            elif now - self._async_last_checked >= self.health_check_interval:
+                try:
+                    await self._async_service.heartbeat()
+                except Exception as e:
+                    logger.warning(f"Chroma health check failed, reconnecting: {e}")
+                    await self._async_discard()
+                    self._async_service = await AsyncVectorStoreService.create(self.host, self.port)
+                self._async_last_checked = now
+            return self._async_service
+
+    def close(self):
+        """Closes the shared client."""
+        with self._lock:
+            self._discard()
+
+    async def aclose(self):
+        """Closes both the shared sync and async clients."""
+        self.close()
+        await self._async_discard()
+
+    async def _async_discard(self):
+        if self._async_service is not None:
+            try:
+                await self._async_service.aclose()
+            except Exception as e:
+                logger.warning(f"Error closing async Chroma client: {e}")
+            self._async_service = None
+
+    def _discard(self):
+        if self._service is not None:
+            try:
+                self._service.close()
+            except Exception as e:
+                logger.warning(f"Error closing Chroma client: {e}")
+            self._service = None
+
+
+_pool: Optional[VectorStorePool] = None
+_pool_lock = threading.Lock()
+
+
+def init_vector_store_pool() -> VectorStorePool:
+    """
+    Creates the process-wide pool. Called from the FastAPI lifespan and from
+    the Celery worker process init hook; safe to call more than once.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = VectorStorePool(host=settings.CHROMA_HOST, port=settings.CHROMA_PORT)
+        return _pool
+
+
+def get_vector_store_service() -> VectorStoreService:
+    """Returns the shared vector store service, creating the pool on first use."""
+    return (_pool or init_vector_store_pool()).get_service()
+
+
+async def get_async_vector_store_service() -> AsyncVectorStoreService:
+    """Returns the shared async vector store service, creating the pool on first use."""
+    return await (_pool or init_vector_store_pool()).get_async_service()
+
+
+def close_vector_store_pool():
+    """Closes the process-wide pool on shutdown."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+async def aclose_vector_store_pool():
+    """Closes the process-wide pool, including its async client, on shutdown."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        await pool.aclose()
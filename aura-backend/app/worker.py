@@ -1,13 +1,29 @@
+from celery.concurrency.prefork import TaskPool as PreforkPool
+from celery.signals import worker_process_init, worker_process_shutdown, worker_ready, worker_shutdown
 from celery.utils.log import get_task_logger
-from uuid import UUID
+from datetime import datetime, timedelta, timezone
+from uuid import UUID, uuid4
 from sqlmodel import Session
 
 from app.core.celery_app import celery_app
-from app.db.session import engine
+from app.db.session import engine, dispose_engine_after_fork
 from app.crud import crud_document
-from app.services.document_processing_service import process_document
+from app.services.document_processing_service import chunk_document
+from app.services.keyword_index import get_keyword_index
+from app.services.ingestion_service import (
+    ingest_chunks,
+    copy_document_chunks,
+    document_chunk_metadata,
+    IngestionError,
+)
+from app.services.answer_cache import get_answer_cache
+from app.services.embedding_service import embedding_service
 from app.services.graph_service import GraphService
-from app.services.vector_store_service import VectorStoreService
+from app.services.vector_store_service import (
+    init_vector_store_pool,
+    get_vector_store_service,
+    close_vector_store_pool,
+)
 from app.db.graph_db import GraphDB
 from app.core.config import settings
 from app.db.models_pg import DocumentStatus
@@ -16,13 +32,62 @@ from app.db.models_pg import DocumentStatus
 logger = get_task_logger(__name__)
 
 
-@celery_app.task
-def process_document_for_mvp(document_id_str: str):
+def warm_up_embedding_model():
+    if settings.EMBEDDING_WARMUP_ON_WORKER_START:
+        logger.info("Loading embedding model.")
+        embedding_service.warm_up()
+
+
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    # Each worker process gets its own client; connections must not be shared across a fork
+    dispose_engine_after_fork()
+    init_vector_store_pool()
+    warm_up_embedding_model()
+
+
+@worker_ready.connect
+def init_worker_main_process(sender, **kwargs):
+    # Solo and thread pools run tasks in the main process, which gets no worker_process_init;
+    # nothing was forked, so its database connections are its own and are kept
+    if not isinstance(sender.pool, PreforkPool):
+        init_vector_store_pool()
+        warm_up_embedding_model()
+
+
+@worker_process_shutdown.connect
+def shutdown_worker_process(**kwargs):
+    close_vector_store_pool()
+
+
+@worker_shutdown.connect
+def shutdown_worker_main_process(sender, **kwargs):
+    # The main process' counterpart of worker_process_shutdown, for solo and thread pools
+    if not isinstance(sender.pool, PreforkPool):
+        close_vector_store_pool()
+
+
+@celery_app.task(bind=True, max_retries=settings.INGEST_TASK_MAX_RETRIES)
+def process_document_for_mvp(self, document_id_str: str, start_batch: int = 0):
     """
     The main Celery task to process a document for the MVP.
+
+    If uploading a batch of chunks fails, the task is retried and resumes
+    from `start_batch`, the first batch that was not stored.
     """
     doc_id = UUID(document_id_str)
-    logger.info(f"Starting processing for document {doc_id}")
+    task_id = self.request.id or str(uuid4())
+    logger.info(f"Starting processing for document {doc_id} at batch {start_batch}")
+
+    def report_progress(completed_batches: int, completed_chunks: int):
+        logger.info(f"Document {doc_id}: stored {completed_chunks} chunks in {completed_batches} batches.")
+        if not self.request.is_eager:
+            self.update_state(
+                state="PROGRESS",
+                meta={"batches": completed_batches, "chunks": completed_chunks},
+            )
+
+    resume_from = None
 
     # Initialize services here, now that they don't connect on import
     graph_db = GraphDB(
@@ -31,49 +96,81 @@ def process_document_for_mvp(document_id_str: str):
         password=settings.NEO4J_PASSWORD,
     )
     graph_service = GraphService(graph_db)
-    vector_store_service = VectorStoreService(
-        host=settings.CHROMA_HOST, port=settings.CHROMA_PORT
-    )
+    vector_store_service = get_vector_store_service()
 
-    with Session(engine) as session:
+    # Documents are only read after their status updates, which return them, so
+    # expiring them on commit would cost a reload each time
+    with Session(engine, expire_on_commit=False) as session:
         try:
-            # 1. Get the document from the database
-            document = crud_document.get_document(session, document_id=doc_id)
+            # 1. Claim the document. A retried or redelivered task keeps its id and
+            # resumes its own claim; one abandoned by a dead task can be taken over.
+            document = crud_document.claim_document(
+                session, doc_id, task_id,
+                stale_before=datetime.now(timezone.utc) - timedelta(seconds=settings.INGEST_CLAIM_TIMEOUT),
+            )
             if not document:
-                logger.error(f"Document with ID {doc_id} not found.")
+                logger.error(f"Document with ID {doc_id} not found, or claimed by another task.")
                 return
 
-            crud_document.update_document_status(
-                session, document=document, status=DocumentStatus.PROCESSING
-            )
-
-            # 2. Parse the document to get text chunks
-            text_chunks = process_document(document.file_path)
+            # Answers cached for a previous version of the document are stale
+            answer_cache = get_answer_cache()
+            if answer_cache:
+                answer_cache.invalidate_document(doc_id)
 
-            # 3. Add text chunks to the vector store
-            chunk_ids = [f"{doc_id}_{i}" for i in range(len(text_chunks))]
-            vector_store_service.add_texts(
-                ids=chunk_ids,
-                documents=text_chunks,
-                metadatas=[{"document_id": str(doc_id)}] * len(text_chunks),
-            )
-            logger.info(f"Added {len(text_chunks)} chunks to vector store.")
+            duplicate = crud_document.get_processed_duplicate(session, document)
+            if duplicate is not None:
+                # The same file was processed before; reuse its chunks and embeddings
+                chunk_count = copy_document_chunks(
+                    vector_store_service, source=duplicate, target=document,
+                    keyword_index=get_keyword_index(),
+                )
+                logger.info(f"Reused {chunk_count} chunks of document {duplicate.id}.")
+            else:
+                # 2. Stream the document into chunks, embed them and 3. upload them
+                # to the vector store in batches, overlapping embedding with uploads.
+                # A re-uploaded document only stores the chunks that changed.
+                chunk_count = ingest_chunks(
+                    vector_store_service,
+                    document_id=doc_id,
+                    chunks=chunk_document(document.file_path),
+                    start_batch=start_batch,
+                    on_progress=report_progress,
+                    embed_fn=embedding_service.embed_batch,
+                    metadata=document_chunk_metadata(document),
+                    owner_id=document.owner_id,
+                    keyword_index=get_keyword_index(),
+                    incremental=True,
+                )
+                logger.info(f"Added {chunk_count} chunks to vector store.")
 
             # 4. Create a graph representation in Neo4j
             graph_service.create_document_graph(document=document)
             logger.info(f"Created graph representation for document {doc_id}.")
 
             # 5. Update the document status to COMPLETED
-            crud_document.update_document_status(
-                session, document=document, status=DocumentStatus.COMPLETED
-            )
-            logger.info(f"Successfully processed document {doc_id}.")
+            if crud_document.transition_document_status(
+                session, doc_id, DocumentStatus.COMPLETED,
+                from_statuses=[DocumentStatus.PROCESSING], claimed_by=task_id,
+            ):
+                logger.info(f"Successfully processed document {doc_id}.")
+            else:
+                logger.warning(f"Document {doc_id} changed status while it was processed.")
 
         except Exception as e:
-            logger.error(f"Error processing document {doc_id}: {e}", exc_info=True)
-            # Attempt to mark the document as FAILED
-            document = crud_document.get_document(session, document_id=doc_id)
-            if document:
-                crud_document.update_document_status(
-                    session, document=document, status=DocumentStatus.FAILED
-                ) 
\ No newline at end of file
+            if isinstance(e, IngestionError) and self.request.retries < self.max_retries:
+                logger.warning(f"Ingestion of document {doc_id} interrupted: {e}")
+                resume_from = e.completed_batches
+            else:
+                logger.error(f"Error processing document {doc_id}: {e}", exc_info=True)
+                # Attempt to mark the document as FAILED
+                session.rollback()
+                crud_document.transition_document_status(
+                    session, doc_id, DocumentStatus.FAILED,
+                    from_statuses=[DocumentStatus.PROCESSING], claimed_by=task_id,
+                )
+
+    if resume_from is not None:
+        raise self.retry(
+            kwargs={"document_id_str": document_id_str, "start_batch": resume_from},
+            countdown=settings.INGEST_RETRY_BACKOFF,
+        ) 
\ No newline at end of file
@@ -0,0 +1,97 @@
+"""
+Compares chunking strategies on chunk count, index size and retrieval quality.
+
+Usage:
+    python -m benchmarks.chunking docs/plan.md docs/report.txt
+    python -m benchmarks.chunking docs/*.md --questions questions.jsonl --k 5
+
+The questions file holds one JSON object per line with a "question" and an
+"answer": a short string that a chunk must contain to count as relevant.
+Retrieval quality is measured with the configured embedding model and exact
+cosine search, so it reflects chunking alone and not the ANN index.
+"""
+
+import argparse
+import json
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from app.services.chunkers import CharacterChunker, StructuredChunker, estimate_tokens
+from app.services.document_processing_service import chunk_document
+
+
+CHUNKERS = {
+    "character": lambda: CharacterChunker(1000, 200),
+    "paragraph": lambda: StructuredChunker(boundary="paragraph"),
+    "sentence": lambda: StructuredChunker(boundary="sentence"),
+    "markdown": lambda: StructuredChunker(markdown=True),
+}
+
+
+def run_chunker(name: str, files: List[str]) -> Dict:
+    started = time.perf_counter()
+    chunks = [c.text for path in files for c in chunk_document(path, CHUNKERS[name]())]
+    elapsed = time.perf_counter() - started
+    tokens = [estimate_tokens(text) for text in chunks]
+    return {
+        "chunker": name,
+        "chunks": len(chunks),
+        "mean_tokens": float(np.mean(tokens)) if tokens else 0.0,
+        "max_tokens": max(tokens, default=0),
+        "stored_chars": sum(len(text) for text in chunks),
+        "chunk_seconds": elapsed,
+        "texts": chunks,
+    }
+
+
+def evaluate_retrieval(texts: List[str], questions: List[Dict], k: int) -> Dict:
+    from app.services.embedding_service import EmbeddingService
+
+    service = EmbeddingService(normalize=True)
+    chunk_embeddings = service.embed_batch(texts)
+    question_embeddings = service.embed_batch([q["question"] for q in questions])
+    scores = question_embeddings @ chunk_embeddings.T
+
+    hits, reciprocal_ranks = 0, []
+    for question, row in zip(questions, scores):
+        top = np.argsort(-row)[:k]
+        answer = question["answer"].lower()
+        ranks = [rank for rank, i in enumerate(top, 1) if answer in texts[i].lower()]
+        hits += bool(ranks)
+        reciprocal_ranks.append(1.0 / ranks[0] if ranks else 0.0)
+    return {f"recall@{k}": hits / len(questions), "mrr": float(np.mean(reciprocal_ranks))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--questions", help="JSONL file of questions and expected answer strings")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--chunkers", nargs="+", default=list(CHUNKERS), choices=list(CHUNKERS))
+    args = parser.parse_args()
+
+    questions = []
+    if args.questions:
+        with open(args.questions) as f:
+            questions = [json.loads(line) for line in f if line.strip()]
+
+    baseline = None
+    for name in args.chunkers:
+        result = run_chunker(name, args.files)
+        baseline = baseline or result
+        line = (
+            f"{name:<10} chunks={result['chunks']:>6} "
+            f"({result['chunks'] / max(baseline['chunks'], 1):.0%} of {baseline['chunker']}) "
+            f"mean_tokens={result['mean_tokens']:.0f} max_tokens={result['max_tokens']} "
+            f"stored_chars={result['stored_chars']} chunking={result['chunk_seconds'] * 1000:.0f}ms"
+        )
+        if questions:
+            quality = evaluate_retrieval(result["texts"], questions, args.k)
+            line += " " + " ".join(f"{key}={value:.3f}" for key, value in quality.items())
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Measures login throughput and how much a login storm slows down the rest of the API.
+
+Usage:
+    uvicorn app.main:app --workers 1 &
+    python -m benchmarks.login --url http://localhost:8000 --concurrency 32 --duration 20
+
+A benchmark user is registered (or reused), then a probe request to an
+authenticated endpoint runs alone for `--duration` seconds to measure its
+baseline latency, and again while `--concurrency` clients log in as fast as
+they can. With hashing on the event loop, the probe's p99 during the storm
+grows with the number of logins queued ahead of it; with hashing on the
+pool, it should stay near the baseline.
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Dict, List
+
+import httpx
+import numpy as np
+
+
+def percentiles(latencies: List[float]) -> Dict[str, float]:
+    if not latencies:
+        return {"p50": 0.0, "p99": 0.0}
+    p50, p99 = np.percentile(latencies, [50, 99])
+    return {"p50": float(p50) * 1000, "p99": float(p99) * 1000}
+
+
+async def probe(client: httpx.AsyncClient, path: str, token: str, deadline: float, latencies: List[float]):
+    headers = {"Authorization": f"Bearer {token}"}
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        response = await client.get(path, headers=headers)
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(0.01)
+
+
+async def log_in(client: httpx.AsyncClient, api: str, credentials: Dict[str, str]) -> str:
+    response = await client.post(f"{api}/login/access-token", data=credentials)
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def login_storm(client: httpx.AsyncClient, api: str, credentials: Dict[str, str], deadline: float) -> int:
+    logins = 0
+    while time.perf_counter() < deadline:
+        await log_in(client, api, credentials)
+        logins += 1
+    return logins
+
+
+async def run(args):
+    api = f"{args.url.rstrip('/')}/api/v1"
+    credentials = {"username": args.email, "password": args.password}
+    limits = httpx.Limits(max_connections=args.concurrency + 4)
+    async with httpx.AsyncClient(timeout=60, limits=limits) as client:
+        # 400: already registered by an earlier run
+        response = await client.post(f"{api}/register", json={"email": args.email, "password": args.password})
+        if response.status_code not in (201, 400):
+            response.raise_for_status()
+        token = await log_in(client, api, credentials)
+        probe_path = f"{api}{args.probe}"
+
+        baseline: List[float] = []
+        await probe(client, probe_path, token, time.perf_counter() + args.duration, baseline)
+
+        storm: List[float] = []
+        started = time.perf_counter()
+        deadline = started + args.duration
+        results = await asyncio.gather(
+            probe(client, probe_path, token, deadline, storm),
+            *(login_storm(client, api, credentials, deadline) for _ in range(args.concurrency)),
+        )
+        elapsed = time.perf_counter() - started
+
+    logins = sum(results[1:])
+    quiet, loaded = percentiles(baseline), percentiles(storm)
+    print(f"logins={logins} login_rps={logins / elapsed:.1f} concurrency={args.concurrency}")
+    print(f"probe {args.probe} baseline: p50={quiet['p50']:.1f}ms p99={quiet['p99']:.1f}ms n={len(baseline)}")
+    print(
+        f"probe {args.probe} during storm: p50={loaded['p50']:.1f}ms p99={loaded['p99']:.1f}ms n={len(storm)} "
+        f"(p99 x{loaded['p99'] / max(quiet['p99'], 1e-9):.1f})"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--email", default="login-benchmark@example.com")
+    parser.add_argument("--password", default="login-benchmark-password")
+    parser.add_argument("--probe", default="/users/me", help="Authenticated endpoint whose latency is measured")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per phase")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""Add document batch id
+
+Revision ID: 8d2c6a1e5f47
+Revises: 3b9e4f2a7c1d
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d2c6a1e5f47'
+down_revision: Union[str, None] = '3b9e4f2a7c1d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('document', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('batch_id', sa.Uuid(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_document_batch_id'), ['batch_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('document', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_document_batch_id'))
+        batch_op.drop_column('batch_id')
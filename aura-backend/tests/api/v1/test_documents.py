@@ -0,0 +1,357 @@
+"""
+API tests for document query endpoints.
+"""
+
+import hashlib
+import io
+import os
+import pytest
+import zipfile
+from uuid import UUID, uuid4
+from unittest.mock import AsyncMock, Mock, patch
+
+# Ensure testing environment is set before any app imports
+os.environ["TESTING"] = "true"
+
+from fastapi.testclient import TestClient
+
+from fastapi import HTTPException
+
+from app.api.v1 import documents as documents_api
+from app.main import app
+from app.services import file_storage
+from app.api import deps
+from app.db.models_pg import Document, User
+
+
+@pytest.fixture(name="user")
+def user_fixture():
+    return User(id=uuid4(), email="test@example.com", hashed_password="x")
+
+
+@pytest.fixture(name="client")
+def client_fixture(user):
+    app.dependency_overrides[deps.get_async_db] = lambda: AsyncMock()
+    app.dependency_overrides[deps.get_current_active_user] = lambda: user
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+def make_document(owner_id, status="COMPLETED"):
+    return Document(id=uuid4(), file_name="plan.txt", file_path="/tmp/plan.txt",
+                    status=status, owner_id=owner_id)
+
+
+class TestQueryStream:
+    """Tests for the streaming query endpoint."""
+
+    def test_streams_server_sent_events(self, client, user):
+        """Chunks and tokens are sent as SSE events in order."""
+        document = make_document(user.id)
+
+        async def fake_stream(self, question, document_id, owner_id):
+            assert owner_id == user.id
+            yield {"event": "chunks", "data": [{"text": "ctx", "metadata": {}, "distance": 0.1}]}
+            yield {"event": "token", "data": "Hi"}
+            yield {"event": "done", "data": {"answer": "Hi"}}
+
+        with patch("app.crud.crud_document.aget_document", return_value=document), \
+                patch("app.services.rag_service.RAGService.astream_answer", fake_stream):
+            response = client.post(
+                f"/api/v1/documents/{document.id}/query/stream", json={"question": "Hello?"}
+            )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        assert response.text == (
+            'event: chunks\ndata: [{"text": "ctx", "metadata": {}, "distance": 0.1}]\n\n'
+            'event: token\ndata: "Hi"\n\n'
+            'event: done\ndata: {"answer": "Hi"}\n\n'
+        )
+
+    def test_rejects_unprocessed_document(self, client, user):
+        """Ownership and status checks run before streaming starts."""
+        document = make_document(user.id, status="PROCESSING")
+
+        with patch("app.crud.crud_document.aget_document", return_value=document):
+            response = client.post(
+                f"/api/v1/documents/{document.id}/query/stream", json={"question": "Hello?"}
+            )
+
+        assert response.status_code == 400
+
+
+class TestQueryDocument:
+    """Tests for the single-document query endpoint."""
+
+    def test_answers_from_rag_service(self, client, user):
+        document = make_document(user.id)
+        answer = Mock(answer="The plan.", chunks_used=[], context_tokens=3)
+
+        with patch("app.crud.crud_document.aget_document", return_value=document), \
+                patch("app.services.rag_service.RAGService.agenerate_answer", return_value=answer) as mock_answer:
+            response = client.post(f"/api/v1/documents/{document.id}/query", json={"question": "What is it?"})
+
+        assert response.status_code == 200
+        assert response.json() == {"answer": "The plan.", "chunks_used": [], "context_tokens": 3}
+        assert mock_answer.call_args[1]["document_id"] == document.id
+
+
+class TestQueryLibrary:
+    """Tests for the whole-library query endpoint."""
+
+    def test_scopes_query_to_current_user(self, client, user):
+        """The search is restricted to the user's documents plus the requested filters."""
+        document_id = uuid4()
+        answer = Mock(answer="Both.", chunks_used=[], context_tokens=0)
+
+        with patch("app.services.rag_service.RAGService.agenerate_library_answer",
+                   return_value=answer) as mock_answer:
+            response = client.post("/api/v1/documents/query", json={
+                "question": "What do we fund?",
+                "document_ids": [str(document_id)],
+                "document_types": ["PDF"],
+            })
+
+        assert response.status_code == 200
+        assert response.json() == {"answer": "Both.", "chunks_used": [], "context_tokens": 0}
+        scope = mock_answer.call_args[1]["scope"]
+        assert scope.owner_id == user.id
+        assert scope.document_ids == [document_id]
+        assert scope.document_types == ["PDF"]
+
+
+class TestUploadDocument:
+    """Tests for content-addressed uploads."""
+
+    def test_same_name_different_content(self, client, tmp_path, monkeypatch):
+        """Two uploads named alike are stored side by side, keyed by their hashes."""
+        monkeypatch.setattr("app.core.config.settings.UPLOADS_DIR", str(tmp_path))
+
+        with patch("app.crud.crud_document.acreate_document",
+                   side_effect=lambda session, document_in, owner_id: Document(
+                       **document_in.model_dump(), owner_id=owner_id)) as mock_create, \
+                patch("app.core.celery_app.celery_app.send_task"):
+            for content in (b"First report.", b"Second report."):
+                response = client.post(
+                    "/api/v1/documents/upload", files={"file": ("report.pdf", content, "application/pdf")}
+                )
+                assert response.status_code == 201
+
+        first, second = (c[1]["document_in"] for c in mock_create.call_args_list)
+        assert first.file_name == second.file_name == "report.pdf"
+        assert first.content_hash == hashlib.sha256(b"First report.").hexdigest()
+        assert first.file_path != second.file_path
+        assert open(first.file_path, "rb").read() == b"First report."
+
+
+    def test_rejects_oversized_upload(self, client, tmp_path, monkeypatch):
+        monkeypatch.setattr("app.core.config.settings.UPLOADS_DIR", str(tmp_path))
+        monkeypatch.setattr("app.core.config.settings.MAX_UPLOAD_SIZE", 10)
+
+        with patch("app.crud.crud_document.acreate_document") as mock_create:
+            response = client.post(
+                "/api/v1/documents/upload", files={"file": ("big.txt", b"x" * 11, "text/plain")}
+            )
+
+        assert response.status_code == 413
+        mock_create.assert_not_called()
+        assert [p for p in tmp_path.rglob("*") if p.is_file()] == []
+
+    def test_rejects_declared_oversized_body_before_reading(self, client):
+        response = client.post(
+            "/api/v1/documents/upload",
+            headers={"Content-Length": str(100 * 1024 * 1024 * 1024)},
+            content=b"",
+        )
+
+        assert response.status_code == 413
+
+
+class TestBulkUpload:
+    """Tests for uploading a folder of documents."""
+
+    def test_creates_batch_and_dispatches_group(self, client, user, tmp_path, monkeypatch):
+        monkeypatch.setattr("app.core.config.settings.UPLOADS_DIR", str(tmp_path))
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, "w") as zf:
+            zf.writestr("folder/plan.md", b"# Plan")
+            zf.writestr("folder/budget.txt", b"Budget")
+
+        def create_documents(session, documents_in, owner_id, batch_id):
+            return [Document(**d.model_dump(), owner_id=owner_id, batch_id=batch_id) for d in documents_in]
+
+        with patch("app.crud.crud_document.acreate_documents", side_effect=create_documents) as mock_create, \
+                patch("app.api.v1.documents.group") as mock_group:
+            response = client.post("/api/v1/documents/upload/bulk", files=[
+                ("files", ("report.txt", b"Report", "text/plain")),
+                ("files", ("empty.txt", b"", "text/plain")),
+                ("files", ("folder.zip", archive.getvalue(), "application/zip")),
+            ])
+
+        assert response.status_code == 201
+        body = response.json()
+        assert [d["file_name"] for d in body["documents"]] == ["report.txt", "folder/plan.md", "folder/budget.txt"]
+        assert body["skipped"] == ["empty.txt"]
+        mock_create.assert_called_once()
+        assert mock_create.call_args[1]["batch_id"] == UUID(body["batch_id"])
+        assert len(list(mock_group.call_args[0][0])) == 3
+        mock_group.return_value.apply_async.assert_called_once()
+
+    def test_failed_dispatch_fails_documents(self, client, tmp_path, monkeypatch):
+        monkeypatch.setattr("app.core.config.settings.UPLOADS_DIR", str(tmp_path))
+
+        def create_documents(session, documents_in, owner_id, batch_id):
+            return [Document(**d.model_dump(), owner_id=owner_id, batch_id=batch_id) for d in documents_in]
+
+        with patch("app.crud.crud_document.acreate_documents", side_effect=create_documents), \
+                patch("app.crud.crud_document.atransition_documents_status") as mock_transition, \
+                patch("app.api.v1.documents.group") as mock_group:
+            mock_group.return_value.apply_async.side_effect = ConnectionError("broker down")
+            response = client.post("/api/v1/documents/upload/bulk", files=[
+                ("files", ("report.txt", b"Report", "text/plain")),
+            ])
+
+        assert response.status_code == 503
+        args, kwargs = mock_transition.call_args
+        assert len(args[1]) == 1
+        assert (args[2], kwargs["from_statuses"]) == ("FAILED", ["PENDING"])
+
+    def test_failed_upload_removes_its_files(self, client, tmp_path, monkeypatch):
+        monkeypatch.setattr("app.core.config.settings.UPLOADS_DIR", str(tmp_path))
+        monkeypatch.setattr("app.core.config.settings.MAX_BULK_UPLOAD_FILES", 2)
+        kept = file_storage.content_path(hashlib.sha256(b"Kept").hexdigest(), ".txt", str(tmp_path))
+
+        # One stored file already belongs to another document, which must keep it
+        with patch("app.crud.crud_document.aget_referenced_file_paths", return_value={str(kept)}), \
+                patch("app.crud.crud_document.acreate_documents") as mock_create:
+            response = client.post("/api/v1/documents/upload/bulk", files=[
+                ("files", ("kept.txt", b"Kept", "text/plain")),
+                ("files", ("report.txt", b"Report", "text/plain")),
+                ("files", ("extra.txt", b"Extra", "text/plain")),
+            ])
+
+        assert response.status_code == 413
+        mock_create.assert_not_called()
+        assert [p for p in tmp_path.rglob("*") if p.is_file()] == [kept]
+
+    def test_rejects_file_without_name(self):
+        with pytest.raises(HTTPException) as exc_info:
+            documents_api._file_name(Mock(filename=None))
+        assert exc_info.value.status_code == 400
+
+    def test_batch_status(self, client):
+        batch_id = uuid4()
+
+        with patch("app.crud.crud_document.aget_batch_status_counts",
+                   return_value={"COMPLETED": 2, "PROCESSING": 1}):
+            response = client.get(f"/api/v1/documents/batches/{batch_id}")
+
+        assert response.json() == {
+            "batch_id": str(batch_id), "total": 3, "counts": {"COMPLETED": 2, "PROCESSING": 1}, "done": False,
+        }
+
+    def test_unknown_batch(self, client):
+        with patch("app.crud.crud_document.aget_batch_status_counts", return_value={}):
+            response = client.get(f"/api/v1/documents/batches/{uuid4()}")
+
+        assert response.status_code == 404
+
+
+class TestResumableUpload:
+    """Tests for uploading a file in pieces."""
+
+    def test_upload_in_pieces(self, client, tmp_path, monkeypatch):
+        monkeypatch.setattr("app.core.config.settings.UPLOADS_DIR", str(tmp_path))
+        data = b"A long strategic plan."
+
+        response = client.post("/api/v1/documents/uploads", json={"file_name": "plan.txt", "size": len(data)})
+        assert response.status_code == 201
+        upload_id = response.json()["id"]
+
+        assert client.put(f"/api/v1/documents/uploads/{upload_id}?offset=0", content=data[:10]).status_code == 200
+        # A piece sent again after a dropped connection is refused
+        assert client.put(f"/api/v1/documents/uploads/{upload_id}?offset=0", content=data[:10]).status_code == 409
+        assert client.get(f"/api/v1/documents/uploads/{upload_id}").json()["offset"] == 10
+        # Completing early is refused too
+        assert client.post(f"/api/v1/documents/uploads/{upload_id}/complete").status_code == 409
+        assert client.put(f"/api/v1/documents/uploads/{upload_id}?offset=10", content=data[10:]).json()["offset"] \
+            == len(data)
+
+        with patch("app.crud.crud_document.acreate_document",
+                   side_effect=lambda session, document_in, owner_id: Document(
+                       **document_in.model_dump(), owner_id=owner_id)) as mock_create, \
+                patch("app.core.celery_app.celery_app.send_task") as mock_send:
+            response = client.post(f"/api/v1/documents/uploads/{upload_id}/complete")
+
+        assert response.status_code == 201
+        document_in = mock_create.call_args[1]["document_in"]
+        assert document_in.content_hash == hashlib.sha256(data).hexdigest()
+        assert open(document_in.file_path, "rb").read() == data
+        mock_send.assert_called_once()
+        assert client.get(f"/api/v1/documents/uploads/{upload_id}").status_code == 404
+
+    def test_piece_past_declared_size(self, client, tmp_path, monkeypatch):
+        monkeypatch.setattr("app.core.config.settings.UPLOADS_DIR", str(tmp_path))
+        upload_id = client.post("/api/v1/documents/uploads", json={"file_name": "a.txt", "size": 4}).json()["id"]
+
+        response = client.put(f"/api/v1/documents/uploads/{upload_id}?offset=0", content=b"12345")
+
+        assert response.status_code == 413
+
+    def test_session_too_large(self, client, monkeypatch):
+        monkeypatch.setattr("app.core.config.settings.MAX_UPLOAD_SIZE", 10)
+
+        response = client.post("/api/v1/documents/uploads", json={"file_name": "a.txt", "size": 11})
+
+        assert response.status_code == 413
+
+
+class TestReplaceDocumentFile:
+    """Tests for uploading a new version of a document."""
+
+    def test_requeues_same_document(self, client, user, tmp_path, monkeypatch):
+        monkeypatch.setattr("app.core.config.settings.UPLOADS_DIR", str(tmp_path))
+        document = make_document(user.id)
+
+        with patch("app.crud.crud_document.aget_document", return_value=document), \
+                patch("app.crud.crud_document.areplace_document_file",
+                      side_effect=lambda db, document, **kwargs: document) as mock_replace, \
+                patch("app.core.celery_app.celery_app.send_task") as mock_send:
+            response = client.put(
+                f"/api/v1/documents/{document.id}/file",
+                files={"file": ("plan-v2.txt", b"Edited plan.", "text/plain")},
+            )
+
+        assert response.status_code == 200
+        content_hash = hashlib.sha256(b"Edited plan.").hexdigest()
+        assert mock_replace.call_args[1]["content_hash"] == content_hash
+        assert open(mock_replace.call_args[1]["file_path"], "rb").read() == b"Edited plan."
+        mock_send.assert_called_once_with("app.worker.process_document_for_mvp", args=[str(document.id)])
+
+    def test_unchanged_file_is_not_reprocessed(self, client, user, tmp_path, monkeypatch):
+        monkeypatch.setattr("app.core.config.settings.UPLOADS_DIR", str(tmp_path))
+        content_hash = hashlib.sha256(b"Same plan.").hexdigest()
+        document = make_document(user.id)
+        document.file_path = str(tmp_path / content_hash[:2] / f"{content_hash}.txt")
+
+        with patch("app.crud.crud_document.aget_document", return_value=document), \
+                patch("app.core.celery_app.celery_app.send_task") as mock_send:
+            response = client.put(
+                f"/api/v1/documents/{document.id}/file",
+                files={"file": ("plan.txt", b"Same plan.", "text/plain")},
+            )
+
+        assert response.status_code == 200
+        mock_send.assert_not_called()
+
+    def test_rejects_document_being_processed(self, client, user):
+        document = make_document(user.id, status="PROCESSING")
+
+        with patch("app.crud.crud_document.aget_document", return_value=document):
+            response = client.put(
+                f"/api/v1/documents/{document.id}/file",
+                files={"file": ("plan.txt", b"x", "text/plain")},
+            )
+
+        assert response.status_code == 409
@@ -0,0 +1,182 @@
+"""
+Unit tests for the RAG answer cache.
+"""
+
+import os
+import time
+import numpy as np
+from uuid import uuid4
+from unittest.mock import Mock, patch
+
+# Ensure testing environment is set before any app imports
+os.environ["TESTING"] = "true"
+
+from app.services.answer_cache import AnswerCache, MemoryAnswerStore, RedisAnswerStore
+from app.services.rag_service import RAGService
+
+SETTINGS = {"model": "gpt-3.5-turbo", "n_results": 5}
+RESPONSE = {"answer": "Clean water.", "chunks_used": []}
+
+
+def make_cache(**kwargs):
+    return AnswerCache(MemoryAnswerStore(max_entries=kwargs.pop("max_entries", 10), ttl=60), **kwargs)
+
+
+class TestAnswerCache:
+    """Test suite for exact and near-duplicate answer caching."""
+
+    def test_exact_repeat_is_normalized(self):
+        """Case, whitespace and trailing punctuation do not affect the key."""
+        cache = make_cache()
+        document_id = uuid4()
+        cache.set(document_id, "What is our mission?", SETTINGS, RESPONSE)
+
+        assert cache.get(document_id, "  what is our   MISSION", SETTINGS) == RESPONSE
+        assert cache.get(uuid4(), "What is our mission?", SETTINGS) is None
+        assert cache.get(document_id, "What is our mission?", {**SETTINGS, "model": "gpt-4"}) is None
+
+    def test_invalidate_document(self):
+        """Reprocessing a document drops its cached answers only."""
+        cache = make_cache()
+        stale, other = uuid4(), uuid4()
+        cache.set(stale, "Budget?", SETTINGS, RESPONSE)
+        cache.set(other, "Budget?", SETTINGS, RESPONSE)
+
+        cache.invalidate_document(stale)
+
+        assert cache.get(stale, "Budget?", SETTINGS) is None
+        assert cache.get(other, "Budget?", SETTINGS) == RESPONSE
+
+    def test_lru_eviction(self):
+        """The least recently used entry is evicted first."""
+        cache = make_cache(max_entries=2)
+        document_id = uuid4()
+        for question in ["a", "b"]:
+            cache.set(document_id, question, SETTINGS, RESPONSE)
+        cache.get(document_id, "a", SETTINGS)
+        cache.set(document_id, "c", SETTINGS, RESPONSE)
+
+        assert cache.get(document_id, "a", SETTINGS) == RESPONSE
+        assert cache.get(document_id, "b", SETTINGS) is None
+
+    def test_ttl_expiry(self):
+        """Entries expire after the TTL."""
+        cache = AnswerCache(MemoryAnswerStore(max_entries=10, ttl=-1))
+        document_id = uuid4()
+        cache.set(document_id, "Budget?", SETTINGS, RESPONSE)
+
+        assert cache.get(document_id, "Budget?", SETTINGS) is None
+
+    def test_near_duplicate_questions(self):
+        """Questions above the similarity threshold share an answer."""
+        vectors = {
+            "what is our mission": [1.0, 0.0, 0.0],
+            "what's our mission": [0.98, 0.2, 0.0],
+            "what is the budget": [0.0, 1.0, 0.0],
+        }
+        cache = make_cache(similarity_threshold=0.95, embed_fn=lambda q: np.array(vectors[q]))
+        document_id = uuid4()
+        cache.set(document_id, "What is our mission?", SETTINGS, RESPONSE)
+
+        assert cache.get(document_id, "What's our mission?", SETTINGS) == RESPONSE
+        assert cache.get(document_id, "What is the budget?", SETTINGS) is None
+
+    def test_store_errors_are_misses(self):
+        """A failing store never fails the query."""
+        store = Mock()
+        store.get.side_effect = ConnectionError("redis down")
+        store.generation.return_value = 0
+
+        assert AnswerCache(store).get(uuid4(), "Budget?", SETTINGS) is None
+
+
+class FakeRedis:
+    """The hash and sorted set commands RedisAnswerStore uses for question vectors."""
+
+    def __init__(self):
+        self.data = {}
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+    def hset(self, name, key, value):
+        self.data.setdefault(name, {})[key.encode("utf-8")] = value
+
+    def hgetall(self, name):
+        return dict(self.data.get(name, {}))
+
+    def hdel(self, name, *keys):
+        for key in keys:
+            self.data.get(name, {}).pop(key, None)
+
+    def zadd(self, name, mapping):
+        self.data.setdefault(name, {}).update({k.encode("utf-8"): v for k, v in mapping.items()})
+
+    def zrangebyscore(self, name, low, high):
+        return [k for k, v in sorted(self.data.get(name, {}).items(), key=lambda kv: kv[1]) if v <= high]
+
+    def zrange(self, name, start, end):
+        members = [k for k, _ in sorted(self.data.get(name, {}).items(), key=lambda kv: kv[1])]
+        return members[start:len(members) + end + 1]
+
+    def zrem(self, name, *keys):
+        self.hdel(name, *keys)
+
+    def expire(self, name, ttl):
+        pass
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    def __getattr__(self, command):
+        return lambda *args: self.calls.append((command, args))
+
+    def execute(self):
+        return [getattr(self.client, command)(*args) for command, args in self.calls]
+
+
+class TestRedisAnswerStore:
+    """Test suite for the expiry and size bound of question vectors in Redis."""
+
+    def test_vectors_expire_per_entry(self):
+        """A vector past its TTL is dropped even when the scope has newer ones."""
+        store = RedisAnswerStore(FakeRedis(), ttl=60, max_entries=10)
+        store.add_vector("scope", "old", np.ones(3))
+        with patch("app.services.answer_cache.time.time", return_value=time.time() + 30):
+            store.add_vector("scope", "new", np.ones(3))
+        with patch("app.services.answer_cache.time.time", return_value=time.time() + 70):
+            assert list(store.get_vectors("scope")) == ["new"]
+
+    def test_vectors_are_capped(self):
+        """Only the `max_entries` most recent vectors of a scope are kept."""
+        client = FakeRedis()
+        store = RedisAnswerStore(client, ttl=60, max_entries=2)
+        for offset, key in enumerate(["a", "b", "c"]):
+            with patch("app.services.answer_cache.time.time", return_value=time.time() + offset):
+                store.add_vector("scope", key, np.ones(3))
+
+        assert sorted(store.get_vectors("scope")) == ["b", "c"]
+        assert len(client.data["aura:answers:vector-expiry:scope"]) == 2
+
+
+class TestRAGServiceCaching:
+    """The RAG service consults the cache before retrieval."""
+
+    @patch('app.services.rag_service.query_vector_store')
+    @patch('app.services.rag_service.litellm.completion')
+    def test_repeat_question_skips_llm(self, mock_completion, mock_query):
+        mock_query.return_value = [{'text': 'ctx', 'metadata': {}, 'distance': 0.1}]
+        mock_completion.return_value.choices = [Mock()]
+        mock_completion.return_value.choices[0].message.content = "Answer"
+        service = RAGService(answer_cache=make_cache())
+        document_id = uuid4()
+
+        first = service.generate_answer("Budget?", document_id)
+        second = service.generate_answer("budget", document_id)
+
+        assert first == second
+        mock_query.assert_called_once()
+        mock_completion.assert_called_once()
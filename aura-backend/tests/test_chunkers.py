@@ -0,0 +1,120 @@
+"""
+Unit tests for the pluggable chunking strategies.
+"""
+
+import os
+import pytest
+
+# Ensure testing environment is set before any app imports
+os.environ["TESTING"] = "true"
+
+from app.services.chunkers import CharacterChunker, StructuredChunker, estimate_tokens, get_chunker
+from app.services.document_processing_service import chunk_document, chunk_text
+from app.services.ingestion_service import ingest_chunks
+from unittest.mock import Mock
+from uuid import uuid4
+
+
+MARKDOWN = """# Strategic Plan
+
+Our mission is clean water. We serve rural schools.
+
+## Budget
+The total request is $50,000. It covers two years.
+
+Staff costs are the largest line.
+
+# Appendix
+
+EIN 12-3456789.
+"""
+
+
+def blocks(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def word_count(text):
+    return len(text.split())
+
+
+class TestCharacterChunker:
+    """The fixed-window chunker reproduces `chunk_text` with offsets."""
+
+    def test_matches_chunk_text(self):
+        text = "abcdefghij" * 37
+        chunks = list(CharacterChunker(100, 20).chunk(blocks(text, 33)))
+
+        assert [c.text for c in chunks] == chunk_text(text, 100, 20)
+        assert all(text[c.start:c.end] == c.text for c in chunks)
+
+
+class TestStructuredChunker:
+    """Test suite for boundary-respecting chunkers."""
+
+    @pytest.mark.parametrize("read_size", [5, 64, 10_000])
+    def test_paragraphs_are_kept_whole(self, read_size):
+        chunker = StructuredChunker(max_tokens=12, boundary="paragraph", length_fn=word_count)
+
+        chunks = list(chunker.chunk(blocks(MARKDOWN, read_size)))
+
+        assert [c.text for c in chunks] == [
+            "# Strategic Plan\n\nOur mission is clean water. We serve rural schools.",
+            "## Budget\nThe total request is $50,000. It covers two years.",
+            "Staff costs are the largest line.\n\n# Appendix\n\nEIN 12-3456789.",
+        ]
+        assert all(MARKDOWN[c.start:c.end] == c.text for c in chunks)
+
+    def test_markdown_sections(self):
+        """Headings start chunks, stay with their text and are recorded as the section."""
+        chunker = StructuredChunker(max_tokens=30, markdown=True, length_fn=word_count)
+
+        chunks = list(chunker.chunk([MARKDOWN]))
+
+        assert [c.text.split("\n")[0] for c in chunks] == ["# Strategic Plan", "## Budget", "# Appendix"]
+        assert [c.metadata["section"] for c in chunks] == [
+            "Strategic Plan", "Strategic Plan > Budget", "Appendix",
+        ]
+        assert chunks[1].text.endswith("Staff costs are the largest line.")
+
+    def test_long_paragraph_splits_at_sentences(self):
+        text = "One two three. Four five six. Seven eight nine."
+        chunker = StructuredChunker(max_tokens=6, length_fn=word_count)
+
+        chunks = list(chunker.chunk([text]))
+
+        assert [c.text for c in chunks] == ["One two three. Four five six.", "Seven eight nine."]
+        assert all(text[c.start:c.end] == c.text for c in chunks)
+
+    def test_long_sentence_splits_at_words(self):
+        chunker = StructuredChunker(max_tokens=3, length_fn=word_count)
+
+        chunks = list(chunker.chunk(["a b c d e f g"]))
+
+        assert [c.text for c in chunks] == ["a b c", "d e f", "g"]
+
+    def test_estimate_tokens(self):
+        assert estimate_tokens("") == 0
+        assert estimate_tokens("The EIN is 12-3456789.") > len("The EIN is 12-3456789.".split())
+
+    def test_auto_chunker_follows_file_type(self):
+        assert get_chunker("auto", "plan.md").name == "markdown"
+        assert get_chunker("auto", "plan.txt").name == "paragraph"
+        with pytest.raises(ValueError):
+            get_chunker("nope")
+
+
+class TestChunkOffsets:
+    """Offsets and sections are stored as chunk metadata at ingestion."""
+
+    def test_offsets_in_metadata(self, tmp_path):
+        path = tmp_path / "plan.md"
+        path.write_text(MARKDOWN, encoding="utf-8")
+        store = Mock()
+
+        ingest_chunks(store, uuid4(), chunk_document(str(path), StructuredChunker(markdown=True)))
+
+        metadata = store.upsert_texts.call_args[1]["metadatas"][0]
+        assert metadata["start_offset"] == 0
+        assert metadata["section"] == "Strategic Plan"
+        assert metadata["end_offset"] > metadata["start_offset"]
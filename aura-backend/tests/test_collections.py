@@ -0,0 +1,94 @@
+"""
+Unit tests for per-owner vector store collections.
+"""
+
+import os
+from uuid import uuid4
+from unittest.mock import Mock
+
+# Ensure testing environment is set before any app imports
+os.environ["TESTING"] = "true"
+
+from app.db.models_pg import Document
+from app.services.collection_migration import migrate_legacy_collection
+from app.services.vector_store_service import CollectionManager, VectorStoreService
+
+
+class TestCollectionManager:
+    """Test suite for sharding chunks by owner."""
+
+    def test_one_collection_per_owner(self):
+        """Owners get separate collections whose handles are reused."""
+        client = Mock()
+        client.get_or_create_collection.side_effect = lambda name: Mock(name=name)
+        manager = CollectionManager(client)
+        alice, bob = uuid4(), uuid4()
+
+        assert manager.get(alice) is manager.get(alice)
+        assert manager.get(alice) is not manager.get(bob)
+        assert manager.get(None) is manager.get(None)
+        assert [c.args[0] for c in client.get_or_create_collection.call_args_list] == [
+            f"aura_owner_{alice.hex}", f"aura_owner_{bob.hex}", "aura_shared",
+        ]
+
+    def test_evicts_least_recently_used_handle(self):
+        client = Mock()
+        manager = CollectionManager(client, max_cached=1)
+        alice, bob = uuid4(), uuid4()
+
+        manager.get(alice)
+        manager.get(bob)
+        manager.get(alice)
+
+        assert client.get_or_create_collection.call_count == 3
+
+    def test_document_query_searches_owner_collection(self):
+        client = Mock()
+        client.get_or_create_collection.return_value.query.return_value = {
+            "documents": [[]], "metadatas": [[]], "distances": [[]],
+        }
+        owner_id, document_id = uuid4(), uuid4()
+
+        VectorStoreService("localhost", 8000, client=client).query_chunks(
+            owner_id, "grants", document_id
+        )
+
+        client.get_or_create_collection.assert_called_once_with(f"aura_owner_{owner_id.hex}")
+        kwargs = client.get_or_create_collection.return_value.query.call_args[1]
+        assert kwargs["where"] == {"document_id": str(document_id)}
+
+
+class TestLegacyMigration:
+    """Test suite for moving chunks out of the shared legacy collection."""
+
+    def test_moves_chunks_to_owner_collections(self):
+        owner_id = uuid4()
+        document = Document(id=uuid4(), file_name="plan.txt", file_path="/tmp/plan.txt",
+                            owner_id=owner_id)
+        orphan_id = uuid4()
+        legacy = Mock()
+        legacy.get.side_effect = [
+            {
+                "ids": ["a", "b"],
+                "documents": ["text a", "text b"],
+                "metadatas": [
+                    {"document_id": str(document.id), "chunk_index": 0},
+                    {"document_id": str(orphan_id), "chunk_index": 0},
+                ],
+                "embeddings": [[0.1], [0.2]],
+            },
+            {"ids": [], "documents": [], "metadatas": [], "embeddings": []},
+        ]
+        service = Mock()
+        service.client.get_collection.return_value = legacy
+
+        counts = migrate_legacy_collection(service, lambda ids: {document.id: document})
+
+        assert counts == {"migrated": 1, "orphaned": 1}
+        upsert = service.upsert_texts.call_args[1]
+        assert upsert["owner_id"] == owner_id
+        assert upsert["ids"] == ["a"]
+        assert upsert["embeddings"] == [[0.1]]
+        assert upsert["metadatas"][0]["owner_id"] == str(owner_id)
+        legacy.delete.assert_called_once_with(ids=["a", "b"])
+        service.client.delete_collection.assert_called_once_with("aura_collection")
@@ -0,0 +1,72 @@
+"""
+Unit tests for token-budgeted context packing.
+"""
+
+import os
+from unittest.mock import patch
+
+# Ensure testing environment is set before any app imports
+os.environ["TESTING"] = "true"
+
+from app.services.context_packer import count_tokens, overlap_length, pack_context
+
+
+MODEL = "gpt-3.5-turbo"
+
+
+def chunk(text, index, document_id="doc"):
+    return {"text": text, "metadata": {"document_id": document_id, "chunk_index": index}, "distance": 0.1}
+
+
+class TestPackContext:
+    """Test suite for packing retrieved chunks into a token budget."""
+
+    def test_fills_budget_in_relevance_order(self):
+        """A chunk that doesn't fit is skipped, and a smaller one can take its place."""
+        big = chunk("word " * 200, 0)
+        small = chunk("A short fact about the grant deadline.", 5)
+        first = chunk("The mission is clean water for rural schools.", 9)
+
+        context = pack_context([first, big, small], MODEL, token_budget=60)
+
+        assert context.chunks == [first, small]
+        assert context.text.startswith("[Context 1 - Chunk 9]\nThe mission")
+        assert "[Context 2 - Chunk 5]" in context.text
+        assert context.tokens == count_tokens(MODEL, context.text.split("\n\n")[0]) + \
+            count_tokens(MODEL, context.text.split("\n\n")[1])
+        assert context.tokens <= 60
+
+    def test_labels_cite_pages(self):
+        single, spanning = chunk("Budget.", 0), chunk("Staff.", 1, document_id="other")
+        single["metadata"].update(page=3, page_end=3)
+        spanning["metadata"].update(page=4, page_end=5)
+
+        context = pack_context([single, spanning], MODEL, token_budget=100)
+
+        assert "[Context 1 - Chunk 0, page 3]" in context.text
+        assert "[Context 2 - Chunk 1, pages 4-5]" in context.text
+
+    def test_drops_overlap_between_neighbouring_chunks(self):
+        """Text shared by adjacent chunks of a document is sent once."""
+        shared = "the overlapping region of both chunks"
+        earlier = chunk(f"Start of the document, then {shared}", 3)
+        later = chunk(f"{shared} and then the rest of the text", 4)
+
+        context = pack_context([later, earlier], MODEL, token_budget=1000)
+
+        assert context.text.count(shared) == 1
+        assert context.chunks == [later, earlier]
+
+    def test_truncates_oversized_first_chunk(self):
+        context = pack_context([chunk("word " * 500, 0)], MODEL, token_budget=50)
+
+        assert len(context.chunks) == 1
+        assert 0 < context.tokens <= 50
+
+    def test_unknown_model_falls_back_to_estimate(self):
+        with patch("app.services.context_packer.litellm.token_counter", side_effect=ValueError):
+            assert count_tokens("some-local-model", "x" * 40) == 10
+
+    def test_overlap_length(self):
+        assert overlap_length("abc " + "x" * 30, "x" * 30 + " def") == 30
+        assert overlap_length("abc", "abc") == 0  # shorter than the minimum overlap
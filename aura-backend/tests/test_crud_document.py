@@ -0,0 +1,211 @@
+"""
+Unit tests for document CRUD operations against an in-memory database.
+"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+import os
+import pytest
+from uuid import uuid4
+
+# Ensure testing environment is set before any app imports
+os.environ["TESTING"] = "true"
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.crud import crud_document
+from app.db.models_pg import DocumentStatus
+from app.schemas.document_schemas import DocumentCreate
+
+
+@pytest.fixture(name="session")
+def session_fixture():
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+
+
+def document_in(name="a.txt", content_hash="ab"):
+    return DocumentCreate(file_name=name, file_path=f"/u/ab/{content_hash}.txt", content_hash=content_hash)
+
+
+class TestDuplicates:
+    """Tests for finding a processed copy of the same file."""
+
+    def test_finds_processed_duplicate(self, session):
+        def create(status):
+            document = crud_document.create_document(session, document_in(), None)
+            return crud_document.update_document_status(session, document, status)
+
+        pending = create("PENDING")
+        assert crud_document.get_processed_duplicate(session, pending) is None
+        processed = create("COMPLETED")
+
+        assert crud_document.get_processed_duplicate(session, pending).id == processed.id
+        assert crud_document.get_processed_duplicate(session, processed) is None
+
+
+class TestBulkCreate:
+    """Tests for bulk uploads."""
+
+    def test_creates_batch_in_order(self, session):
+        batch_id = uuid4()
+        names = [f"{i}.txt" for i in range(5)]
+
+        documents = crud_document.create_documents(
+            session, [document_in(name, str(i)) for i, name in enumerate(names)], owner_id=None, batch_id=batch_id
+        )
+
+        assert [d.file_name for d in documents] == names
+        assert all(d.batch_id == batch_id and d.status == "PENDING" for d in documents)
+
+    def test_status_counts(self, session):
+        owner_id, batch_id = uuid4(), uuid4()
+        documents = crud_document.create_documents(
+            session, [document_in(str(i)) for i in range(3)], owner_id=owner_id, batch_id=batch_id
+        )
+        crud_document.update_document_status(session, documents[0], "COMPLETED")
+
+        assert crud_document.get_batch_status_counts(session, batch_id, owner_id) == {"PENDING": 2, "COMPLETED": 1}
+        assert crud_document.get_batch_status_counts(session, batch_id, uuid4()) == {}
+
+
+class TestStatusTransitions:
+    """Tests for optimistic status transitions."""
+
+    def test_transition_is_one_statement(self):
+        engine = create_engine("sqlite://")
+        SQLModel.metadata.create_all(engine)
+        with Session(engine, expire_on_commit=False) as session:
+            document_id = crud_document.create_document(session, document_in(), None).id
+            statements = []
+            event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+            document = crud_document.transition_document_status(
+                session, document_id, DocumentStatus.PROCESSING, from_statuses=[DocumentStatus.PENDING]
+            )
+
+            assert (document.id, document.status, document.file_name) == (document_id, "PROCESSING", "a.txt")
+            assert len(statements) == 1 and statements[0].startswith("UPDATE")
+
+    def test_transition_from_other_status_is_refused(self, session):
+        document = crud_document.create_document(session, document_in(), None)
+
+        def claim():
+            return crud_document.transition_document_status(
+                session, document.id, DocumentStatus.PROCESSING, from_statuses=[DocumentStatus.PENDING]
+            )
+
+        assert claim() is not None
+        # A second worker handed the same document loses the race
+        assert claim() is None
+        assert crud_document.transition_document_status(
+            session, uuid4(), DocumentStatus.FAILED, from_statuses=[DocumentStatus.PENDING]
+        ) is None
+        assert crud_document.get_document(session, document.id).status == "PROCESSING"
+
+    def test_bulk_transition(self, session):
+        documents = crud_document.create_documents(session, [document_in(str(i)) for i in range(3)], owner_id=None)
+        crud_document.update_document_status(session, documents[0], "COMPLETED")
+        ids = [document.id for document in documents]
+
+        moved = crud_document.transition_documents_status(
+            session, ids + [uuid4()], DocumentStatus.FAILED, from_statuses=[DocumentStatus.PENDING]
+        )
+
+        assert set(moved) == set(ids[1:])
+        assert [crud_document.get_document(session, i).status for i in ids] == ["COMPLETED", "FAILED", "FAILED"]
+
+    def test_bulk_transition_checks_claims(self, session):
+        documents = crud_document.create_documents(session, [document_in(str(i)) for i in range(2)], owner_id=None)
+        now = datetime.now(timezone.utc)
+        for document, task_id in zip(documents, ["task-1", "task-2"]):
+            crud_document.claim_document(session, document.id, task_id, stale_before=now)
+
+        moved = crud_document.transition_documents_status(
+            session, [d.id for d in documents], DocumentStatus.COMPLETED,
+            from_statuses=[DocumentStatus.PROCESSING], claimed_by="task-1",
+        )
+
+        assert moved == [documents[0].id]
+
+    def test_claims(self, session):
+        document = crud_document.create_document(session, document_in(), None)
+        now = datetime.now(timezone.utc)
+
+        assert crud_document.claim_document(session, document.id, "task-1", stale_before=now).claimed_by == "task-1"
+        # The task holding the claim may resume it, other tasks may not while it is fresh
+        assert crud_document.claim_document(session, document.id, "task-1", stale_before=now) is not None
+        assert crud_document.claim_document(session, document.id, "task-2", stale_before=now - timedelta(hours=1)) \
+            is None
+        assert crud_document.transition_document_status(
+            session, document.id, DocumentStatus.COMPLETED, from_statuses=[DocumentStatus.PROCESSING],
+            claimed_by="task-2",
+        ) is None
+
+        # A claim older than the timeout is abandoned and can be taken over
+        stale = crud_document.claim_document(session, document.id, "task-2", stale_before=now + timedelta(hours=1))
+        assert (stale.status, stale.claimed_by) == ("PROCESSING", "task-2")
+
+
+def run_async(test):
+    """Runs `test(session)` with an async session on a fresh in-memory database."""
+    async def run():
+        engine = create_async_engine("sqlite+aiosqlite://")
+        async with engine.begin() as connection:
+            await connection.run_sync(SQLModel.metadata.create_all)
+        try:
+            async with AsyncSession(engine, expire_on_commit=False) as session:
+                return await test(session)
+        finally:
+            await engine.dispose()
+    return asyncio.run(run())
+
+
+class TestAsyncVariants:
+    """Tests for the async functions the API uses."""
+
+    def test_create_get_and_update(self):
+        async def test(session):
+            document = await crud_document.acreate_document(session, document_in(), owner_id=None)
+            assert (await crud_document.aget_document(session, document.id)).status == "PENDING"
+
+            await crud_document.aupdate_document_status(session, document, "COMPLETED")
+            document = await crud_document.areplace_document_file(session, document, "b.txt", "/u/cd/cd.txt", "cd")
+            return document
+
+        document = run_async(test)
+        assert (document.file_name, document.status, document.content_hash) == ("b.txt", "PENDING", "cd")
+
+    def test_bulk_create_and_status_counts(self):
+        owner_id, batch_id = uuid4(), uuid4()
+
+        async def test(session):
+            documents = await crud_document.acreate_documents(
+                session, [document_in(str(i)) for i in range(3)], owner_id=owner_id, batch_id=batch_id
+            )
+            await crud_document.aupdate_document_status(session, documents[2], "FAILED")
+            return documents, await crud_document.aget_batch_status_counts(session, batch_id, owner_id)
+
+        documents, counts = run_async(test)
+        assert [d.file_name for d in documents] == ["0", "1", "2"]
+        assert counts == {"PENDING": 2, "FAILED": 1}
+
+    def test_bulk_transition(self):
+        async def test(session):
+            documents = await crud_document.acreate_documents(
+                session, [document_in(str(i)) for i in range(2)], owner_id=None
+            )
+            await crud_document.aupdate_document_status(session, documents[0], "PROCESSING")
+            ids = [document.id for document in documents]
+            moved = await crud_document.atransition_documents_status(
+                session, ids, DocumentStatus.FAILED, from_statuses=[DocumentStatus.PENDING]
+            )
+            return ids, moved
+
+        ids, moved = run_async(test)
+        assert moved == [ids[1]]
@@ -0,0 +1,109 @@
+"""
+Unit tests for the database engine configuration and pool metrics.
+"""
+
+import os
+import pytest
+from unittest.mock import patch
+
+# Ensure testing environment is set before any app imports
+os.environ["TESTING"] = "true"
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from app.db import session as db_session
+from app.db.pool_metrics import InstrumentedAsyncQueuePool, InstrumentedQueuePool
+from app.main import app
+
+
+class TestEngineOptions:
+    """Tests for engine_options"""
+
+    def test_postgres_gets_pool_settings_and_statement_timeout(self, monkeypatch):
+        monkeypatch.setattr("app.core.config.settings.DB_POOL_SIZE", 3)
+        monkeypatch.setattr("app.core.config.settings.DB_STATEMENT_TIMEOUT", 5000)
+        options = db_session.engine_options("postgresql://u:p@localhost/aura")
+        assert options["echo"] is False
+        assert options["poolclass"] is InstrumentedQueuePool
+        assert options["pool_size"] == 3
+        assert options["pool_pre_ping"] is True
+        assert options["connect_args"] == {"options": "-c statement_timeout=5000"}
+
+    def test_statement_timeout_can_be_disabled(self, monkeypatch):
+        monkeypatch.setattr("app.core.config.settings.DB_STATEMENT_TIMEOUT", None)
+        assert "connect_args" not in db_session.engine_options("postgresql://u:p@localhost/aura")
+
+    def test_file_sqlite_is_pooled_without_statement_timeout(self):
+        options = db_session.engine_options("sqlite:///./aura.db")
+        assert options["poolclass"] is InstrumentedQueuePool
+        assert "connect_args" not in options
+
+    def test_in_memory_sqlite_keeps_default_pool(self):
+        assert db_session.engine_options("sqlite://") == {"echo": False}
+
+    def test_async_engine_sets_statement_timeout_through_asyncpg(self, monkeypatch):
+        monkeypatch.setattr("app.core.config.settings.DB_STATEMENT_TIMEOUT", 5000)
+        options = db_session.engine_options("postgresql://u:p@localhost/aura", is_async=True)
+        assert options["poolclass"] is InstrumentedAsyncQueuePool
+        assert options["connect_args"] == {"server_settings": {"statement_timeout": "5000"}}
+
+    def test_async_database_url(self):
+        assert db_session.async_database_url("postgresql://u:p@db:5432/aura") == "postgresql+asyncpg://u:p@db:5432/aura"
+        assert db_session.async_database_url("sqlite:///./aura.db") == "sqlite+aiosqlite:///./aura.db"
+        with pytest.raises(ValueError):
+            db_session.async_database_url("mysql://u:p@db/aura")
+
+
+@pytest.fixture
+def pooled_engine(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=InstrumentedQueuePool, pool_size=1, max_overflow=1, pool_timeout=0.05,
+    )
+    yield engine
+    engine.dispose()
+
+
+class TestInstrumentedQueuePool:
+    """Tests for InstrumentedQueuePool"""
+
+    def test_records_checkouts_and_saturation(self, pooled_engine):
+        with pooled_engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+            metrics = pooled_engine.pool.status_metrics()
+            assert metrics["checked_out"] == 1
+            assert metrics["capacity"] == 2
+            assert metrics["saturation"] == 0.5
+
+        metrics = pooled_engine.pool.status_metrics()
+        assert metrics["checkouts"] == 1
+        assert metrics["checked_out"] == 0
+        assert metrics["wait_seconds_max"] >= metrics["wait_seconds_p50"] >= 0
+
+    def test_records_timeouts(self, pooled_engine):
+        with pooled_engine.connect(), pooled_engine.connect():
+            assert pooled_engine.pool.status_metrics()["saturation"] == 1.0
+            with pytest.raises(PoolTimeoutError):
+                pooled_engine.connect()
+        metrics = pooled_engine.pool.status_metrics()
+        assert metrics["timeouts"] == 1
+        assert metrics["wait_seconds_max"] >= 0.05
+
+    def test_dispose_starts_fresh_metrics(self, pooled_engine):
+        with pooled_engine.connect():
+            pass
+        pooled_engine.dispose(close=False)
+        assert isinstance(pooled_engine.pool, InstrumentedQueuePool)
+        assert pooled_engine.pool.status_metrics()["checkouts"] == 0
+
+
+class TestMetricsEndpoint:
+    """Tests for GET /metrics"""
+
+    def test_reports_pool_metrics(self, pooled_engine):
+        with patch.object(db_session, "engine", pooled_engine):
+            response = TestClient(app).get("/metrics")
+        assert response.status_code == 200
+        assert response.json()["db_pool"]["capacity"] == 2
@@ -0,0 +1,168 @@
+"""
+Unit tests for the streaming document chunker.
+"""
+
+import os
+import pytest
+import zipfile
+
+# Ensure testing environment is set before any app imports
+os.environ["TESTING"] = "true"
+
+from app.services import document_processing_service
+from app.services.chunkers import StructuredChunker
+from app.services.document_processing_service import (
+    batch_chunks,
+    chunk_document,
+    chunk_text,
+    iter_document_chunks,
+    process_document,
+)
+
+
+def make_pdf(path, pages):
+    """Writes a minimal PDF with one line of Helvetica text per page."""
+    n = len(pages)
+    kids = " ".join(f"{4 + 2 * i} 0 R" for i in range(n))
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{kids}] /Count {n} >>",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i, text in enumerate(pages):
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>"
+        )
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    path.write_bytes(out)
+
+
+def make_docx(path, paragraphs):
+    """Writes a minimal DOCX; paragraphs are (style, text) pairs."""
+    ns = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+    body = ""
+    for style, text in paragraphs:
+        properties = f'<w:pPr><w:pStyle w:val="{style}"/></w:pPr>' if style else ""
+        body += f"<w:p>{properties}<w:r><w:t>{text}</w:t></w:r></w:p>"
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("word/document.xml", f'<w:document xmlns:w="{ns}"><w:body>{body}</w:body></w:document>')
+
+
+class TestStreamingChunker:
+    """Test suite for the incremental chunking pipeline."""
+
+    @pytest.mark.parametrize("length", [0, 1, 199, 800, 1000, 1001, 4321])
+    @pytest.mark.parametrize("read_size", [7, 333, 1000, 65536])
+    def test_matches_chunk_text(self, tmp_path, length, read_size):
+        """Streaming yields exactly the chunks of the in-memory splitter."""
+        text = "".join(chr(ord("a") + i % 26) for i in range(length))
+        path = tmp_path / "doc.txt"
+        path.write_text(text, encoding="utf-8")
+
+        chunks = list(iter_document_chunks(str(path), read_size=read_size))
+
+        assert chunks == chunk_text(text)
+
+    def test_multibyte_text_across_reads(self, tmp_path):
+        """Characters are counted after decoding, not as raw bytes."""
+        text = "é€😀" * 700
+        path = tmp_path / "doc.txt"
+        path.write_text(text, encoding="utf-8")
+
+        assert list(iter_document_chunks(str(path), read_size=10)) == chunk_text(text)
+        assert process_document(str(path)) == chunk_text(text)
+
+    def test_missing_file_raises_eagerly(self, tmp_path):
+        """A missing file is reported before iteration starts."""
+        with pytest.raises(FileNotFoundError):
+            iter_document_chunks(str(tmp_path / "missing.txt"))
+
+    def test_undecodable_file_raises_ioerror(self, tmp_path):
+        """Decoding errors surface as IOError."""
+        path = tmp_path / "doc.bin"
+        path.write_bytes(b"\xff\xfe\xfa" * 10)
+
+        with pytest.raises(IOError):
+            list(iter_document_chunks(str(path)))
+
+    def test_batch_chunks(self):
+        """Chunks are grouped into fixed-size batches with a short tail."""
+        batches = list(batch_chunks(iter(["a", "b", "c", "d", "e"]), 2))
+
+        assert batches == [["a", "b"], ["c", "d"], ["e"]]
+        with pytest.raises(ValueError):
+            list(batch_chunks(["a"], 0))
+
+
+
+class TestExtraction:
+    """Test suite for PDF and DOCX text extraction."""
+
+    def test_pdf_chunks_record_pages(self, tmp_path):
+        path = tmp_path / "report.pdf"
+        make_pdf(path, ["Mission statement.", "Budget overview.", "Staff list."])
+
+        chunks = list(chunk_document(str(path), StructuredChunker(max_tokens=4)))
+
+        assert [c.text for c in chunks] == ["Mission statement.", "Budget overview.", "Staff list."]
+        assert [(c.metadata["page"], c.metadata["page_end"]) for c in chunks] == [(1, 1), (2, 2), (3, 3)]
+
+    def test_chunk_spanning_pages(self, tmp_path):
+        path = tmp_path / "report.pdf"
+        make_pdf(path, ["One.", "Two.", "Three."])
+
+        chunks = list(chunk_document(str(path), StructuredChunker(max_tokens=100)))
+
+        assert len(chunks) == 1
+        assert (chunks[0].metadata["page"], chunks[0].metadata["page_end"]) == (1, 3)
+
+    def test_parallel_extraction_keeps_page_order(self, tmp_path, monkeypatch):
+        monkeypatch.setattr("app.core.config.settings.PDF_PARALLEL_MIN_PAGES", 2)
+        monkeypatch.setattr("app.core.config.settings.PDF_PAGES_PER_TASK", 2)
+        monkeypatch.setattr("app.core.config.settings.PDF_EXTRACT_WORKERS", 2)
+        monkeypatch.setattr(document_processing_service, "_pdf_pool", None)
+        path = tmp_path / "report.pdf"
+        pages = [f"Page number {i}." for i in range(7)]
+        make_pdf(path, pages)
+
+        try:
+            extracted = list(document_processing_service.extract_pdf_pages(path))
+        finally:
+            if document_processing_service._pdf_pool is not None:
+                document_processing_service._pdf_pool.shutdown()
+
+        assert extracted == pages
+
+    def test_legacy_chunker_reads_pdf(self, tmp_path):
+        path = tmp_path / "report.pdf"
+        make_pdf(path, ["Hello.", "World."])
+
+        assert process_document(str(path)) == ["Hello.\n\nWorld.\n\n"]
+
+    def test_invalid_pdf_raises_ioerror(self, tmp_path):
+        path = tmp_path / "broken.pdf"
+        path.write_bytes(b"not a pdf")
+
+        with pytest.raises(IOError):
+            list(chunk_document(str(path)))
+
+    def test_docx_headings_become_sections(self, tmp_path):
+        path = tmp_path / "plan.docx"
+        make_docx(path, [("Heading1", "Budget"), (None, "We request $50,000."), ("Heading2", "Staff"),
+                         (None, "Two coordinators.")])
+
+        chunks = list(chunk_document(str(path)))
+
+        assert [c.text for c in chunks] == ["# Budget\n\nWe request $50,000.", "## Staff\n\nTwo coordinators."]
+        assert [c.metadata["section"] for c in chunks] == ["Budget", "Budget > Staff"]
@@ -0,0 +1,130 @@
+"""
+Unit tests for the content-addressed embedding cache.
+"""
+
+import os
+import sqlite3
+import time
+import numpy as np
+from unittest.mock import Mock, patch
+
+# Ensure testing environment is set before any app imports
+os.environ["TESTING"] = "true"
+
+from app.services.embedding_cache import DiskEmbeddingStore, EmbeddingCache
+from app.services.embedding_service import EmbeddingService
+
+
+def vec(*values):
+    return np.array(values, dtype=np.float32)
+
+
+class TestEmbeddingCache:
+    """Test suite for the LRU and persistent tiers."""
+
+    def test_lru_hit_and_eviction(self):
+        """Entries are keyed by model and text and evicted least-recently-used first."""
+        cache = EmbeddingCache(max_entries=2)
+        cache.set_many("m", ["a", "b"], [vec(1), vec(2)])
+        cache.get_many("m", ["a"])
+        cache.set_many("m", ["c"], [vec(3)])
+
+        a, b, c = cache.get_many("m", ["a", "b", "c"])
+        assert a.tolist() == [1] and b is None and c.tolist() == [3]
+        assert cache.get_many("other-model", ["a"]) == [None]
+
+    def test_disk_store_survives_restart(self, tmp_path):
+        """A new process-level cache reads vectors back from disk."""
+        path = str(tmp_path / "embeddings.sqlite3")
+        EmbeddingCache(10, DiskEmbeddingStore(path, max_entries=10)).set_many("m", ["a"], [vec(1, 2)])
+
+        fresh = EmbeddingCache(10, DiskEmbeddingStore(path, max_entries=10))
+        assert fresh.get_many("m", ["a", "b"])[0].tolist() == [1, 2]
+        assert fresh.get_many("m", ["b"]) == [None]
+
+    def test_disk_store_keeps_most_recently_used(self, tmp_path):
+        """Rows above the bound are evicted least-recently-used first."""
+        store = DiskEmbeddingStore(str(tmp_path / "embeddings.sqlite3"), max_entries=2, prune_every=1)
+        with patch("app.services.embedding_cache.time.time", return_value=1.0):
+            store.set_many({"a": b"1", "b": b"2"})
+        with patch("app.services.embedding_cache.time.time", return_value=2.0):
+            store.get_many(["a"])
+        with patch("app.services.embedding_cache.time.time", return_value=3.0):
+            store.set_many({"c": b"3"})
+
+        assert store.get_many(["a", "b", "c"]) == {"a": b"1", "c": b"3"}
+
+    def test_disk_store_expires_unused_rows(self, tmp_path):
+        """Rows not used within the TTL are deleted when the store is pruned."""
+        store = DiskEmbeddingStore(str(tmp_path / "embeddings.sqlite3"), max_entries=10, ttl=60)
+        with patch("app.services.embedding_cache.time.time", return_value=time.time() - 120):
+            store.set_many({"old": b"1"})
+        store.set_many({"new": b"2"})
+
+        store.prune()
+
+        assert store.get_many(["old", "new"]) == {"new": b"2"}
+
+    def test_disk_store_upgrades_old_file(self, tmp_path):
+        """Files written without access times are upgraded in place."""
+        path = str(tmp_path / "embeddings.sqlite3")
+        with sqlite3.connect(path) as conn:
+            conn.execute("CREATE TABLE embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+            conn.execute("INSERT INTO embeddings VALUES ('a', x'01')")
+
+        assert DiskEmbeddingStore(path, max_entries=10).get_many(["a"]) == {"a": b"\x01"}
+
+    def test_store_errors_are_misses(self):
+        """A failing persistent tier does not fail embedding."""
+        store = Mock()
+        store.get_many.side_effect = ConnectionError("down")
+
+        assert EmbeddingCache(10, store).get_many("m", ["a"]) == [None]
+
+
+class TestEmbeddingServiceCaching:
+    """The embedding service only encodes unseen texts."""
+
+    @patch("sentence_transformers.SentenceTransformer")
+    def test_encodes_only_misses(self, mock_model_class):
+        model = mock_model_class.return_value
+        model.encode.side_effect = lambda texts, **kwargs: np.array([[float(len(t))] for t in texts])
+        service = EmbeddingService(cache=EmbeddingCache(max_entries=10))
+
+        assert service.embed_texts(["aa", "b"]) == [[2.0], [1.0]]
+        assert service.embed_texts(["b", "ccc", "ccc"]) == [[1.0], [3.0], [3.0]]
+
+        assert [c.args[0] for c in model.encode.call_args_list] == [["aa", "b"], ["ccc"]]
+
+
+class TestEmbedBatch:
+    """The batched path returns one float32 matrix."""
+
+    @patch("sentence_transformers.SentenceTransformer")
+    def test_returns_contiguous_float32_matrix(self, mock_model_class):
+        model = mock_model_class.return_value
+        model.encode.side_effect = lambda texts, **kwargs: np.array([[float(len(t)), 1.0] for t in texts])
+        service = EmbeddingService(cache=EmbeddingCache(max_entries=10), batch_size=16)
+
+        service.embed_batch(["aa"])
+        embeddings = service.embed_batch(["b", "aa"])
+
+        assert embeddings.dtype == np.float32
+        assert embeddings.flags["C_CONTIGUOUS"]
+        assert embeddings.tolist() == [[1.0, 1.0], [2.0, 1.0]]
+        kwargs = model.encode.call_args[1]
+        assert kwargs["batch_size"] == 16
+        assert kwargs["convert_to_numpy"] is True
+        assert kwargs["normalize_embeddings"] is True
+
+    @patch("sentence_transformers.SentenceTransformer")
+    def test_normalization_is_part_of_cache_key(self, mock_model_class):
+        """Normalized and raw embeddings of the same text are cached separately."""
+        model = mock_model_class.return_value
+        model.encode.side_effect = lambda texts, **kwargs: np.ones((len(texts), 2))
+        cache = EmbeddingCache(max_entries=10)
+
+        EmbeddingService(cache=cache, normalize=True).embed_batch(["a"])
+        EmbeddingService(cache=cache, normalize=False).embed_batch(["a"])
+
+        assert model.encode.call_count == 2
@@ -0,0 +1,122 @@
+"""
+Unit tests for content-addressed upload storage and chunk reuse.
+"""
+
+import asyncio
+import hashlib
+import io
+import os
+import zipfile
+import numpy as np
+import pytest
+from uuid import uuid4
+from unittest.mock import Mock
+
+# Ensure testing environment is set before any app imports
+os.environ["TESTING"] = "true"
+
+from app.db.models_pg import Document
+from app.services.file_storage import COPY_SIZE, UploadTooLargeError, astore_upload, store_archive, store_upload
+from app.services.ingestion_service import chunk_id, copy_document_chunks
+
+
+class TestStoreUpload:
+    """Test suite for hashing uploads while they are written."""
+
+    def test_stores_by_content_hash(self, tmp_path):
+        data = os.urandom(COPY_SIZE * 2 + 17)
+
+        stored = store_upload(io.BytesIO(data), "Plan.MD", str(tmp_path))
+
+        content_hash = hashlib.sha256(data).hexdigest()
+        assert stored.content_hash == content_hash
+        assert stored.size == len(data)
+        assert stored.path == str(tmp_path / content_hash[:2] / f"{content_hash}.md")
+        assert open(stored.path, "rb").read() == data
+
+    def test_identical_uploads_share_a_file(self, tmp_path):
+        first = store_upload(io.BytesIO(b"same"), "a.txt", str(tmp_path))
+        second = store_upload(io.BytesIO(b"same"), "b.txt", str(tmp_path))
+
+        assert first == second
+        assert [p.name for p in tmp_path.rglob("*") if p.is_file()] == [os.path.basename(first.path)]
+
+
+class TestAstoreUpload:
+    """Test suite for the async, size-limited upload path."""
+
+    async def blocks(self, *parts):
+        for part in parts:
+            yield part
+
+    def test_matches_sync_storage(self, tmp_path):
+        stored = asyncio.run(astore_upload(self.blocks(b"abc", b"def"), "a.txt", upload_dir=str(tmp_path)))
+
+        assert stored == store_upload(io.BytesIO(b"abcdef"), "a.txt", str(tmp_path))
+
+    def test_stops_at_max_size(self, tmp_path):
+        with pytest.raises(UploadTooLargeError):
+            asyncio.run(astore_upload(self.blocks(b"abc", b"def"), "a.txt", max_size=5, upload_dir=str(tmp_path)))
+
+        assert list(tmp_path.iterdir()) == []
+
+
+class TestStoreArchive:
+    """Test suite for extracting zipped folders."""
+
+    def make_zip(self, files):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w") as archive:
+            for name, data in files.items():
+                archive.writestr(name, data)
+        buffer.seek(0)
+        return buffer
+
+    def test_stores_each_file(self, tmp_path, monkeypatch):
+        monkeypatch.setattr("app.core.config.settings.MAX_UPLOAD_SIZE", 10)
+        archive = self.make_zip({
+            "plans/a.md": b"# A", "plans/b.txt": b"B", "plans/empty.txt": b"", "plans/big.txt": b"x" * 11,
+            "__MACOSX/plans/._a.md": b"junk", "plans/.DS_Store": b"junk",
+        })
+
+        stored, skipped = store_archive(archive, max_files=10, upload_dir=str(tmp_path))
+
+        assert [name for name, _ in stored] == ["plans/a.md", "plans/b.txt"]
+        assert stored[0][1].path.endswith(".md")
+        assert open(stored[1][1].path, "rb").read() == b"B"
+        assert skipped == ["plans/empty.txt", "plans/big.txt"]
+
+    def test_limits_file_count(self, tmp_path):
+        archive = self.make_zip({"a.txt": b"a", "b.txt": b"b"})
+
+        with pytest.raises(UploadTooLargeError):
+            store_archive(archive, max_files=1, upload_dir=str(tmp_path))
+
+
+class TestChunkReuse:
+    """A re-uploaded file reuses the chunks of the document processed before."""
+
+    def test_copies_chunks_with_embeddings(self):
+        source = Document(id=uuid4(), file_name="a.txt", file_path="p", owner_id=uuid4())
+        target = Document(id=uuid4(), file_name="b.txt", file_path="p", owner_id=uuid4())
+        store = Mock()
+        store.get_document_chunks.return_value = {chunk_id(target.id, "old"): {}}
+        store.iter_document_chunks.return_value = iter([{
+            "ids": [chunk_id(source.id, "text")],
+            "documents": ["text"],
+            "metadatas": [{"document_id": str(source.id), "owner_id": str(source.owner_id), "chunk_index": 0}],
+            "embeddings": [[0.5, 0.5]],
+        }])
+
+        assert copy_document_chunks(store, source, target) == 1
+
+        store.iter_document_chunks.assert_called_once()
+        assert store.iter_document_chunks.call_args[0][:2] == (source.owner_id, source.id)
+        upserted = store.upsert_texts.call_args[1]
+        assert upserted["owner_id"] == target.owner_id
+        assert upserted["ids"] == [chunk_id(target.id, "text")]
+        assert upserted["metadatas"][0]["document_id"] == str(target.id)
+        assert upserted["metadatas"][0]["owner_id"] == str(target.owner_id)
+        assert upserted["metadatas"][0]["chunk_index"] == 0
+        np.testing.assert_array_equal(upserted["embeddings"], [[0.5, 0.5]])
+        store.delete_chunks.assert_called_once_with(target.owner_id, [chunk_id(target.id, "old")])
@@ -0,0 +1,36 @@
+"""
+Import-time budget for the API process.
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+# Generous enough for a slow CI machine; loading torch alone blows well past it
+IMPORT_TIME_BUDGET_SECONDS = 5.0
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import app.main
+import app.services
+elapsed = time.perf_counter() - start
+heavy = sorted(m for m in ("torch", "sentence_transformers", "transformers") if m in sys.modules)
+print(f"{elapsed}|{','.join(heavy)}")
+"""
+
+
+def test_api_import_does_not_load_embedding_model():
+    """Importing the API and app.services loads no ML framework and stays within budget."""
+    env = {**os.environ, "TESTING": "true"}
+    result = subprocess.run(
+        [sys.executable, "-c", SCRIPT], cwd=BACKEND_DIR, env=env,
+        capture_output=True, text=True, check=True,
+    )
+    elapsed, heavy = result.stdout.strip().splitlines()[-1].split("|")
+
+    assert heavy == ""
+    assert float(elapsed) < IMPORT_TIME_BUDGET_SECONDS
@@ -0,0 +1,179 @@
+"""
+Unit tests for batched vector-store ingestion.
+"""
+
+import os
+import pytest
+import tracemalloc
+from uuid import uuid4
+from unittest.mock import Mock
+
+# Ensure testing environment is set before any app imports
+os.environ["TESTING"] = "true"
+
+from app.services.ingestion_service import chunk_id, ingest_chunks, IngestionError
+
+
+def make_chunks(n):
+    return [f"chunk {i}" for i in range(n)]
+
+
+class TestIngestChunks:
+    """Test suite for the pipelined ingestion stage."""
+
+    def test_uploads_in_batches(self):
+        """Chunks are uploaded in batches with content ids and positional metadata."""
+        store = Mock()
+        document_id = uuid4()
+        progress = []
+
+        total = ingest_chunks(
+            store, document_id, iter(make_chunks(5)), batch_size=2,
+            on_progress=lambda b, c: progress.append((b, c)),
+        )
+
+        assert total == 5
+        assert store.upsert_texts.call_count == 3
+        last = store.upsert_texts.call_args_list[-1][1]
+        assert last["ids"] == [chunk_id(document_id, "chunk 4")]
+        assert last["documents"] == ["chunk 4"]
+        assert last["metadatas"] == [{"document_id": str(document_id), "chunk_index": 4}]
+        assert progress == [(1, 2), (2, 4), (3, 5)]
+
+    def test_embeds_batches_before_upload(self):
+        """Each batch is embedded once and uploaded with its embeddings."""
+        store = Mock()
+        embed_fn = Mock(side_effect=lambda texts: [[float(len(t))] for t in texts])
+
+        ingest_chunks(store, uuid4(), iter(make_chunks(3)), batch_size=2, embed_fn=embed_fn)
+
+        assert [c.args[0] for c in embed_fn.call_args_list] == [["chunk 0", "chunk 1"], ["chunk 2"]]
+        assert store.upsert_texts.call_args_list[-1][1]["embeddings"] == [[7.0]]
+
+    def test_retries_failed_batch(self):
+        """A transient failure is retried without failing the ingestion."""
+        store = Mock()
+        store.upsert_texts.side_effect = [None, ConnectionError("boom"), None]
+
+        total = ingest_chunks(store, uuid4(), make_chunks(4), batch_size=2, retry_backoff=0)
+
+        assert total == 4
+        assert store.upsert_texts.call_count == 3
+
+    def test_failure_reports_completed_batches(self):
+        """A persistent failure reports how many batches were stored."""
+        store = Mock()
+        store.upsert_texts.side_effect = [None, ConnectionError("down"), ConnectionError("down")]
+
+        with pytest.raises(IngestionError) as exc_info:
+            ingest_chunks(
+                store, uuid4(), make_chunks(100), batch_size=2,
+                queue_size=1, max_retries=1, retry_backoff=0,
+            )
+
+        assert exc_info.value.completed_batches == 1
+
+    def test_resume_skips_completed_batches(self):
+        """Resuming starts at `start_batch` and keeps ids stable."""
+        store = Mock()
+        document_id = uuid4()
+
+        total = ingest_chunks(store, document_id, make_chunks(5), batch_size=2, start_batch=1)
+
+        assert total == 5
+        assert store.upsert_texts.call_count == 2
+        first = store.upsert_texts.call_args_list[0][1]
+        assert first["ids"] == [chunk_id(document_id, "chunk 2"), chunk_id(document_id, "chunk 3")]
+
+    def test_chunking_error_is_propagated(self):
+        """Errors raised while reading the document are not treated as upload failures."""
+        def broken_chunks():
+            yield "chunk 0"
+            raise IOError("unreadable")
+
+        with pytest.raises(IOError):
+            ingest_chunks(Mock(), uuid4(), broken_chunks(), batch_size=1)
+
+    def test_memory_does_not_grow_with_document(self):
+        """Peak memory is bounded by the queued batches, not the document's text."""
+        class DiscardingStore:
+            def upsert_texts(self, *args, **kwargs):
+                pass
+
+        chunk_size, n_chunks = 4096, 10_000
+        chunks = (f"{i:08d}".ljust(chunk_size, "x") for i in range(n_chunks))
+
+        tracemalloc.start()
+        try:
+            ingest_chunks(DiscardingStore(), uuid4(), chunks, batch_size=32, queue_size=2)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        assert peak < chunk_size * n_chunks / 10
+
+
+class TestIncrementalIngestion:
+    """Re-ingesting an edited document only touches the chunks that changed."""
+
+    def stored(self, document_id, texts):
+        return {
+            chunk_id(document_id, text): {"document_id": str(document_id), "chunk_index": i}
+            for i, text in enumerate(texts)
+        }
+
+    def test_chunk_ids_follow_content(self):
+        document_id = uuid4()
+
+        assert chunk_id(document_id, "a") == chunk_id(document_id, "a")
+        assert chunk_id(document_id, "a") != chunk_id(document_id, "b")
+        assert chunk_id(document_id, "a", 1) != chunk_id(document_id, "a")
+        assert chunk_id(document_id, "a") != chunk_id(uuid4(), "a")
+
+    def test_only_changes_are_stored(self):
+        """New chunks are embedded, moved ones re-labelled and stale ones deleted."""
+        document_id = uuid4()
+        store = Mock()
+        store.get_document_chunks.return_value = self.stored(document_id, ["intro", "budget", "old"])
+        keyword_index = Mock()
+        embed_fn = Mock(side_effect=lambda texts: [[1.0] for _ in texts])
+
+        total = ingest_chunks(
+            store, document_id, ["intro", "inserted", "budget"], embed_fn=embed_fn,
+            keyword_index=keyword_index, incremental=True,
+        )
+
+        assert total == 3
+        embed_fn.assert_called_once_with(["inserted"])
+        upserted = store.upsert_texts.call_args[1]
+        assert upserted["ids"] == [chunk_id(document_id, "inserted")]
+        store.update_metadatas.assert_called_once_with(
+            None, [chunk_id(document_id, "budget")], [{"document_id": str(document_id), "chunk_index": 2}]
+        )
+        store.delete_chunks.assert_called_once_with(None, [chunk_id(document_id, "old")])
+        keyword_index.delete.assert_called_once_with([chunk_id(document_id, "old")])
+
+    def test_unchanged_document_stores_nothing(self):
+        document_id = uuid4()
+        store = Mock()
+        store.get_document_chunks.return_value = self.stored(document_id, ["a", "b"])
+        progress = []
+
+        ingest_chunks(
+            store, document_id, ["a", "b"], batch_size=1, incremental=True,
+            on_progress=lambda b, c: progress.append((b, c)),
+        )
+
+        store.upsert_texts.assert_not_called()
+        store.update_metadatas.assert_not_called()
+        store.delete_chunks.assert_not_called()
+        assert progress == [(1, 1), (2, 2)]
+
+    def test_repeated_text_gets_distinct_ids(self):
+        document_id = uuid4()
+        store = Mock()
+
+        ingest_chunks(store, document_id, ["same", "same"])
+
+        ids = store.upsert_texts.call_args[1]["ids"]
+        assert ids == [chunk_id(document_id, "same"), chunk_id(document_id, "same", 1)]
@@ -0,0 +1,130 @@
+"""
+Unit tests for the BM25 keyword index and hybrid retrieval.
+"""
+
+import os
+from uuid import uuid4
+from unittest.mock import Mock, patch
+
+# Ensure testing environment is set before any app imports
+os.environ["TESTING"] = "true"
+
+from app.services.ingestion_service import ingest_chunks
+from app.services.keyword_index import KeywordIndex, matches_where
+from app.services.vector_query_service import query_vector_store, reciprocal_rank_fusion
+
+
+def chunk(document_id, index, text="", distance=None):
+    return {"text": text, "metadata": {"document_id": str(document_id), "chunk_index": index},
+            "distance": distance}
+
+
+def index_document(index, owner_id, document_id, texts, **metadata):
+    index.add(
+        owner_id,
+        [f"{document_id}_{i}" for i in range(len(texts))],
+        texts,
+        [{"document_id": str(document_id), "chunk_index": i, **metadata} for i in range(len(texts))],
+    )
+
+
+class TestKeywordIndex:
+    """Test suite for the FTS5 index."""
+
+    def test_finds_exact_tokens(self):
+        """Identifiers that embeddings blur are matched exactly and ranked first."""
+        index = KeywordIndex(":memory:")
+        owner_id, document_id = uuid4(), uuid4()
+        index_document(index, owner_id, document_id, [
+            "Our organization serves rural communities.",
+            "Employer identification number: 12-3456789.",
+        ])
+
+        results = index.search(owner_id, "What is our EIN 12-3456789?")
+
+        assert results[0]["text"] == "Employer identification number: 12-3456789."
+        assert results[0]["metadata"]["chunk_index"] == 1
+        assert results[0]["score"] > 0
+
+    def test_owner_and_document_isolation(self):
+        index = KeywordIndex(":memory:")
+        alice, bob = uuid4(), uuid4()
+        first, second, other = uuid4(), uuid4(), uuid4()
+        index_document(index, alice, first, ["budget 2024"])
+        index_document(index, alice, second, ["budget 2025"])
+        index_document(index, bob, other, ["budget 2024"])
+
+        assert len(index.search(alice, "budget")) == 2
+        results = index.search(alice, "budget", where={"document_id": str(second)})
+        assert [r["text"] for r in results] == ["budget 2025"]
+
+    def test_metadata_filters_and_replacement(self):
+        """Other filters apply to the matches, and re-adding a chunk replaces it."""
+        index = KeywordIndex(":memory:")
+        owner_id, document_id = uuid4(), uuid4()
+        index_document(index, owner_id, document_id, ["grant report"], document_type="pdf")
+        index_document(index, owner_id, document_id, ["grant summary"], document_type="pdf")
+
+        assert [r["text"] for r in index.search(owner_id, "grant")] == ["grant summary"]
+        assert index.search(owner_id, "grant", where={"document_type": {"$in": ["txt"]}}) == []
+
+    def test_delete_by_id(self):
+        index = KeywordIndex(":memory:")
+        owner_id, document_id = uuid4(), uuid4()
+        index_document(index, owner_id, document_id, ["grant report", "grant summary"])
+
+        index.delete([f"{document_id}_0"])
+
+        assert [r["text"] for r in index.search(owner_id, "grant")] == ["grant summary"]
+
+        index.delete_document(document_id)
+        assert index.search(owner_id, "grant") == []
+
+    def test_matches_where(self):
+        metadata = {"document_type": "pdf", "upload_date": 100}
+        assert matches_where(metadata, {"$and": [
+            {"document_type": {"$in": ["pdf"]}}, {"upload_date": {"$gte": 100}},
+        ]})
+        assert not matches_where(metadata, {"upload_date": {"$lt": 100}})
+
+
+class TestHybridRetrieval:
+    """Test suite for fusing keyword and vector results."""
+
+    def test_reciprocal_rank_fusion(self):
+        """Chunks found by both retrievers outrank chunks found by one."""
+        doc = uuid4()
+        vector = [chunk(doc, 0, "a", 0.1), chunk(doc, 1, "b", 0.2)]
+        keyword = [chunk(doc, 2, "c"), chunk(doc, 1, "b")]
+
+        fused = reciprocal_rank_fusion([vector, keyword], n_results=2, k=60)
+
+        assert [c["text"] for c in fused] == ["b", "a"]
+        assert fused[0]["distance"] == 0.2
+        assert fused[0]["score"] == 1 / 62 + 1 / 62
+
+    @patch("app.services.vector_query_service.get_vector_store_service")
+    @patch("app.services.vector_query_service.embedding_service")
+    def test_query_includes_keyword_only_hits(self, mock_embedding, mock_get_service):
+        owner_id, document_id = uuid4(), uuid4()
+        mock_embedding.embed_batch.return_value = [[0.0]]
+        mock_get_service.return_value.search.return_value = [chunk(document_id, 0, "mission", 0.3)]
+        index = KeywordIndex(":memory:")
+        index_document(index, owner_id, document_id, ["mission", "EIN 12-3456789"])
+
+        with patch("app.services.vector_query_service.get_keyword_index", return_value=index):
+            results = query_vector_store("EIN 12-3456789", document_id, n_results=2, owner_id=owner_id)
+
+        by_text = {r["text"]: r for r in results}
+        assert set(by_text) == {"mission", "EIN 12-3456789"}
+        assert by_text["EIN 12-3456789"]["distance"] is None
+
+    def test_ingestion_indexes_each_batch(self):
+        """Chunks are added to the keyword index alongside the vector store."""
+        index = KeywordIndex(":memory:")
+        owner_id, document_id = uuid4(), uuid4()
+
+        ingest_chunks(Mock(), document_id, iter(["alpha", "beta", "gamma"]), batch_size=2,
+                      owner_id=owner_id, keyword_index=index)
+
+        assert [r["text"] for r in index.search(owner_id, "gamma")] == ["gamma"]
@@ -0,0 +1,88 @@
+"""
+Unit tests for retrieval across a user's document library.
+"""
+
+import os
+from datetime import datetime, timezone
+from uuid import uuid4
+from unittest.mock import Mock
+
+# Ensure testing environment is set before any app imports
+os.environ["TESTING"] = "true"
+
+from app.db.models_pg import Document
+from app.services.ingestion_service import document_chunk_metadata, ingest_chunks
+from app.services.vector_store_service import LibraryScope, VectorStoreService
+
+
+class TestLibraryScope:
+    """Test suite for building the metadata filter."""
+
+    def test_owner_only(self):
+        """An unfiltered scope searches the owner's whole collection."""
+        assert LibraryScope(owner_id=uuid4()).to_where() is None
+
+    def test_all_filters_are_combined(self):
+        """Filters are and-ed into one where clause."""
+        owner_id, document_id = uuid4(), uuid4()
+        after = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        before = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+        where = LibraryScope(
+            owner_id=owner_id,
+            document_ids=[document_id],
+            document_types=[".PDF", "txt"],
+            uploaded_after=after,
+            uploaded_before=before,
+        ).to_where()
+
+        assert where == {"$and": [
+            {"document_id": {"$in": [str(document_id)]}},
+            {"document_type": {"$in": ["pdf", "txt"]}},
+            {"upload_date": {"$gte": int(after.timestamp())}},
+            {"upload_date": {"$lt": int(before.timestamp())}},
+        ]}
+
+    def test_query_library_is_one_search(self):
+        """Many documents are searched with a single collection query."""
+        client = Mock()
+        collection = client.get_or_create_collection.return_value
+        collection.query.return_value = {
+            "documents": [["a", "b"]],
+            "metadatas": [[{"document_id": "1"}, {"document_id": "2"}]],
+            "distances": [[0.1, 0.2]],
+        }
+        scope = LibraryScope(owner_id=uuid4(), document_ids=[uuid4(), uuid4()])
+
+        chunks = VectorStoreService("localhost", 8000, client=client).query_library(
+            "grants", scope, n_results=2, query_embedding=[0.5, 0.5]
+        )
+
+        client.get_or_create_collection.assert_called_once_with(f"aura_owner_{scope.owner_id.hex}")
+        collection.query.assert_called_once()
+        kwargs = collection.query.call_args[1]
+        assert kwargs["where"] == scope.to_where()
+        assert kwargs["query_embeddings"].tolist() == [[0.5, 0.5]]
+        assert [c["metadata"]["document_id"] for c in chunks] == ["1", "2"]
+
+
+class TestChunkMetadata:
+    """Test suite for the document metadata written at ingestion."""
+
+    def test_metadata_is_stored_on_every_chunk(self):
+        owner_id = uuid4()
+        uploaded = datetime(2024, 6, 1, tzinfo=timezone.utc)
+        document = Document(id=uuid4(), file_name="Budget.PDF", file_path="/tmp/b.pdf",
+                            owner_id=owner_id, upload_timestamp=uploaded)
+        store = Mock()
+
+        ingest_chunks(store, document.id, iter(["a", "b"]),
+                      metadata=document_chunk_metadata(document))
+
+        assert store.upsert_texts.call_args[1]["metadatas"][1] == {
+            "owner_id": str(owner_id),
+            "document_type": "pdf",
+            "upload_date": int(uploaded.timestamp()),
+            "document_id": str(document.id),
+            "chunk_index": 1,
+        }
@@ -0,0 +1,48 @@
+"""
+Tests for the API's startup and shutdown.
+"""
+
+import os
+import pytest
+from unittest.mock import AsyncMock, patch
+
+# Ensure testing environment is set before any app imports
+os.environ["TESTING"] = "true"
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+
+@pytest.fixture(name="services")
+def services_fixture(monkeypatch):
+    """Startup as in production, with the external services mocked."""
+    monkeypatch.setattr("app.core.config.settings.TESTING", False)
+    with patch("app.main.GraphDB") as graph_db, \
+            patch("app.main.init_vector_store_pool") as init_pool, \
+            patch("app.main.aclose_vector_store_pool", new_callable=AsyncMock), \
+            patch("app.services.embedding_service.embedding_service.warm_up") as warm_up:
+        init_pool.return_value.get_async_service = AsyncMock()
+        yield {"graph_db": graph_db, "init_pool": init_pool, "warm_up": warm_up}
+
+
+class TestLifespan:
+    """Tests for the lifespan handler."""
+
+    def test_does_not_load_embedding_model_by_default(self, services):
+        with TestClient(app):
+            services["warm_up"].assert_not_called()
+
+    def test_warms_up_embedding_model_when_enabled(self, services, monkeypatch):
+        monkeypatch.setattr("app.core.config.settings.EMBEDDING_WARMUP_ON_API_START", True)
+        with TestClient(app):
+            services["warm_up"].assert_called_once()
+
+    def test_connects_vector_store(self, services):
+        with TestClient(app):
+            services["init_pool"].return_value.get_async_service.assert_awaited_once()
+
+    def test_unreachable_vector_store_does_not_stop_startup(self, services):
+        services["init_pool"].return_value.get_async_service.side_effect = ConnectionError("refused")
+        with TestClient(app) as client:
+            assert client.get("/").status_code == 200
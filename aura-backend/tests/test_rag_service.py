@@ -0,0 +1,127 @@
+"""
+Unit tests for RAG service operations.
+"""
+
+import asyncio
+import os
+from uuid import uuid4
+from unittest.mock import AsyncMock, Mock, patch
+
+# Ensure testing environment is set before any app imports
+os.environ["TESTING"] = "true"
+
+from app.services.rag_service import RAGService
+
+
+def make_llm_response(content):
+    response = Mock()
+    response.choices = [Mock()]
+    response.choices[0].message.content = content
+    return response
+
+
+MOCK_CHUNKS = [
+    {
+        'text': 'Our mission is to expand access to clean water.',
+        'metadata': {'document_id': 'doc', 'chunk_index': 2},
+        'distance': 0.1
+    }
+]
+
+
+class TestRAGService:
+    """Test suite for RAG service functionality."""
+
+    @patch('app.services.rag_service.query_vector_store')
+    @patch('app.services.rag_service.litellm.completion')
+    def test_generate_answer(self, mock_completion, mock_query):
+        """The sync path retrieves chunks and calls the LLM with them."""
+        document_id = uuid4()
+        mock_query.return_value = MOCK_CHUNKS
+        mock_completion.return_value = make_llm_response(" Clean water. ")
+
+        result = RAGService().generate_answer("What is our mission?", document_id)
+
+        mock_query.assert_called_once_with(
+            query_text="What is our mission?", document_id=document_id, n_results=5, owner_id=None
+        )
+        kwargs = mock_completion.call_args[1]
+        assert kwargs['max_tokens'] == 1000
+        assert 'clean water' in kwargs['messages'][1]['content']
+        assert '[Context 1 - Chunk 2]' in kwargs['messages'][1]['content']
+        assert result.answer == "Clean water."
+        assert result.chunks_used == MOCK_CHUNKS
+        assert result.context_tokens > 0
+
+    @patch('app.services.rag_service.aquery_vector_store', new_callable=AsyncMock)
+    @patch('app.services.rag_service.litellm.acompletion', new_callable=AsyncMock)
+    def test_agenerate_answer(self, mock_acompletion, mock_aquery):
+        """The async path awaits retrieval and `litellm.acompletion`."""
+        document_id = uuid4()
+        mock_aquery.return_value = MOCK_CHUNKS
+        mock_acompletion.return_value = make_llm_response("Clean water.")
+
+        result = asyncio.run(
+            RAGService(max_chunks=3).agenerate_answer("What is our mission?", document_id)
+        )
+
+        mock_aquery.assert_awaited_once_with(
+            query_text="What is our mission?", document_id=document_id, n_results=3, owner_id=None
+        )
+        mock_acompletion.assert_awaited_once()
+        assert result.answer == "Clean water."
+        assert result.chunks_used == MOCK_CHUNKS
+
+    @patch('app.services.rag_service.aquery_vector_store', new_callable=AsyncMock)
+    @patch('app.services.rag_service.litellm.acompletion', new_callable=AsyncMock)
+    def test_agenerate_answer_no_chunks(self, mock_acompletion, mock_aquery):
+        """No LLM call is made when nothing relevant is retrieved."""
+        mock_aquery.return_value = []
+
+        result = asyncio.run(RAGService().agenerate_answer("Anything?", uuid4()))
+
+        assert "couldn't find any relevant information" in result.answer
+        mock_acompletion.assert_not_awaited()
+
+    @patch('app.services.rag_service.aquery_vector_store', new_callable=AsyncMock)
+    @patch('app.services.rag_service.litellm.acompletion', new_callable=AsyncMock)
+    def test_agenerate_answer_error(self, mock_acompletion, mock_aquery):
+        """LLM errors are reported in the answer instead of raised."""
+        mock_aquery.return_value = MOCK_CHUNKS
+        mock_acompletion.side_effect = Exception("API rate limit exceeded")
+
+        result = asyncio.run(RAGService().agenerate_answer("Anything?", uuid4()))
+
+        assert "error while processing" in result.answer
+        assert "API rate limit exceeded" in result.answer
+        assert result.chunks_used == []
+
+    @patch('app.services.rag_service.aquery_vector_store', new_callable=AsyncMock)
+    @patch('app.services.rag_service.litellm.acompletion', new_callable=AsyncMock)
+    def test_astream_answer(self, mock_acompletion, mock_aquery):
+        """Chunks are emitted first, then tokens as they arrive, then the full answer."""
+        mock_aquery.return_value = MOCK_CHUNKS
+
+        async def token_stream():
+            for token in ["Clean", " water", None, "."]:
+                part = Mock()
+                part.choices = [Mock()]
+                part.choices[0].delta.content = token
+                yield part
+
+        mock_acompletion.return_value = token_stream()
+
+        async def collect():
+            return [e async for e in RAGService().astream_answer("Mission?", uuid4())]
+
+        events = asyncio.run(collect())
+
+        assert mock_acompletion.call_args[1]['stream'] is True
+        assert events[-1]["data"]["context_tokens"] > 0
+        assert events == [
+            {"event": "chunks", "data": MOCK_CHUNKS},
+            {"event": "token", "data": "Clean"},
+            {"event": "token", "data": " water"},
+            {"event": "token", "data": "."},
+            {"event": "done", "data": {"answer": "Clean water.", "context_tokens": events[-1]["data"]["context_tokens"]}},
+        ]
@@ -0,0 +1,75 @@
+"""
+Unit tests for re-ranking retrieved chunks.
+"""
+
+import os
+import numpy as np
+from uuid import uuid4
+from unittest.mock import Mock, patch
+
+# Ensure testing environment is set before any app imports
+os.environ["TESTING"] = "true"
+
+from app.services.rag_service import RAGService
+from app.services.reranker import CrossEncoderReranker, MMRReranker, mmr_select
+
+
+def make_chunks(*texts):
+    return [{"text": t, "metadata": {"chunk_index": i}, "distance": 0.0} for i, t in enumerate(texts)]
+
+
+class TestMMR:
+    """Test suite for maximal marginal relevance."""
+
+    def test_skips_near_duplicates(self):
+        """A duplicate of an already selected chunk loses to a less similar one."""
+        query = np.array([1.0, 0.5])
+        candidates = np.array([[1.0, 0.0], [1.0, 0.0], [0.0, 1.0]])
+
+        assert mmr_select(query, candidates, k=2, lambda_mult=0.5) == [0, 2]
+        assert mmr_select(query, candidates, k=2, lambda_mult=1.0) == [0, 1]
+
+    def test_reranker_embeds_query_and_chunks_together(self):
+        vectors = {"q": [1.0, 0.5], "a": [1.0, 0.0], "a'": [1.0, 0.0], "b": [0.0, 1.0]}
+        embed_fn = Mock(side_effect=lambda texts: np.array([vectors[t] for t in texts]))
+        chunks = make_chunks("a", "a'", "b")
+
+        result = MMRReranker(lambda_mult=0.5, embed_fn=embed_fn).rerank("q", chunks, top_n=2)
+
+        assert [c["text"] for c in result] == ["a", "b"]
+        embed_fn.assert_called_once_with(["q", "a", "a'", "b"])
+
+
+class TestCrossEncoder:
+    """Test suite for cross-encoder scoring."""
+
+    @patch("sentence_transformers.CrossEncoder")
+    def test_orders_by_score(self, mock_model_class):
+        mock_model_class.return_value.predict.return_value = np.array([0.1, 0.9, 0.5])
+
+        result = CrossEncoderReranker(model_name="m").rerank("q", make_chunks("a", "b", "c"), top_n=2)
+
+        assert [c["text"] for c in result] == ["b", "c"]
+        pairs = mock_model_class.return_value.predict.call_args[0][0]
+        assert pairs == [("q", "a"), ("q", "b"), ("q", "c")]
+
+
+class TestRAGReranking:
+    """The RAG service retrieves a larger pool when a reranker is set."""
+
+    @patch("app.services.rag_service.query_vector_store")
+    @patch("app.services.rag_service.litellm.completion")
+    def test_reranks_candidate_pool(self, mock_completion, mock_query):
+        candidates = make_chunks("a", "b", "c")
+        mock_query.return_value = candidates
+        mock_completion.return_value.choices = [Mock()]
+        mock_completion.return_value.choices[0].message.content = "Answer"
+        reranker = Mock()
+        reranker.name = "test"
+        reranker.rerank.return_value = candidates[2:]
+
+        result = RAGService(max_chunks=1, reranker=reranker).generate_answer("q?", uuid4())
+
+        assert mock_query.call_args[1]["n_results"] == 20
+        reranker.rerank.assert_called_once_with("q?", candidates, 1)
+        assert result.chunks_used == candidates[2:]
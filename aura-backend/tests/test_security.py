@@ -0,0 +1,119 @@
+"""
+Unit tests for password hashing off the event loop and rehashing at login.
+"""
+
+import asyncio
+import os
+import pytest
+from concurrent.futures.process import BrokenProcessPool
+from unittest.mock import Mock, patch
+
+# Ensure testing environment is set before any app imports
+os.environ["TESTING"] = "true"
+
+from fastapi.testclient import TestClient
+from passlib.context import CryptContext
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core import security
+from app.crud import crud_user
+from app.db.session import get_async_db
+from app.main import app
+from app.schemas.user_schemas import UserCreate
+
+
+def weak_hash(password):
+    return CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash(password)
+
+
+class TestVerifyAndRehash:
+    """Tests for verify_and_rehash"""
+
+    def test_wrong_password(self):
+        assert security.verify_and_rehash("wrong", weak_hash("secret")) == (False, None)
+
+    def test_current_hash_is_kept(self):
+        hashed = security.get_password_hash("secret")
+        assert security.verify_and_rehash("secret", hashed) == (True, None)
+
+    def test_outdated_work_factor_is_rehashed(self):
+        valid, new_hash = security.verify_and_rehash("secret", weak_hash("secret"))
+        assert valid
+        assert security.verify_password("secret", new_hash)
+        assert not security.pwd_context.needs_update(new_hash)
+
+
+class TestAsyncHashing:
+    """Tests for the async hashing functions"""
+
+    def test_hashes_on_threads_when_testing(self):
+        assert security._get_hash_pool() is None
+        hashed = asyncio.run(security.aget_password_hash("secret"))
+        assert asyncio.run(security.averify_and_rehash("secret", hashed)) == (True, None)
+
+    def test_broken_pool_falls_back_to_threads(self):
+        pool = Mock()
+        pool.submit.side_effect = BrokenProcessPool("killed")
+        with patch.object(security, "_get_hash_pool", return_value=pool), \
+                patch.object(security, "_disable_hash_pool") as disable:
+            valid, _ = asyncio.run(security.averify_and_rehash("secret", weak_hash("secret")))
+        assert valid
+        disable.assert_called_once()
+
+
+@pytest.fixture
+def db(tmp_path):
+    """A database the test sets up synchronously and the API reads asynchronously."""
+    url = f"sqlite:///{tmp_path / 'auth.db'}"
+    engine = create_engine(url)
+    SQLModel.metadata.create_all(engine)
+    # Without pooling, no connection outlives the TestClient's event loop
+    async_engine = create_async_engine(url.replace("sqlite://", "sqlite+aiosqlite://"), poolclass=NullPool)
+
+    async def get_test_db():
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            yield session
+
+    app.dependency_overrides[get_async_db] = get_test_db
+    with Session(engine) as session:
+        yield session
+    app.dependency_overrides.clear()
+
+
+class TestAuthEndpoints:
+    """Tests for the async login and registration endpoints"""
+
+    def test_register_then_log_in(self, db):
+        client = TestClient(app)
+        response = client.post("/api/v1/register", json={"email": "a@example.com", "password": "secret"})
+        assert response.status_code == 201
+
+        response = client.post("/api/v1/login/access-token", data={"username": "a@example.com", "password": "secret"})
+        assert response.status_code == 200
+        assert response.json()["access_token"]
+
+    def test_wrong_password_is_refused(self, db):
+        crud_user.create_user(db, user_in=UserCreate(email="a@example.com", password="secret"))
+        client = TestClient(app)
+        response = client.post("/api/v1/login/access-token", data={"username": "a@example.com", "password": "nope"})
+        assert response.status_code == 401
+
+    def test_unknown_user_is_refused(self, db):
+        client = TestClient(app)
+        response = client.post("/api/v1/login/access-token", data={"username": "b@example.com", "password": "x"})
+        assert response.status_code == 401
+
+    def test_login_rehashes_outdated_hash(self, db):
+        user = crud_user.create_user(
+            db, user_in=UserCreate(email="a@example.com", password="secret"), hashed_password=weak_hash("secret")
+        )
+        client = TestClient(app)
+        response = client.post("/api/v1/login/access-token", data={"username": "a@example.com", "password": "secret"})
+        assert response.status_code == 200
+
+        db.refresh(user)
+        assert not security.pwd_context.needs_update(user.hashed_password)
+        assert security.verify_password("secret", user.hashed_password)
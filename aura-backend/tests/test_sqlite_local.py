@@ -0,0 +1,34 @@
+"""
+Unit tests for per-thread SQLite connections.
+"""
+
+import threading
+
+from app.db.sqlite_local import ThreadLocalSQLite
+
+
+class TestThreadLocalSQLite:
+    """Tests for ThreadLocalSQLite"""
+
+    def test_one_connection_per_thread(self, tmp_path):
+        db = ThreadLocalSQLite(str(tmp_path / "local.sqlite3"))
+        other = []
+        thread = threading.Thread(target=lambda: other.append(db.connection()))
+        thread.start()
+        thread.join()
+
+        assert db.connection() is db.connection()
+        assert other[0] is not db.connection()
+        assert db.connection().execute("PRAGMA journal_mode").fetchone() == ("wal",)
+
+    def test_shared_memory_database(self):
+        db = ThreadLocalSQLite("file:sqlite_local_test?mode=memory&cache=shared", uri=True)
+        with db.connection() as conn:
+            conn.execute("CREATE TABLE t (x INTEGER)")
+            conn.execute("INSERT INTO t VALUES (1)")
+        rows = []
+        thread = threading.Thread(target=lambda: rows.extend(db.connection().execute("SELECT x FROM t")))
+        thread.start()
+        thread.join()
+
+        assert rows == [(1,)]
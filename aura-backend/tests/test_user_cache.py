@@ -0,0 +1,133 @@
+"""
+Unit tests for the authenticated user cache.
+"""
+
+import asyncio
+import os
+import pytest
+from uuid import uuid4
+from unittest.mock import Mock, patch
+
+# Ensure testing environment is set before any app imports
+os.environ["TESTING"] = "true"
+
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.api import deps
+from app.core.security import create_access_token
+from app.crud import crud_user
+from app.db.models_pg import User
+from app.services.user_cache import UserCache
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value.encode("utf-8")
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+def make_user(email="a@example.com"):
+    return User(id=uuid4(), email=email, hashed_password="secret-hash")
+
+
+class TestUserCache:
+    """Test suite for the two-tier cache."""
+
+    def test_hit_returns_copy_without_password_hash(self):
+        cache = UserCache(ttl=60, max_entries=10)
+        user = make_user()
+        cache.set(user.email, user)
+
+        cached = cache.get(user.email)
+
+        assert (cached.id, cached.email, cached.is_active) == (user.id, user.email, True)
+        assert cached.hashed_password == ""
+        assert cached is not cache.get(user.email)
+
+    def test_expiry_and_eviction(self):
+        cache = UserCache(ttl=60, max_entries=2)
+        users = [make_user(f"{i}@example.com") for i in range(3)]
+        for user in users:
+            cache.set(user.email, user)
+
+        assert cache.get(users[0].email) is None
+        assert cache.get(users[2].email) is not None
+        with patch("app.services.user_cache.time.monotonic", return_value=1e12):
+            assert cache.get(users[2].email) is None
+
+    def test_redis_tier_is_shared(self):
+        redis = FakeRedis()
+        user = make_user()
+        UserCache(ttl=60, max_entries=10, redis_client=redis).set(user.email, user)
+        other_process = UserCache(ttl=60, max_entries=10, redis_client=redis)
+
+        assert other_process.get(user.email).id == user.id
+        other_process.invalidate(user.email)
+        assert redis.data == {}
+
+    def test_redis_errors_are_misses(self):
+        redis = Mock()
+        redis.get.side_effect = ConnectionError("down")
+
+        assert UserCache(ttl=60, max_entries=10, redis_client=redis).get("a@example.com") is None
+
+
+class TestGetCurrentUser:
+    """Authenticated requests skip the database once the user is cached."""
+
+    @pytest.fixture(autouse=True)
+    def cache(self, monkeypatch):
+        cache = UserCache(ttl=60, max_entries=10)
+        monkeypatch.setattr("app.services.user_cache._user_cache", cache)
+        return cache
+
+    @pytest.fixture(name="database")
+    def database_fixture(self, tmp_path):
+        url = f"sqlite:///{tmp_path / 'users.db'}"
+        SQLModel.metadata.create_all(create_engine(url))
+        return url
+
+    def get_current_user(self, database, token):
+        async def lookup():
+            engine = create_async_engine(database.replace("sqlite://", "sqlite+aiosqlite://"))
+            try:
+                async with AsyncSession(engine) as db:
+                    return await deps.get_current_user(db=db, token=token)
+            finally:
+                await engine.dispose()
+        return asyncio.run(lookup())
+
+    def test_second_request_skips_database(self):
+        user = make_user()
+        token = create_access_token(user.email)
+
+        with patch("app.crud.crud_user.aget_user_by_email", return_value=user) as mock_lookup:
+            first = asyncio.run(deps.get_current_user(db=Mock(), token=token))
+            second = asyncio.run(deps.get_current_user(db=Mock(), token=token))
+
+        mock_lookup.assert_called_once()
+        assert first.id == second.id == user.id
+
+    def test_deactivation_invalidates(self, database):
+        with Session(create_engine(database)) as session:
+            user = make_user()
+            session.add(user)
+            session.commit()
+            token = create_access_token(user.email)
+            self.get_current_user(database, token)
+
+            crud_user.set_user_active(session, user=user, is_active=False)
+
+        with pytest.raises(Exception) as exc_info:
+            asyncio.run(deps.get_current_active_user(self.get_current_user(database, token)))
+        assert exc_info.value.status_code == 400
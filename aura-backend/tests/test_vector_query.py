@@ -0,0 +1,80 @@
+"""
+Unit tests for the async query path the API uses.
+"""
+
+import asyncio
+import os
+import pytest
+from uuid import uuid4
+from unittest.mock import AsyncMock, Mock, patch
+
+# Ensure testing environment is set before any app imports
+os.environ["TESTING"] = "true"
+
+from app.services.keyword_index import KeywordIndex
+from app.services.vector_query_service import aquery_library, aquery_vector_store
+from app.services.vector_store_service import LibraryScope
+
+
+def chunk(document_id, index, text, distance):
+    return {"text": text, "metadata": {"document_id": str(document_id), "chunk_index": index}, "distance": distance}
+
+
+@pytest.fixture(name="vector_service")
+def vector_service_fixture():
+    """The async vector store service, with the query embedding mocked."""
+    service = Mock()
+    service.search = AsyncMock(return_value=[])
+    with patch("app.services.vector_query_service.get_async_vector_store_service", new_callable=AsyncMock,
+               return_value=service), \
+            patch("app.services.vector_query_service.embedding_service") as mock_embedding:
+        mock_embedding.embed_batch.return_value = [[0.5]]
+        yield service
+
+
+class TestAsyncSearch:
+    """Test suite for aquery_vector_store and aquery_library."""
+
+    def test_vector_search_with_query_embedding(self, vector_service):
+        """Without a keyword index, the vector results are returned as they are."""
+        owner_id, document_id = uuid4(), uuid4()
+        vector_service.search.return_value = [chunk(document_id, 0, "mission", 0.3)]
+
+        with patch("app.services.vector_query_service.get_keyword_index", return_value=None):
+            results = asyncio.run(aquery_vector_store("mission?", document_id, n_results=3, owner_id=owner_id))
+
+        assert results == [chunk(document_id, 0, "mission", 0.3)]
+        vector_service.search.assert_awaited_once_with(
+            owner_id, "mission?", {"document_id": str(document_id)}, 3, [0.5]
+        )
+
+    def test_hybrid_search_fuses_keyword_hits(self, vector_service, monkeypatch):
+        """Vector and keyword candidates are fetched together and fused."""
+        monkeypatch.setattr("app.core.config.settings.HYBRID_CANDIDATES", 10)
+        owner_id, document_id = uuid4(), uuid4()
+        vector_service.search.return_value = [chunk(document_id, 0, "mission", 0.3)]
+        index = KeywordIndex(":memory:")
+        index.add(
+            owner_id, [f"{document_id}_{i}" for i in range(2)], ["mission", "EIN 12-3456789"],
+            [{"document_id": str(document_id), "chunk_index": i} for i in range(2)],
+        )
+
+        with patch("app.services.vector_query_service.get_keyword_index", return_value=index):
+            results = asyncio.run(aquery_library("EIN 12-3456789", LibraryScope(owner_id=owner_id), n_results=2))
+
+        by_text = {r["text"]: r for r in results}
+        assert set(by_text) == {"mission", "EIN 12-3456789"}
+        assert by_text["EIN 12-3456789"]["distance"] is None
+        assert vector_service.search.await_args[0][3] == 10
+
+    def test_keyword_failure_falls_back_to_vector_results(self, vector_service):
+        """A failing keyword index leaves the vector results."""
+        document_id = uuid4()
+        vector_service.search.return_value = [chunk(document_id, 0, "mission", 0.3)]
+        index = Mock()
+        index.search.side_effect = RuntimeError("locked")
+
+        with patch("app.services.vector_query_service.get_keyword_index", return_value=index):
+            results = asyncio.run(aquery_vector_store("mission?", document_id))
+
+        assert [r["text"] for r in results] == ["mission"]
@@ -0,0 +1,78 @@
+"""
+Unit tests for the shared vector store client pool.
+"""
+
+import asyncio
+import os
+from unittest.mock import AsyncMock, Mock, patch
+
+# Ensure testing environment is set before any app imports
+os.environ["TESTING"] = "true"
+
+from app.services import vector_store_service
+from app.services.vector_store_service import VectorStorePool
+
+
+class TestVectorStorePool:
+    """Test suite for client reuse, health checks and shutdown."""
+
+    @patch("app.services.vector_store_service.VectorStoreService")
+    def test_reuses_service(self, mock_service_class):
+        """The client and collection are created once and then reused."""
+        pool = VectorStorePool("localhost", 8000, health_check_interval=3600)
+
+        first = pool.get_service()
+        second = pool.get_service()
+
+        assert first is second
+        mock_service_class.assert_called_once_with(host="localhost", port=8000)
+        first.heartbeat.assert_not_called()
+
+    @patch("app.services.vector_store_service.VectorStoreService")
+    def test_reconnects_after_failed_heartbeat(self, mock_service_class):
+        """A failed health check replaces the client."""
+        broken, healthy = Mock(), Mock()
+        broken.heartbeat.side_effect = ConnectionError("gone")
+        mock_service_class.side_effect = [broken, healthy]
+        pool = VectorStorePool("localhost", 8000, health_check_interval=0)
+
+        assert pool.get_service() is broken
+        assert pool.get_service() is healthy
+        broken.close.assert_called_once()
+
+    @patch("app.services.vector_store_service.VectorStoreService")
+    def test_module_lifecycle(self, mock_service_class):
+        """The process-wide pool is created once and closed on shutdown."""
+        vector_store_service.close_vector_store_pool()
+
+        pool = vector_store_service.init_vector_store_pool()
+        assert vector_store_service.init_vector_store_pool() is pool
+        service = vector_store_service.get_vector_store_service()
+        assert service is mock_service_class.return_value
+
+        vector_store_service.close_vector_store_pool()
+        service.close.assert_called_once()
+        assert vector_store_service._pool is None
+
+    @patch("app.services.vector_store_service.AsyncVectorStoreService.create", new_callable=AsyncMock)
+    def test_async_service_is_shared(self, mock_create):
+        """The async client is created once and closed with the pool."""
+        pool = VectorStorePool("localhost", 8000, health_check_interval=3600)
+
+        async def run():
+            first = await pool.get_async_service()
+            second = await pool.get_async_service()
+            await pool.aclose()
+            return first, second
+
+        first, second = asyncio.run(run())
+
+        assert first is second
+        mock_create.assert_awaited_once_with("localhost", 8000)
+        first.aclose.assert_awaited_once()
+
+    def test_async_service_close_drops_client(self):
+        """Closing the async service releases its client without touching Chroma internals."""
+        service = vector_store_service.AsyncVectorStoreService(Mock())
+        asyncio.run(service.aclose())
+        assert service.client is None
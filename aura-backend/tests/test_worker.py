@@ -0,0 +1,44 @@
+"""
+Unit tests for the Celery worker's startup and shutdown hooks.
+"""
+
+import os
+from unittest.mock import Mock, patch
+
+# Ensure testing environment is set before any app imports
+os.environ["TESTING"] = "true"
+
+from celery.concurrency.prefork import TaskPool as PreforkPool
+from celery.concurrency.solo import TaskPool as SoloPool
+
+from app import worker
+
+
+class TestWorkerHooks:
+    """Tests for the vector store pool's lifecycle in the worker."""
+
+    @patch("app.worker.warm_up_embedding_model")
+    @patch("app.worker.close_vector_store_pool")
+    @patch("app.worker.init_vector_store_pool")
+    def test_solo_pool_uses_main_process_hooks(self, mock_init, mock_close, mock_warm_up):
+        sender = Mock(pool=Mock(spec=SoloPool))
+
+        worker.init_worker_main_process(sender)
+        mock_init.assert_called_once()
+        mock_warm_up.assert_called_once()
+
+        worker.shutdown_worker_main_process(sender)
+        mock_close.assert_called_once()
+
+    @patch("app.worker.warm_up_embedding_model")
+    @patch("app.worker.close_vector_store_pool")
+    @patch("app.worker.init_vector_store_pool")
+    def test_prefork_pool_leaves_it_to_child_processes(self, mock_init, mock_close, mock_warm_up):
+        sender = Mock(pool=Mock(spec=PreforkPool))
+
+        worker.init_worker_main_process(sender)
+        worker.shutdown_worker_main_process(sender)
+
+        mock_init.assert_not_called()
+        mock_close.assert_not_called()
+        mock_warm_up.assert_not_called()